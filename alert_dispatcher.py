@@ -0,0 +1,386 @@
+"""
+Background alert delivery.
+
+Alerts are rows in a durable queue (alert_queue, in events.db), one job per
+channel and recipient, so a slow or failing provider never holds up the
+request (or detector) that raised the alert, and pending jobs survive a
+restart. A dispatcher thread claims due jobs and hands them to a small pool
+of HTTP workers, so recipients are delivered concurrently; every attempt is
+recorded in alert_history.
+
+Enqueue-time rules:
+  - dedup:    the same event is alerted at most once per channel/recipient
+  - cooldown: after an alert on a channel, further alerts on that channel are
+              suppressed for alert_cooldown_minutes (manual sends may force)
+
+Failures with a transient cause (timeouts, connection errors, HTTP 408/429/
+5xx, Slack 'ratelimited') are retried with exponential backoff, honouring
+Retry-After; anything else fails the job immediately.
+
+Providers are called over plain HTTPS (urllib). Base URLs come from
+RESEND_API_URL / SLACK_API_URL so local stub servers can stand in for them.
+"""
+import os
+import json
+import time
+import queue
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+RESEND_API_URL = "https://api.resend.com"
+SLACK_API_URL = "https://slack.com/api"
+DEFAULT_SLACK_CHANNEL = "#security-alerts"
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 2.0        # seconds before the first retry, doubled per attempt
+MAX_DELAY = 300.0
+CLAIM_LEASE = 120.0     # a job claimed longer ago than this is assumed orphaned
+KEEP_FINISHED_DAYS = 7
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS alert_queue (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        event_id INTEGER,
+        channel TEXT NOT NULL,
+        recipient TEXT NOT NULL,
+        payload TEXT NOT NULL,              -- JSON: subject, message
+        status TEXT NOT NULL,               -- pending, sending, sent, failed
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,      -- unix time
+        claimed_at REAL,
+        created_at REAL NOT NULL,
+        last_error TEXT
+    );
+
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_alert_queue_event
+        ON alert_queue(event_id, channel, recipient) WHERE event_id IS NOT NULL;
+
+    CREATE INDEX IF NOT EXISTS idx_alert_queue_due ON alert_queue(status, next_attempt_at);
+
+    CREATE INDEX IF NOT EXISTS idx_alert_queue_channel ON alert_queue(channel, created_at);
+'''
+
+RETRYABLE_HTTP = {408, 425, 429}
+
+
+def install(conn):
+    """Creates the queue table (idempotent)"""
+    conn.executescript(SCHEMA)
+
+
+def render_message(event):
+    rules = f"\nRules: {event['rules']}" if event.get('rules') else ""
+    process = event.get('process')
+    if process:
+        rules += (f"\nProcess: {process['name']} (pid {process['pid']}, {process.get('exe') or '?'}, "
+                  f"{process['processes']} processes in its tree)")
+    return f"""🚨 SENTINEL OVERWATCH - THREAT DETECTED
+
+Status: {event.get('status', 'CRITICAL')}
+Probability: {event.get('probability', 0):.2%}
+Syscall Rate: {event.get('syscall_rate', 0)}/sec
+File Churn: {event.get('churn_rate', 0)}/sec
+Time: {event.get('timestamp', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))}{rules}
+
+Immediate investigation recommended."""
+
+
+def recipients(channel, config):
+    """Recipients of a channel; [] if it is disabled"""
+    if channel == 'email' and config.get('email_enabled'):
+        return list(config.get('email_recipients', []))
+    if channel == 'slack' and config.get('slack_enabled'):
+        if config.get('slack_bot_token') or os.environ.get('SLACK_BOT_TOKEN'):
+            return [config.get('slack_channel') or DEFAULT_SLACK_CHANNEL]
+        if config.get('slack_webhook_url'):
+            return ['webhook']
+    return []
+
+
+def record(conn, event_id, channel, recipient, status):
+    """One alert_history row, in the shape the Alerts page reads"""
+    conn.execute(
+        "INSERT INTO alert_history (event_id, alert_type, recipient, sent_at, status) VALUES (?, ?, ?, ?, ?)",
+        (event_id, json.dumps([channel]), recipient, datetime.now().isoformat(),
+         json.dumps({channel: status})))
+
+
+def enqueue(conn, event, channels, config, force=False, now=None, record_suppressed=True):
+    """
+    Queues one job per recipient of every enabled channel. Returns a status
+    per channel ('queued (n)', 'duplicate', 'suppressed: cooldown ...',
+    'disabled'). force skips the cooldown, never the per-event dedup.
+    record_suppressed=False keeps cooldown hits out of alert_history
+    (automatic alerts would add one per window).
+    """
+    now = now or time.time()
+    event_id = event.get('id')
+    cooldown = float(config.get('alert_cooldown_minutes') or 0) * 60
+    payload = json.dumps({'subject': "🚨 SENTINEL ALERT: Threat Detected",
+                          'message': render_message(event)})
+    results = {}
+
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")  # cooldown check and insert are one step
+    try:
+        for channel in channels:
+            targets = recipients(channel, config)
+            if not targets:
+                results[channel] = 'disabled'
+                continue
+            if cooldown and not force:
+                last = conn.execute("SELECT MAX(created_at) FROM alert_queue WHERE channel = ?",
+                                    (channel,)).fetchone()[0]
+                if last is not None and now - last < cooldown:
+                    results[channel] = f'suppressed: cooldown ({(cooldown - (now - last)) / 60:.1f} min left)'
+                    if record_suppressed:
+                        record(conn, event_id, channel, json.dumps(targets), results[channel])
+                    continue
+            queued = 0
+            for recipient in targets:
+                queued += conn.execute(
+                    "INSERT OR IGNORE INTO alert_queue (event_id, channel, recipient, payload, status, "
+                    "next_attempt_at, created_at) VALUES (?, ?, ?, ?, 'pending', ?, ?)",
+                    (event_id, channel, recipient, payload, now, now)).rowcount
+            results[channel] = f'queued ({queued})' if queued else 'duplicate'
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return results
+
+
+# ---------- providers ----------
+class DeliveryError(Exception):
+    def __init__(self, message, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def post_json(url, payload, headers=None, timeout=10.0):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), method='POST',
+        headers={'Content-Type': 'application/json', **(headers or {})})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+    except urllib.error.HTTPError as e:
+        retry_after = e.headers.get('Retry-After')
+        raise DeliveryError(f"HTTP {e.code}", retryable=e.code in RETRYABLE_HTTP or e.code >= 500,
+                            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+    except (urllib.error.URLError, OSError) as e:  # refused, DNS, timeout
+        raise DeliveryError(str(getattr(e, 'reason', e)))
+    try:
+        return json.loads(body) if body else {}
+    except ValueError:
+        return {}
+
+
+def send_email(recipient, payload, config, timeout):
+    api_key = os.environ.get('RESEND_API_KEY')
+    if not api_key:
+        raise DeliveryError('not configured', retryable=False)
+    post_json(f"{os.environ.get('RESEND_API_URL', RESEND_API_URL)}/emails", {
+        "from": os.environ.get('SENDER_EMAIL', 'alerts@sentinel.local'),
+        "to": [recipient],
+        "subject": payload['subject'],
+        "html": f"<pre>{payload['message']}</pre>",
+    }, {'Authorization': f'Bearer {api_key}'}, timeout)
+
+
+def send_slack(recipient, payload, config, timeout):
+    message = payload['message']
+    blocks = [
+        {"type": "header", "text": {"type": "plain_text", "text": "🚨 SENTINEL ALERT"}},
+        {"type": "section", "text": {"type": "mrkdwn", "text": message}},
+    ]
+    token = config.get('slack_bot_token') or os.environ.get('SLACK_BOT_TOKEN')
+    if recipient == 'webhook':
+        if not config.get('slack_webhook_url'):
+            raise DeliveryError('not configured', retryable=False)
+        post_json(config['slack_webhook_url'], {"text": message, "blocks": blocks}, timeout=timeout)
+        return
+    if not token:
+        raise DeliveryError('not configured', retryable=False)
+    reply = post_json(f"{os.environ.get('SLACK_API_URL', SLACK_API_URL)}/chat.postMessage",
+                      {"channel": recipient, "text": message, "blocks": blocks},
+                      {'Authorization': f'Bearer {token}'}, timeout)
+    if not reply.get('ok', False):
+        error = reply.get('error', 'unknown error')
+        raise DeliveryError(error, retryable=error in ('ratelimited', 'internal_error', 'service_unavailable'))
+
+
+PROVIDERS = {'email': send_email, 'slack': send_slack}
+
+
+def backoff(attempts, base=BASE_DELAY, cap=MAX_DELAY, retry_after=None):
+    """Delay before retry number `attempts` (1-based): base, 2*base, 4*base, ..."""
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return max(delay, retry_after or 0)
+
+
+# ---------- dispatcher ----------
+class AlertDispatcher(threading.Thread):
+    """
+    Owns the queue: claims due jobs, runs them on `max_workers` threads and
+    writes back the outcome. Only this thread touches the database; workers
+    just make HTTP calls and report back through `self.inbox`.
+
+    load_config - callable returning the current dashboard config
+    """
+
+    def __init__(self, db_file, load_config, max_workers=8, max_attempts=MAX_ATTEMPTS,
+                 base_delay=BASE_DELAY, max_delay=MAX_DELAY, timeout=10.0, poll_interval=1.0):
+        super().__init__(name="alert-dispatcher", daemon=True)
+        self.db_file = db_file
+        self.load_config = load_config
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        # Other processes (the detector) enqueue too; poll for their jobs
+        self.poll_interval = poll_interval
+
+        self.inbox = queue.Queue()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="alert-send")
+        self.in_flight = 0
+        self.stopping = False
+
+        # Counters
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def submit(self, event, channels, force=False):
+        """Enqueues an alert from this process and wakes the dispatcher"""
+        conn = sqlite3.connect(self.db_file, timeout=10)
+        try:
+            results = enqueue(conn, event, channels, self.load_config(), force)
+        finally:
+            conn.close()
+        self.inbox.put(None)
+        return results
+
+    def close(self, timeout=5.0):
+        self.stopping = True
+        self.inbox.put(None)
+        self.join(timeout)
+        self.pool.shutdown(wait=False)
+
+    # ---------- queue ----------
+    def _claim(self, conn, limit):
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, event_id, channel, recipient, payload, attempts FROM alert_queue "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (now, limit)).fetchall()
+            conn.executemany("UPDATE alert_queue SET status = 'sending', claimed_at = ? WHERE id = ?",
+                             [(now, row[0]) for row in rows])
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        return rows
+
+    def _recover(self, conn):
+        """Returns jobs orphaned by a crash mid-send to the queue"""
+        conn.execute("UPDATE alert_queue SET status = 'pending' WHERE status = 'sending' AND claimed_at < ?",
+                     (time.time() - CLAIM_LEASE,))
+        conn.execute("DELETE FROM alert_queue WHERE status IN ('sent', 'failed') AND created_at < ?",
+                     (time.time() - KEEP_FINISHED_DAYS * 86400,))
+        conn.commit()
+
+    def _next_due(self, conn):
+        row = conn.execute("SELECT MIN(next_attempt_at) FROM alert_queue WHERE status = 'pending'").fetchone()
+        return row[0]
+
+    # ---------- delivery ----------
+    def _deliver(self, job, config):
+        job_id, event_id, channel, recipient, payload, attempts = job
+        try:
+            PROVIDERS[channel](recipient, json.loads(payload), config, self.timeout)
+            outcome = None
+        except DeliveryError as e:
+            outcome = e
+        except Exception as e:  # a bug in a provider must not kill the job silently
+            outcome = DeliveryError(f"{type(e).__name__}: {e}", retryable=False)
+        self.inbox.put((job, outcome))
+
+    def _finish(self, conn, job, error):
+        job_id, event_id, channel, recipient, payload, attempts = job
+        attempts += 1
+        if error is None:
+            self.sent += 1
+            conn.execute("UPDATE alert_queue SET status = 'sent', attempts = ? WHERE id = ?", (attempts, job_id))
+            record(conn, event_id, channel, recipient, 'sent')
+        elif error.retryable and attempts < self.max_attempts:
+            self.retried += 1
+            delay = backoff(attempts, self.base_delay, self.max_delay, error.retry_after)
+            conn.execute(
+                "UPDATE alert_queue SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? "
+                "WHERE id = ?", (attempts, time.time() + delay, str(error), job_id))
+            record(conn, event_id, channel, recipient,
+                   f'error: {error} (retry {attempts}/{self.max_attempts - 1} in {delay:.0f}s)')
+        else:
+            self.failed += 1
+            conn.execute("UPDATE alert_queue SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                         (attempts, str(error), job_id))
+            detail = f' (gave up after {attempts} attempts)' if error.retryable else ''
+            record(conn, event_id, channel, recipient, f'error: {error}{detail}')
+        conn.commit()
+
+    def run(self):
+        conn = sqlite3.connect(self.db_file, timeout=10)
+        install(conn)
+        self._recover(conn)
+        next_recover = time.monotonic() + CLAIM_LEASE
+        while not self.stopping:
+            try:
+                free = self.max_workers - self.in_flight
+                if free > 0:
+                    jobs = self._claim(conn, free)
+                    if jobs:
+                        config = self.load_config()
+                        for job in jobs:
+                            self.in_flight += 1
+                            self.pool.submit(self._deliver, job, config)
+                if time.monotonic() >= next_recover:
+                    self._recover(conn)
+                    next_recover = time.monotonic() + CLAIM_LEASE
+
+                # With every worker busy, only a finished send can free a slot
+                due = None if self.in_flight >= self.max_workers else self._next_due(conn)
+                wait = self.poll_interval if due is None else min(self.poll_interval, max(due - time.time(), 0))
+                try:
+                    item = self.inbox.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                # Apply every outcome that has arrived before claiming again
+                while True:
+                    if item is not None:
+                        self.in_flight -= 1
+                        self._finish(conn, *item)
+                    try:
+                        item = self.inbox.get_nowait()
+                    except queue.Empty:
+                        break
+            except sqlite3.Error as e:
+                print(f"[alerts] DB error: {e}")
+                time.sleep(self.poll_interval)
+        conn.close()
+
+    def stats(self):
+        return {
+            'in_flight': self.in_flight,
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+        }
@@ -0,0 +1,131 @@
+"""
+Detector-side alert rules.
+
+evaluate() applies the thresholds from sentinel_config.json to one scored
+window:
+
+    detection_threshold                        model probability
+    attack_patterns.ransomware.churn_threshold file deletions per second
+    attack_patterns.fork_bomb.spawn_threshold  clone + execve per second
+
+Counts are per window, so they are divided by the window length before the
+comparison. Matches go to an AlertSink, whose thread writes them to the
+durable alert queue (see alert_dispatcher); the dashboard's dispatcher
+delivers them. The detector loop only pays for a put_nowait().
+"""
+import time
+import queue
+import sqlite3
+import threading
+
+import alert_dispatcher
+
+ALERT_CHANNELS = ('email', 'slack')
+
+_STOP = object()
+
+
+def evaluate(features, probability, config, window_seconds=1.0):
+    """Returns the rules this window trips, as dicts (empty list if none)"""
+    matches = []
+    threshold = config.get('detection_threshold')
+    if threshold is not None and probability >= threshold:
+        matches.append({'rule': 'detection_threshold', 'value': round(float(probability), 4),
+                        'threshold': threshold})
+
+    patterns = config.get('attack_patterns', {})
+    per_second = 1.0 / window_seconds
+    for pattern, feature, key in (('ransomware', 'file_churn_rate', 'churn_threshold'),
+                                  ('fork_bomb', 'process_spawn_rate', 'spawn_threshold')):
+        settings = patterns.get(pattern, {})
+        limit = settings.get(key)
+        if not settings.get('enabled') or limit is None:
+            continue
+        rate = features.get(feature, 0) * per_second
+        if rate >= limit:
+            matches.append({'rule': pattern, 'value': rate, 'threshold': limit})
+    return matches
+
+
+def describe(matches):
+    return ", ".join(f"{m['rule']} ({m['value']:g} >= {m['threshold']:g})" for m in matches)
+
+
+class AlertSink(threading.Thread):
+    """
+    Queues rule matches off the detection thread.
+
+    submit() never blocks: if the queue is full the alert is dropped and
+    counted. While a cooldown is running (alert_cooldown_minutes, read
+    through `config_store`) matches are only counted, so a sustained attack
+    does not write a suppressed row per window.
+    """
+
+    def __init__(self, db_file, config_store, max_queue=1000):
+        super().__init__(name="alert-sink", daemon=True)
+        self.db_file = db_file
+        self.config_store = config_store
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.cooldown_until = 0.0
+
+        # Counters
+        self.matched = 0
+        self.queued = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def submit(self, event, matches):
+        """event: dict with timestamp/status/probability/syscall_rate/churn_rate"""
+        self.matched += 1
+        if time.monotonic() < self.cooldown_until:
+            self.suppressed += 1
+            return False
+        try:
+            self.queue.put_nowait((event, matches))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout=5.0):
+        self.queue.put(_STOP)
+        self.join(timeout)
+
+    def run(self):
+        conn = sqlite3.connect(self.db_file, timeout=10)
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _STOP:
+                    break
+                if time.monotonic() < self.cooldown_until:
+                    self.suppressed += 1
+                    continue
+                event, matches = item
+                config = self.config_store.get()
+                try:
+                    results = alert_dispatcher.enqueue(
+                        conn, {**event, 'rules': describe(matches)}, ALERT_CHANNELS, config,
+                        record_suppressed=False)
+                except sqlite3.Error as e:
+                    self.errors += 1
+                    print(f"DB Error (alerts): {e}")
+                    continue
+                if any(r.startswith('queued') for r in results.values()):
+                    self.queued += 1
+                    self.cooldown_until = time.monotonic() + float(config.get('alert_cooldown_minutes') or 0) * 60
+                    print(f"[ALERT] {event['timestamp']} {describe(matches)} -> {results}")
+                else:
+                    self.suppressed += 1
+        finally:
+            conn.close()
+
+    def stats(self):
+        return {
+            'matched': self.matched,
+            'queued': self.queued,
+            'suppressed': self.suppressed,
+            'dropped': self.dropped,
+            'errors': self.errors,
+        }
@@ -0,0 +1,215 @@
+"""
+Columnar archive tier for the events table.
+
+Cold rows are moved out of events.db into day-partitioned Parquet files
+
+    archive/day=2026-10-01/part-000001234567-000001284566.parquet
+
+(hive layout, one part per retention batch and day, named by id range), so
+the hot SQLite file only holds the last HOT_DAYS days while a year of
+history stays queryable. Analysts can load it directly:
+
+    pd.read_parquet("archive", filters=[("day", ">=", "2026-09-01")])
+
+Rollups and counters are maintained before rows are archived, so analytics
+and /api/stats are unaffected; /api/history and /api/export/parquet read the
+archive and the hot table as one.
+
+pyarrow is optional (pip install pyarrow). Without it nothing is archived,
+raw rows age out after rollups.RAW_RETENTION_DAYS as before, and the
+Parquet export is unavailable.
+
+    python archive.py run    [--db events.db] [--hot-days 7]
+    python archive.py stats
+"""
+import os
+import shutil
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+import rollups
+
+ARCHIVE_DIR = "archive"
+HOT_DAYS = 7
+ARCHIVE_RETENTION_DAYS = 365
+UNKNOWN_DAY = "unknown"
+
+# (column, pyarrow type name); ai_analysis only exists in the dashboard's schema
+COLUMNS = (
+    ('id', 'int64'),
+    ('timestamp', 'string'),
+    ('status', 'string'),
+    ('probability', 'float64'),
+    ('syscall_rate', 'int64'),
+    ('churn_rate', 'int64'),
+    ('ai_analysis', 'string'),
+    ('ts', 'int64'),
+)
+
+
+def available():
+    return pa is not None
+
+
+def schema():
+    return pa.schema([(name, getattr(pa, kind)()) for name, kind in COLUMNS])
+
+
+def event_columns(conn):
+    """Archived columns present in this database's events table"""
+    present = {row[1] for row in conn.execute("PRAGMA table_info(events)")}
+    return [name for name, _ in COLUMNS if name in present]
+
+
+def rows_to_table(rows, columns):
+    """Row tuples (in `columns` order) -> Table with the full archive schema"""
+    data = {name: [row[i] for row in rows] for i, name in enumerate(columns)}
+    return pa.table({name: pa.array(data.get(name, [None] * len(rows)), type=getattr(pa, kind)())
+                     for name, kind in COLUMNS})
+
+
+class EventArchive:
+    """
+    Day-partitioned Parquet store. An instance is the `archive` hook of
+    rollups.apply_retention(): called with an id range just before those rows
+    are deleted from SQLite.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR, compression="zstd"):
+        if not available():
+            raise RuntimeError("pyarrow is not installed (pip install pyarrow)")
+        self.root = root
+        self.compression = compression
+
+    # ---------- writing ----------
+    def __call__(self, conn, first, last):
+        columns = event_columns(conn)
+        rows = conn.execute(f"SELECT {', '.join(columns)} FROM events WHERE id BETWEEN ? AND ? ORDER BY id",
+                            (first, last)).fetchall()
+        by_day = {}
+        ts = columns.index('timestamp')
+        for row in rows:
+            by_day.setdefault((row[ts] or '')[:10] or UNKNOWN_DAY, []).append(row)
+        for day, day_rows in by_day.items():
+            self._write_part(day, rows_to_table(day_rows, columns))
+        return len(rows)
+
+    def _write_part(self, day, table):
+        directory = os.path.join(self.root, f"day={day}")
+        os.makedirs(directory, exist_ok=True)
+        ids = table.column('id')
+        name = f"part-{ids[0].as_py():012d}-{ids[-1].as_py():012d}.parquet"
+        path = os.path.join(directory, name)
+        # Write-then-rename: readers never see a half-written part, and a
+        # retry of the same batch replaces it instead of duplicating rows
+        tmp = os.path.join(directory, f".{name}.tmp")  # dot-files are skipped by dataset readers
+        pq.write_table(table, tmp, compression=self.compression)
+        with open(tmp, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def prune(self, days=ARCHIVE_RETENTION_DAYS, now=None):
+        """Removes day partitions older than `days`; returns how many"""
+        cutoff = ((now or datetime.now()) - timedelta(days=days)).strftime('%Y-%m-%d')
+        removed = 0
+        for day, directory in self._days():
+            if day < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        return removed
+
+    # ---------- reading ----------
+    def _days(self):
+        if not os.path.isdir(self.root):
+            return []
+        days = []
+        for entry in sorted(os.listdir(self.root)):
+            if entry.startswith("day=") and entry[4:] != UNKNOWN_DAY:
+                days.append((entry[4:], os.path.join(self.root, entry)))
+        return days
+
+    def parts(self, start=None, end=None):
+        """Part files whose day overlaps [start, end], oldest first"""
+        paths = []
+        for day, directory in self._days():
+            if (start and day < start[:10]) or (end and day > end[:10]):
+                continue
+            paths.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                         if name.endswith(".parquet"))
+        return paths
+
+    def iter_tables(self, start=None, end=None, newest_first=False, columns=None):
+        """Yields one Table per part, rows filtered to start <= timestamp <= end"""
+        paths = self.parts(start, end)
+        for path in reversed(paths) if newest_first else paths:
+            # Reading with the current schema fills columns that older parts lack (ts) with nulls
+            table = pq.read_table(path, schema=schema(),
+                                  columns=columns and list(dict.fromkeys(['timestamp', *columns])))
+            mask = None
+            if start:
+                mask = pc.greater_equal(table['timestamp'], start)
+            if end:
+                upper = pc.less_equal(table['timestamp'], end)
+                mask = upper if mask is None else pc.and_(mask, upper)
+            if mask is not None:
+                table = table.filter(mask)
+            if columns:
+                table = table.select(columns)
+            if table.num_rows:
+                yield table[::-1] if newest_first else table
+
+    def read(self, limit, before_id=None, start=None, end=None):
+        """Up to `limit` rows as dicts, newest first, with id < before_id"""
+        rows = []
+        for table in self.iter_tables(start, end, newest_first=True):
+            if before_id is not None:
+                table = table.filter(pc.less(table['id'], before_id))
+            rows.extend(table.slice(0, limit - len(rows)).to_pylist())
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def max_id(self):
+        """Highest archived id (0 if empty), from part file names"""
+        paths = self.parts()
+        return max((int(os.path.basename(p)[:-8].split('-')[2]) for p in paths), default=0)
+
+    def stats(self):
+        paths = self.parts()
+        return {
+            'days': len(self._days()),
+            'files': len(paths),
+            'bytes': sum(os.path.getsize(p) for p in paths),
+            'rows': sum(pq.ParquetFile(p).metadata.num_rows for p in paths),
+        }
+
+
+def open_archive(root=ARCHIVE_DIR):
+    """EventArchive when pyarrow is installed, else None"""
+    return EventArchive(root) if available() else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive cold events to day-partitioned Parquet")
+    parser.add_argument("command", choices=["run", "stats"])
+    parser.add_argument("--db", type=str, default="events.db")
+    parser.add_argument("--dir", type=str, default=ARCHIVE_DIR)
+    parser.add_argument("--hot-days", type=int, default=HOT_DAYS)
+    args = parser.parse_args()
+
+    store = EventArchive(args.dir)
+    if args.command == "run":
+        conn = sqlite3.connect(args.db)
+        moved = rollups.apply_retention(conn, args.hot_days, archive=store)
+        conn.close()
+        print(f"[*] Archived {moved} events older than {args.hot_days} days to {args.dir}/, "
+              f"pruned {store.prune()} expired days")
+    print(f"[*] Archive: {store.stats()}")
@@ -0,0 +1,315 @@
+"""
+Single-pass parser for auditd log records.
+
+Records belonging to the same event (same msg=audit(ts:serial) ID) are grouped
+into an AuditEvent. Each record type has one anchored pattern that follows
+auditd's fixed field order; the parser joins the types it needs into a single
+alternation and runs it once over the whole batch, so there is no `.*`
+backtracking, the text is scanned once however many types are wanted, and
+lines of other types (PROCTITLE, USER_*, ...) are never touched from Python.
+The remaining key=value fields of a SYSCALL record are tokenized at most once,
+on first access.
+"""
+import re
+
+EVENT_RECORD_TYPES = frozenset(('SYSCALL', 'EXECVE', 'PATH', 'CWD', 'SOCKADDR'))
+
+# SYSCALL arch= values (AUDIT_ARCH_*)
+ARCH_X86_64 = 'c000003e'
+ARCH_I386 = '40000003'
+
+# Every syscall setup_audit_rules.sh audits, one row per class:
+#   (class, rule key, ((name, x86_64 number, i386 number), ...))
+# None where an arch has no such call. The features count classes, so a
+# rule for a new syscall only needs a row (or a name) here.
+SYSCALL_TABLE = (
+    ('open', 'file_open', (('open', 2, 5), ('openat', 257, 295), ('creat', 85, 8))),
+    ('unlink', 'file_delete', (('unlink', 87, 10), ('unlinkat', 263, 301), ('rmdir', 84, 40))),
+    ('stat', 'file_stat', (('stat', 4, 106), ('lstat', 6, 107), ('fstat', 5, 108),
+                           ('newfstatat', 262, None), ('stat64', None, 195), ('lstat64', None, 196),
+                           ('fstat64', None, 197), ('fstatat64', None, 300))),
+    ('clone', 'process_create', (('clone', 56, 120), ('fork', 57, 2), ('vfork', 58, 190))),
+    ('exec', 'process_exec', (('execve', 59, 11), ('execveat', 322, 358))),
+    ('socket', 'network', (('socket', 41, 359),)),
+    ('connect', 'network', (('connect', 42, 362),)),
+    ('bind', 'network', (('bind', 49, 361),)),
+    ('chmod', 'perm_change', (('chmod', 90, 15), ('fchmod', 91, 94), ('fchmodat', 268, 306))),
+    ('setuid', 'privilege', (('setuid', 105, 23), ('setgid', 106, 46), ('setreuid', 113, 70),
+                             ('setregid', 114, 71), ('setresuid', 117, 164), ('setresgid', 119, 170),
+                             ('setuid32', None, 213), ('setgid32', None, 214), ('setreuid32', None, 203),
+                             ('setregid32', None, 204), ('setresuid32', None, 208),
+                             ('setresgid32', None, 210))),
+    ('exit', 'process_exit', (('exit_group', 231, 252),)),
+)
+
+SYSCALL_CLASSES = tuple(row[0] for row in SYSCALL_TABLE)
+(OPEN, UNLINK, STAT, CLONE, EXEC, SOCKET, CONNECT, BIND, CHMOD, SETUID, EXIT) = range(len(SYSCALL_CLASSES))
+
+# arch -> syscall number (string, as logged) -> class index
+SYSCALL_CLASS = {
+    arch: {str(call[column]): index
+           for index, (_, _, calls) in enumerate(SYSCALL_TABLE)
+           for call in calls if call[column] is not None}
+    for arch, column in ((ARCH_X86_64, 1), (ARCH_I386, 2))
+}
+
+# x86_64 syscall number -> class name
+SYSCALL_MAP = {nr: SYSCALL_CLASSES[index] for nr, index in SYSCALL_CLASS[ARCH_X86_64].items()}
+
+
+def syscall_class(arch, nr):
+    """Class index of a logged (arch, syscall) pair, or None if it is not in SYSCALL_TABLE"""
+    return SYSCALL_CLASS.get(arch, {}).get(nr)
+
+
+# What follows "type=" in each record the parser reads; the first group is
+# always the event ID. auditd always emits "arch= syscall= [per=] success=
+# exit=" in this order.
+RECORD_PATTERNS = {
+    'SYSCALL': r'SYSCALL msg=audit\(([^)]+)\): arch=(\w+) syscall=(\d+) (?:per=\w+ )?success=(\w+) (.*)',
+    'PATH': r'PATH msg=audit\(([^)]+)\): item=\d+ name=("[^"\n]*"|\S+)',
+    'EXECVE': r'EXECVE msg=audit\(([^)]+)\): (.*)',
+    'CWD': r'CWD msg=audit\(([^)]+)\): cwd=("[^"\n]*"|\S+)',
+    'SOCKADDR': r'SOCKADDR msg=audit\(([^)]+)\): saddr=([0-9A-Fa-f]+)',
+    'EOE': r'EOE msg=audit\(([^)]+)\)',
+}
+SYSCALL_RE, PATH_RE, EXECVE_RE, CWD_RE, SOCKADDR_RE, EOE_RE = (
+    re.compile('type=' + RECORD_PATTERNS[t]) for t in ('SYSCALL', 'PATH', 'EXECVE', 'CWD', 'SOCKADDR', 'EOE'))
+STAMP_RE = re.compile(r'msg=audit\((\d+\.\d+):')
+# Process identity in the tail of a SYSCALL record ("... ppid= pid= auid= ... comm= exe=")
+PIDS_RE = re.compile(r' ppid=(\d+) pid=(\d+) ')
+IMAGE_RE = re.compile(r' comm=("[^"\n]*"|\S+) exe=("[^"\n]*"|\S+)')
+
+# Column-oriented variants for batch extraction: whole epoch second only
+SYSCALL_SEC_RE = re.compile(
+    r'type=SYSCALL msg=audit\((\d+)\.\d+:\d+\): arch=(\w+) syscall=(\d+) '
+    r'(?:per=\w+ )?success=(\w+)')
+PATH_SEC_RE = re.compile(r'type=PATH msg=audit\((\d+)\.\d+:\d+\): item=\d+ name=("[^"\n]*"|\S+)')
+
+
+def _numbers(index):
+    return '|'.join(sorted({str(nr) for _, *nrs in SYSCALL_TABLE[index][2] for nr in nrs if nr is not None}))
+
+
+# Only the records of one class, by number; callers drop other-arch matches
+# with syscall_class(). exe is raw (quoted or hex); decode it with decode_value().
+EXEC_SEC_RE = re.compile(
+    r'type=SYSCALL msg=audit\((\d+)\.\d+:\d+\): arch=(\w+) syscall=(' + _numbers(EXEC) + r') '
+    r'[^\n]*? exe=("[^"\n]*"|\S+)')
+CONNECT_SEC_RE = re.compile(
+    r'type=SYSCALL msg=audit\((\d+)\.\d+:(\d+)\): arch=(\w+) syscall=(' + _numbers(CONNECT) + r') ')
+SOCKADDR_SEC_RE = re.compile(r'type=SOCKADDR msg=audit\((\d+)\.\d+:(\d+)\): saddr=([0-9A-Fa-f]+)')
+
+
+def remote_endpoint(saddr):
+    """
+    Port and address of a hex sockaddr, still in hex, for AF_INET/AF_INET6
+    (None for AF_UNIX and the rest)
+    """
+    family = saddr[:4].upper()
+    if family == '0200':
+        return saddr[4:16]
+    if family == '0A00':
+        return saddr[4:8] + saddr[16:48]
+    return None
+
+
+def event_time(line):
+    """Returns the audit epoch timestamp of a line, or None if it has none"""
+    m = STAMP_RE.search(line)
+    return float(m.group(1)) if m else None
+
+
+def decode_value(raw):
+    """
+    Decodes an audit string value. Quoted values are taken verbatim; auditd
+    writes values containing special characters as unquoted hex.
+    """
+    if raw[:1] == '"':
+        return raw[1:-1]
+    if raw == '(null)' or not raw:
+        return None
+    try:
+        return bytes.fromhex(raw).decode('utf-8', 'replace')
+    except ValueError:
+        return raw
+
+
+def tokenize(body):
+    """Splits the key=value body of a record into a dict (quotes stripped)"""
+    fields = {}
+    for tok in body.split():
+        key, sep, value = tok.partition('=')
+        if sep:
+            if value[:1] in ('"', "'"):
+                value = value[1:-1]
+            fields[key] = value
+    return fields
+
+
+class AuditEvent:
+    """All SYSCALL/EXECVE/PATH/CWD/SOCKADDR records sharing one audit event ID"""
+    __slots__ = ('stamp', 'arch', 'syscall', 'success', 'paths', 'argv', 'cwd', 'saddr',
+                 '_rest', '_fields')
+
+    def __init__(self, stamp):
+        self.stamp = stamp
+        self.arch = None
+        self.syscall = None     # syscall number (string), None if no SYSCALL record
+        self.success = None     # 'yes' / 'no'
+        self.paths = []         # decoded PATH name= values
+        self.argv = None        # EXECVE a0..aN
+        self.cwd = None
+        self.saddr = None       # SOCKADDR saddr= (hex)
+        self._rest = None
+        self._fields = None
+
+    @property
+    def timestamp(self):
+        return float(self.stamp.partition(':')[0])
+
+    @property
+    def serial(self):
+        return int(self.stamp.partition(':')[2])
+
+    @property
+    def fields(self):
+        """All remaining SYSCALL key=value fields (pid, ppid, exe, key, ...)"""
+        if self._fields is None:
+            self._fields = tokenize(self._rest) if self._rest else {}
+        return self._fields
+
+    def get(self, key, default=None):
+        return self.fields.get(key, default)
+
+    @property
+    def pids(self):
+        """(pid, ppid) of the SYSCALL record, or None"""
+        m = PIDS_RE.search(self._rest) if self._rest else None
+        return (m.group(2), m.group(1)) if m else None
+
+    @property
+    def image(self):
+        """(comm, exe) of the SYSCALL record, decoded; (None, None) if absent"""
+        m = IMAGE_RE.search(self._rest) if self._rest else None
+        return (decode_value(m.group(1)), decode_value(m.group(2))) if m else (None, None)
+
+
+def records_re(types):
+    """
+    One alternation over the given record types. findall() yields a tuple
+    per record; returns (pattern, {type: index of its event ID group}).
+    Types not asked for point at a trailing empty group, so their ID is ''.
+    """
+    order = [t for t in RECORD_PATTERNS if t in types]
+    offsets, n = {}, 0
+    for t in order:
+        offsets[t] = n
+        n += re.compile(RECORD_PATTERNS[t]).groups
+    pattern = re.compile('type=(?:' + '|'.join(RECORD_PATTERNS[t] for t in order) + ')()')
+    return pattern, {t: offsets.get(t, n) for t in RECORD_PATTERNS}
+
+
+class AuditEventParser:
+    """
+    Incremental parser: feed() raw lines and get back completed events.
+
+    An event is complete when its EOE record arrives. Events that are still
+    open at the end of a batch are kept until the next feed(), or returned by
+    flush(). record_types limits which record types are scanned for, so a
+    consumer that only needs SYSCALL and PATH does not pay for the rest.
+    """
+
+    def __init__(self, record_types=EVENT_RECORD_TYPES):
+        self.record_types = frozenset(record_types)
+        self.pending = {}
+        # complete -> (pattern, offsets); EOE is only scanned for when needed
+        self.patterns = {False: records_re(self.record_types - {'EOE'}),
+                         True: records_re(self.record_types | {'EOE'})}
+
+    def feed(self, lines, complete=True):
+        """
+        Parses a batch of lines and returns the events completed by an EOE
+        record. With complete=False the EOE scan is skipped (parse() flushes
+        everything anyway).
+        """
+        text = lines if isinstance(lines, str) else ''.join(lines)
+        pattern, offsets = self.patterns[bool(complete)]
+        sys_at, path_at, eoe_at = offsets['SYSCALL'], offsets['PATH'], offsets['EOE']
+        execve_at, cwd_at, saddr_at = offsets['EXECVE'], offsets['CWD'], offsets['SOCKADDR']
+        pending = self.pending
+        get = pending.get
+        pop = pending.pop
+        done = []
+
+        # Most frequent record types first
+        for rec in pattern.findall(text):
+            stamp = rec[sys_at]
+            if stamp:
+                ev = get(stamp)
+                if ev is None:
+                    ev = pending[stamp] = AuditEvent(stamp)
+                ev.arch = rec[sys_at + 1]
+                ev.syscall = rec[sys_at + 2]
+                ev.success = rec[sys_at + 3]
+                ev._rest = rec[sys_at + 4]
+                continue
+
+            stamp = rec[path_at]
+            if stamp:
+                name = rec[path_at + 1]
+                if name[:1] == '"':
+                    name = name[1:-1]
+                else:
+                    name = decode_value(name)
+                    if name is None:
+                        continue
+                ev = get(stamp)
+                if ev is None:
+                    ev = pending[stamp] = AuditEvent(stamp)
+                ev.paths.append(name)
+                continue
+
+            stamp = rec[eoe_at]
+            if stamp:
+                ev = pop(stamp, None)
+                if ev is not None:
+                    done.append(ev)
+                continue
+
+            stamp = rec[execve_at]
+            if stamp:
+                fields = tokenize(rec[execve_at + 1])
+                argc = int(fields.get('argc', 0) or 0)
+                ev = get(stamp)
+                if ev is None:
+                    ev = pending[stamp] = AuditEvent(stamp)
+                ev.argv = [fields.get(f'a{n}', '') for n in range(argc)]
+                continue
+
+            stamp = rec[cwd_at]
+            if stamp:
+                ev = get(stamp)
+                if ev is None:
+                    ev = pending[stamp] = AuditEvent(stamp)
+                ev.cwd = decode_value(rec[cwd_at + 1])
+                continue
+
+            stamp = rec[saddr_at]
+            if stamp:
+                ev = get(stamp)
+                if ev is None:
+                    ev = pending[stamp] = AuditEvent(stamp)
+                ev.saddr = rec[saddr_at + 1]
+        return done
+
+    def flush(self):
+        """Returns all still-open events"""
+        done = list(self.pending.values())
+        self.pending = {}
+        return done
+
+    def parse(self, lines):
+        """Parses a self-contained batch of lines into events"""
+        self.feed(lines, complete=False)
+        return self.flush()
@@ -0,0 +1,350 @@
+"""
+Pluggable audit record sources for the live detector and data collection.
+
+A source is an iterator of batches: a list of complete lines (str, with
+their line endings) per read, or None when nothing arrived for `idle`
+seconds, so callers can close event-time windows with windower.tick().
+Data is read in large blocks into one reusable buffer and split
+incrementally (LineBuffer); a partial last line is carried over to the next
+read. The file follower sleeps on inotify (through ctypes) instead of
+polling.
+
+    file:/var/log/audit/audit.log  follow the log from its end, across rotations
+    stdin (or -)                   auditd dispatcher plugin: auditd writes the
+                                   events to our stdin
+    unix:/var/run/audispd_events   the audisp af_unix plugin's socket
+    replay:PATH[@SPEED]            a recorded log (or a directory of rotated
+                                   logs) from the start, SPEED x real time
+                                   (default: as fast as it can be read); ends
+                                   at the end of the log
+
+A bare path means file:PATH. The plugin modes need auditd's "string" format,
+e.g. /etc/audit/plugins.d/sentinel.conf:
+
+    active = yes
+    direction = out
+    path = /usr/bin/python3
+    type = always
+    args = /opt/sentinel/run_supervised_detection.py --source stdin
+    format = string
+
+or, for af_unix.conf: `args = 0640 /var/run/audispd_events string`.
+"""
+import os
+import sys
+import time
+import errno
+import select
+import socket
+import ctypes
+import ctypes.util
+
+from audit_parser import event_time
+from feature_extractor import rotated_logs
+
+BLOCK_SIZE = 64 * 1024
+IDLE = 0.1
+# With inotify the follower sleeps until the file changes; it still wakes
+# this often while idle so event-time windows can be ticked closed
+TICK = 0.5
+
+# <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+FILE_EVENTS = IN_MODIFY | IN_ATTRIB | IN_MOVE_SELF | IN_DELETE_SELF
+DIR_EVENTS = IN_CREATE | IN_MOVED_TO
+
+
+class LineBuffer:
+    """
+    Reads into one reusable bytearray and returns the complete lines, decoded
+    once per read. A partial last line stays at the front of the buffer for
+    the next read; the buffer doubles if a single line outgrows it.
+    """
+
+    def __init__(self, size=BLOCK_SIZE):
+        self.buf = bytearray(size)
+        self.filled = 0
+
+    def read(self, readinto):
+        """
+        readinto(memoryview) -> bytes read (e.g. sock.recv_into); returns
+        (lines, bytes read), bytes read 0 at EOF
+        """
+        if self.filled == len(self.buf):
+            self.buf.extend(bytes(len(self.buf)))
+        with memoryview(self.buf) as view:
+            n = readinto(view[self.filled:])
+            if not n:
+                return [], 0
+            end = self.filled + n
+            cut = self.buf.rfind(b'\n', 0, end) + 1
+            # splitlines() also breaks at other line separators (\r, \x1c, ...);
+            # the windower attaches such stamp-less pieces to the event before
+            # them and the parser joins them back, so nothing changes downstream
+            lines = str(view[:cut], 'utf-8', 'replace').splitlines(keepends=True) if cut else []
+        self.buf[:end - cut] = self.buf[cut:end]
+        self.filled = end - cut
+        return lines, n
+
+    def flush(self):
+        """The unterminated last line, if any"""
+        tail = self.buf[:self.filled].decode('utf-8', 'replace')
+        self.filled = 0
+        return [tail + '\n'] if tail else []
+
+
+def _fd_reader(fd):
+    return lambda view: os.readv(fd, [view])
+
+
+class Inotify:
+    """Minimal inotify(7) binding through ctypes; available() is False off Linux"""
+
+    _libc = None
+
+    @classmethod
+    def available(cls):
+        if cls._libc is None:
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+                libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+                cls._libc = libc
+            except (OSError, AttributeError, TypeError):
+                cls._libc = False
+        return bool(cls._libc)
+
+    def __init__(self):
+        if not self.available():
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), path)
+        return wd
+
+    def remove(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def wait(self, timeout):
+        """Blocks until an event or timeout; returns True if events arrived (drained)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _drain(fd, buffer):
+    """Reads fd to its current end; yields the line batches"""
+    read = _fd_reader(fd)
+    while True:
+        lines, n = buffer.read(read)
+        if lines:
+            yield lines
+        if not n:
+            return
+
+
+def follow_file(path, from_start=False, block_size=BLOCK_SIZE, idle=None):
+    """
+    Follows path like `tail -F`: blocks on inotify until the file changes
+    (polls every IDLE seconds where inotify is unavailable) and yields None
+    after `idle` quiet seconds (default TICK, or IDLE when polling).
+
+    Rotation: when a new file appears under the name, the old one is read to
+    its end first (the writer has moved on, so nothing more will arrive there)
+    and the new file is then read from its start, so no line is lost.
+    A truncated file is re-read from the start.
+    """
+    notify = Inotify() if Inotify.available() else None
+    idle = idle or (TICK if notify else IDLE)
+    try:
+        if notify:
+            # Wakes the loop when the file is created or rotated; the events
+            # themselves are not inspected, the loop re-stats the path
+            notify.add(os.path.dirname(os.path.abspath(path)), DIR_EVENTS)
+        while not os.path.exists(path):
+            print(f"Waiting for {path} to exist...")
+            notify.wait(1.0) if notify else time.sleep(1)
+        fd = os.open(path, os.O_RDONLY)
+        file_wd = notify.add(path, FILE_EVENTS) if notify else None
+        if not from_start:
+            os.lseek(fd, 0, os.SEEK_END)
+        buffer = LineBuffer(block_size)
+        try:
+            while True:
+                got = False
+                for lines in _drain(fd, buffer):
+                    got = True
+                    yield lines
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    st = None  # moved away, the new file is not there yet
+                if st is not None and st.st_ino != os.fstat(fd).st_ino:
+                    # Rotated: finish the old file, then switch
+                    yield from _drain(fd, buffer)
+                    lines = buffer.flush()
+                    if lines:
+                        yield lines
+                    print("\n[INFO] Log rotation detected! Reopening file...")
+                    new_fd = os.open(path, os.O_RDONLY)
+                    os.close(fd)
+                    fd = new_fd
+                    if notify:
+                        notify.remove(file_wd)
+                        file_wd = notify.add(path, FILE_EVENTS)
+                    continue
+                if st is not None and st.st_size < os.lseek(fd, 0, os.SEEK_CUR):
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    buffer.flush()
+                    continue
+                if got:
+                    continue
+                if notify:
+                    if not notify.wait(idle):
+                        yield None
+                else:
+                    time.sleep(idle)
+                    yield None
+        finally:
+            os.close(fd)
+    finally:
+        if notify:
+            notify.close()
+
+
+def read_stream(fd, block_size=BLOCK_SIZE, idle=IDLE):
+    """A pipe or stdin (auditd plugin mode); ends at EOF"""
+    buffer = LineBuffer(block_size)
+    read = _fd_reader(fd)
+    while True:
+        ready, _, _ = select.select([fd], [], [], idle)
+        if not ready:
+            yield None
+            continue
+        lines, n = buffer.read(read)
+        if not n:
+            break
+        if lines:
+            yield lines
+    lines = buffer.flush()
+    if lines:
+        yield lines
+
+
+def read_socket(path, block_size=BLOCK_SIZE, idle=IDLE, retry=1.0):
+    """The audisp af_unix plugin socket; reconnects when auditd restarts"""
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+        except OSError as e:
+            sock.close()
+            if e.errno not in (errno.ENOENT, errno.ECONNREFUSED):
+                raise
+            time.sleep(retry)
+            yield None
+            continue
+        sock.settimeout(idle)
+        buffer = LineBuffer(block_size)
+        try:
+            while True:
+                try:
+                    lines, n = buffer.read(sock.recv_into)
+                except socket.timeout:
+                    yield None
+                    continue
+                if not n:
+                    break
+                if lines:
+                    yield lines
+        finally:
+            sock.close()
+        lines = buffer.flush()
+        if lines:
+            yield lines
+        print(f"\n[INFO] {path} closed, reconnecting...")
+
+
+def replay(path, speed=None, block_size=BLOCK_SIZE):
+    """
+    A recorded log, oldest rotation first. With speed, batches are one event
+    second each and are released at speed x the recorded pace.
+    """
+    buffer = LineBuffer(block_size)
+    start = first = None
+    for log in rotated_logs(path):
+        fd = os.open(log, os.O_RDONLY)
+        try:
+            for lines in _drain(fd, buffer):
+                if speed is None:
+                    yield lines
+                    continue
+                for second in _by_second(lines):
+                    t = event_time(second[0])
+                    if t is not None:
+                        if first is None:
+                            start, first = time.monotonic(), t
+                        delay = start + (t - first) / speed - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                    yield second
+        finally:
+            os.close(fd)
+    lines = buffer.flush()
+    if lines:
+        yield lines
+
+
+def _by_second(lines):
+    """Splits a batch where the whole event second changes"""
+    batch, current = [], None
+    for line in lines:
+        t = event_time(line)
+        second = None if t is None else int(t)
+        if second is not None and second != current and batch:
+            yield batch
+            batch = []
+        if second is not None:
+            current = second
+        batch.append(line)
+    if batch:
+        yield batch
+
+
+def open_source(spec, **kwargs):
+    """Source for a spec string (see the module docstring)"""
+    kind, sep, target = spec.partition(':')
+    if not sep:
+        kind, target = ('stdin', '') if spec in ('stdin', '-') else ('file', spec)
+    if kind == 'file':
+        return follow_file(target, **kwargs)
+    if kind == 'stdin':
+        return read_stream(sys.stdin.fileno(), **kwargs)
+    if kind == 'unix':
+        return read_socket(target, **kwargs)
+    if kind == 'replay':
+        path, _, speed = target.partition('@')
+        return replay(path, float(speed) if speed else None, **kwargs)
+    raise ValueError(f"Unknown audit source '{spec}' (file:, stdin, unix:, replay:)")
@@ -0,0 +1,227 @@
+"""
+Password hashing, login rate limiting and validated-token caching for the
+dashboard.
+
+Passwords are stored as salted scrypt hashes
+
+    scrypt$16384$8$1$<salt b64>$<hash b64>
+
+(PBKDF2-SHA256 when OpenSSL has no scrypt). Unsalted SHA-256 hex digests
+written by older versions still verify and are reported as needing an
+upgrade, so login can re-hash them transparently.
+
+The KDF is deliberately slow and memory-hard, so it runs on a small bounded
+pool (PasswordHasher): at most `workers` hashes run at once and at most
+`max_pending` wait, anything beyond that fails fast with Busy instead of
+piling up request threads behind the CPU (a check still waiting after
+`timeout` seconds is reported as Busy too). RateLimiter keeps one token
+bucket per key (client IP, username), in memory, per process. TokenCache
+remembers tokens that already passed jwt.decode() until they expire, so
+the dashboard's polling requests skip the signature check.
+"""
+import os
+import hmac
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+PBKDF2_ITERATIONS = 600_000
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+HASH_WORKERS = 2
+HASH_PENDING = 32
+HASH_TIMEOUT = 10.0
+
+# (burst, per seconds): attempts allowed per client IP / per username
+LOGIN_IP_LIMIT = (20, 60.0)
+LOGIN_USER_LIMIT = (5, 60.0)
+
+TOKEN_CACHE_SIZE = 1024
+
+
+class Busy(Exception):
+    """The hashing pool is saturated; retry later"""
+
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+def _scrypt_available():
+    try:
+        hashlib.scrypt(b'', salt=b'0' * SALT_BYTES, n=2, r=1, p=1)
+        return True
+    except (AttributeError, ValueError):
+        return False
+
+
+SCRYPT = _scrypt_available()
+
+
+def hash_password(password, salt=None):
+    salt = salt or os.urandom(SALT_BYTES)
+    if SCRYPT:
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+                                dklen=HASH_BYTES)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, PBKDF2_ITERATIONS, HASH_BYTES)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(digest)}"
+
+
+def needs_upgrade(stored):
+    """True for hashes weaker than what hash_password() writes now"""
+    if SCRYPT:
+        return stored.split('$')[:4] != ['scrypt', str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+    return stored.split('$')[:2] != ['pbkdf2_sha256', str(PBKDF2_ITERATIONS)]
+
+
+def verify_password(password, stored):
+    """Constant-time check of password against any supported stored hash"""
+    parts = stored.split('$')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            n, r, p = (int(v) for v in parts[1:4])
+            salt, expected = base64.b64decode(parts[4]), base64.b64decode(parts[5])
+            digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=len(expected),
+                                    maxmem=128 * r * (n + p + 2))
+        elif parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            salt, expected = base64.b64decode(parts[2]), base64.b64decode(parts[3])
+            digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, int(parts[1]), len(expected))
+        elif len(stored) == 64:
+            # Legacy unsalted SHA-256
+            expected, digest = stored.encode(), hashlib.sha256(password.encode()).hexdigest().encode()
+        else:
+            return False
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(digest, expected)
+
+
+class PasswordHasher:
+    """
+    Runs hash_password / verify_password on a bounded thread pool
+    (hashlib releases the GIL while hashing).
+    """
+
+    def __init__(self, workers=HASH_WORKERS, max_pending=HASH_PENDING, timeout=HASH_TIMEOUT):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kdf")
+        self.slots = threading.BoundedSemaphore(workers + max_pending)
+        self.timeout = timeout
+        # Compared against when the user does not exist, so the response
+        # takes as long as for a wrong password
+        self.dummy = hash_password(os.urandom(16).hex())
+
+        # Counters (updated from every request thread)
+        self.lock = threading.Lock()
+        self.hashed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _run(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise Busy('Too many password checks in progress')
+        try:
+            future = self.pool.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        with self.lock:
+            self.hashed += 1
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Queued behind slow hashes; the hash still finishes and frees its slot
+            with self.lock:
+                self.timed_out += 1
+            raise Busy('Password check timed out') from None
+
+    def hash(self, password):
+        return self._run(hash_password, password)
+
+    def verify(self, password, stored):
+        """stored None (unknown user) still costs one hash, then fails"""
+        return self._run(verify_password, password, stored or self.dummy) and stored is not None
+
+    def stats(self):
+        with self.lock:
+            return {'hashed': self.hashed, 'rejected': self.rejected, 'timed_out': self.timed_out}
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by string: `burst` attempts, refilled continuously
+    at burst/per per second. The least recently used keys are forgotten
+    beyond max_keys (a forgotten key starts again with a full bucket).
+    """
+
+    def __init__(self, burst, per, max_keys=10000):
+        self.burst = float(burst)
+        self.rate = burst / per
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.limited = 0
+
+    def allow(self, key, now=None):
+        """Takes one token; returns (allowed, seconds until the next token)"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            tokens, last = self.buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.limited += 1
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / self.rate
+
+    def refund(self, key):
+        """Gives back the token an allow() took for an attempt that was not made"""
+        with self.lock:
+            if key in self.buckets:
+                tokens, last = self.buckets[key]
+                self.buckets[key] = (min(self.burst, tokens + 1), last)
+
+
+class TokenCache:
+    """LRU of token -> decoded payload, each entry valid until its 'exp'"""
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        with self.lock:
+            item = self.data.get(token)
+            if item is not None and item[0] > time.time():
+                self.data.move_to_end(token)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self.data[token]
+            self.misses += 1
+            return None
+
+    def put(self, token, payload):
+        with self.lock:
+            self.data[token] = (payload.get('exp', 0), payload)
+            self.data.move_to_end(token)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def stats(self):
+        return {'size': len(self.data), 'hits': self.hits, 'misses': self.misses}
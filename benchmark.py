@@ -0,0 +1,1219 @@
+"""
+SENTINEL OVERWATCH - Benchmarks
+Usage:
+    python benchmark.py parser [--log /var/log/audit/audit.log] [--window 100 1000 5000]
+    python benchmark.py sources [--events 200000]
+    python benchmark.py features [--seconds 80]
+    python benchmark.py processes [--seconds 60] [--churn 40]
+    python benchmark.py rolling [--windows 20000]
+    python benchmark.py inference [--model-dir .]
+    python benchmark.py startup [--model-dir .]
+    python benchmark.py compiled [--model-dir .] [--data labeled_data.csv]
+    python benchmark.py analytics [--rows 30000000] [--db /tmp/sentinel_bench.db]
+    python benchmark.py schema [--rows 5000000]
+    python benchmark.py history [--rows 2678400] [--points 300]
+
+Timing only: that each fast path returns what its baseline did is checked
+by the tests (python -m pytest tests). The synthetic logs and the legacy
+baselines are shared with them in tests/helpers.py.
+"""
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+import subprocess
+from collections import defaultdict
+
+from feature_extractor import AuditFeatureExtractor, FEATURE_NAMES, features_to_vector
+from tests.helpers import (BEHAVIOURS, LEGACY_ANALYTICS, LegacyRegexExtractor, legacy_ensemble_predict,
+                           legacy_export_csv, schema_queries, seed_events, split_windows,
+                           synthesize_audit_log, synthesize_behaviour_log)
+
+# ============ SYNTHETIC AUDIT LOG ============
+def load_log(path):
+    if path:
+        with open(path, 'r', errors='replace') as f:
+            return f.readlines()
+    return synthesize_audit_log()
+
+# ============ PARSER ============
+def time_windows(extractor, windows, repeat):
+    best = float('inf')
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [extractor.process_window(w) for w in windows]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+def bench_parser(args):
+    lines = load_log(args.log)
+    print(f"[*] {len(lines)} lines ({'recorded: ' + args.log if args.log else 'synthetic log'}), "
+          f"best of {args.repeat}")
+
+    print(f"\n{'Lines/window':<14} {'regex (legacy)':>16} {'single-pass':>16} {'speedup':>9}")
+    print("-" * 58)
+    for size in args.window:
+        windows = split_windows(lines, size)
+        legacy_t, _ = time_windows(LegacyRegexExtractor(), windows, args.repeat)
+        new_t, _ = time_windows(AuditFeatureExtractor(), windows, args.repeat)
+        print(f"{size:<14} {len(lines) / legacy_t:>11,.0f} l/s {len(lines) / new_t:>11,.0f} l/s "
+              f"{legacy_t / new_t:>8.2f}x")
+
+# ============ INPUT SOURCES ============
+def legacy_follow(path):
+    """The old follow() read path, one readline() and one yield per line (idle sleep left out)"""
+    with open(path, 'r') as f:
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            yield line
+
+def bench_sources(args):
+    """Reading throughput and wake-up latency of the audit input sources"""
+    import tempfile
+    import threading
+    import audit_sources
+
+    workdir = tempfile.mkdtemp()
+    log = os.path.join(workdir, 'audit.log')
+    lines = synthesize_audit_log(args.events)
+    with open(log, 'w') as f:
+        f.writelines(lines)
+    n = len(lines)
+    size_mb = os.path.getsize(log) / 1e6
+    print(f"[*] {n:,} lines ({size_mb:.1f} MB)")
+
+    def drain(batches):
+        count = 0
+        for batch in batches:
+            if batch is None:
+                break
+            count += len(batch)
+            if count >= n:
+                break
+        batches.close()
+        return count
+
+    def best(name, run):
+        runs = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            count = run()
+            runs.append(time.perf_counter() - t0)
+        results.append((name, min(runs), count))
+
+    def tail_f():
+        proc = subprocess.Popen(['tail', '-F', '-n', '+1', log], stdout=subprocess.PIPE, text=True)
+        count = 0
+        while count < n and proc.stdout.readline():
+            count += 1
+        proc.terminate()
+        proc.wait()
+        return count
+
+    results = []
+    best('readline (old follow)', lambda: sum(1 for _ in legacy_follow(log)))
+    best('tail -F subprocess', tail_f)
+    best('file: (blocks)', lambda: drain(audit_sources.follow_file(log, from_start=True)))
+    best('replay:', lambda: drain(audit_sources.replay(log)))
+
+    print(f"\n{'Source':<24} {'Seconds':<10} {'Lines/sec':<14} lines")
+    print("-" * 58)
+    for name, seconds, count in results:
+        print(f"{name:<24} {seconds:<10.3f} {count / seconds:<14,.0f} {count:,}")
+
+    # Wake-up latency: a writer thread appends one line at random times
+    def latency(source, write):
+        sent = []
+        def writer():
+            for _ in range(args.samples):
+                time.sleep(random.uniform(0.05, 0.25))
+                sent.append(time.perf_counter())
+                write(lines[0])
+        thread = threading.Thread(target=writer)
+        thread.start()
+        samples = []
+        for batch in source:
+            if batch:
+                now, done = time.perf_counter(), len(samples)
+                samples.extend((now - sent[done + i]) * 1000 for i in range(len(batch)))
+                if len(samples) >= args.samples:
+                    break
+        source.close()
+        thread.join()
+        samples.sort()
+        return samples[len(samples) // 2], samples[-1]
+
+    live_log = os.path.join(workdir, 'live.log')
+    open(live_log, 'w').close()
+    with open(live_log, 'a') as f:
+        def append(line):
+            f.write(line)
+            f.flush()
+        file_p50, file_max = latency(audit_sources.follow_file(live_log), append)
+    r, w = os.pipe()
+    pipe_p50, pipe_max = latency(audit_sources.read_stream(r), lambda line: os.write(w, line.encode()))
+    os.close(w)
+    print(f"\nLatency, append -> batch ({args.samples} lines): file: p50 {file_p50:.1f} ms, max {file_max:.1f} ms; "
+          f"stdin/pipe: p50 {pipe_p50:.2f} ms, max {pipe_max:.2f} ms")
+
+    # Idle cost: CPU time while following a quiet file
+    def idle_cpu(make_source):
+        source = make_source()
+        next(source)
+        t0, c0 = time.perf_counter(), time.process_time()
+        while time.perf_counter() - t0 < args.idle:
+            next(source)
+        source.close()
+        return (time.process_time() - c0) / args.idle * 100
+    def legacy_poll():
+        # The old follow(): readline, sleep 100 ms, stat for rotation
+        with open(live_log) as f:
+            f.seek(0, 2)
+            while True:
+                if not f.readline():
+                    time.sleep(0.1)
+                    os.stat(live_log)
+                    yield None
+    print(f"Idle CPU over {args.idle:.0f}s: old 100 ms poll {idle_cpu(legacy_poll):.3f}%, "
+          f"inotify follower {idle_cpu(lambda: audit_sources.follow_file(live_log)):.3f}%")
+
+# ============ PROCESS ATTRIBUTION ============
+def synthesize_process_log(seconds=60, attack=(20, 40), churn=40, start=1700000000, seed=7):
+    """
+    One list of lines per second from a small process tree: nginx workers
+    under systemd (benign file reads), a shell spawning short-lived `ls`
+    processes (churn new PIDs per second, each exits), and from the attack
+    seconds on, python 5678 under that shell with 12 children deleting and
+    rewriting files.
+    """
+    rng = random.Random(seed)
+    serial = 0
+    next_pid = 10000
+    tree = {'1': ('0', 'systemd', '/usr/lib/systemd/systemd'), '400': ('1', 'sshd', '/usr/sbin/sshd'),
+            '2000': ('400', 'bash', '/usr/bin/bash')}
+    tree.update({str(p): ('1', 'nginx', '/usr/sbin/nginx') for p in range(3000, 3020)})
+    attackers = ['5678'] + [str(p) for p in range(5679, 5691)]
+
+    def record(lines, t, pid, nr, path=None, success='yes'):
+        nonlocal serial
+        serial += 1
+        ppid, comm, exe = tree[pid]
+        stamp = f"{t + serial % 1000 / 1000:.3f}:{serial}"
+        lines.append(f'type=SYSCALL msg=audit({stamp}): arch=c000003e syscall={nr} success={success} exit=0 '
+                     f'a0=3 a1=0 a2=0 a3=0 items={1 if path else 0} ppid={ppid} pid={pid} auid=1000 uid=1000 '
+                     f'gid=1000 euid=1000 suid=1000 fsuid=1000 egid=1000 sgid=1000 fsgid=1000 tty=pts0 '
+                     f'ses=2 comm="{comm}" exe="{exe}" subj=unconfined key=(null)\n')
+        if path:
+            lines.append(f'type=PATH msg=audit({stamp}): item=0 name="{path}" inode=1 dev=08:01 mode=0100644\n')
+        lines.append(f'type=EOE msg=audit({stamp}): \n')
+
+    out = []
+    for second in range(seconds):
+        t, lines = start + second, []
+        for _ in range(600):
+            record(lines, t, str(rng.randint(3000, 3019)), rng.choice(('2', '257')),
+                   f"/var/www/html/page_{rng.randint(0, 80)}.html")
+        for _ in range(churn):
+            pid = str(next_pid)
+            next_pid += 1
+            tree[pid] = ('2000', 'ls', '/usr/bin/ls')
+            record(lines, t, '2000', '56')
+            record(lines, t, pid, '59', '/usr/bin/ls')
+            record(lines, t, pid, '257', f"/home/user/dir_{rng.randint(0, 20)}")
+            record(lines, t, pid, '231')
+        if attack[0] <= second < attack[1]:
+            tree['5678'] = ('2000', 'python3', '/usr/bin/python3.11')
+            for p in attackers[1:]:
+                tree[p] = ('5678', 'python3', '/usr/bin/python3.11')
+            for _ in range(200):
+                pid, victim = rng.choice(attackers), f"/home/user/docs/file_{rng.randint(0, 5000)}.txt"
+                record(lines, t, pid, '257', victim)
+                record(lines, t, pid, '257', victim + '.enc')
+                record(lines, t, pid, '87', victim, success='no' if rng.random() < 0.12 else 'yes')
+                record(lines, t, pid, '1')
+            for _ in range(30):
+                record(lines, t, '5678', '56')
+        out.append(lines)
+    return out
+
+def bench_processes(args):
+    import json
+    import numpy as np
+    import process_tree
+    from model_store import XGBoostArrays
+    model = XGBoostArrays.from_json(os.path.join(args.model_dir, "xgboost_model.json"))
+    names = list(getattr(model, 'feature_names_in_', FEATURE_NAMES))
+    windows = synthesize_process_log(args.seconds, churn=args.churn)
+    attack = (20, 40)
+    print(f"[*] {args.seconds} one-second windows, {sum(map(len, windows)):,} lines, "
+          f"attack in seconds {attack[0]}-{attack[1] - 1}, {args.churn} new PIDs per second")
+
+    extractor = AuditFeatureExtractor()
+    x = np.zeros((1, len(names)), dtype=np.float32)
+
+    def host_only(tracker=None):
+        results = []
+        t0 = time.perf_counter()
+        for i, lines in enumerate(windows):
+            events = extractor.parser.parse(lines)
+            features_to_vector(extractor.process_events(events), names, out=x[0])
+            prob = model.predict_proba(x)[0, 1]
+            culprit = None
+            if tracker is not None:
+                tracker.observe(events, i)
+                culprit = tracker.close_window(i)
+            results.append((prob, culprit))
+        return time.perf_counter() - t0, results
+
+    base = min(host_only()[0] for _ in range(args.repeat))
+    runs = []
+    for _ in range(args.repeat):
+        tracker = process_tree.ProcessTracker(model, names, snapshot_file=None)
+        runs.append(host_only(tracker))
+    tracked, results = min(runs, key=lambda r: r[0])
+    n = len(windows)
+    print(f"\nPer window: host features + model {base / n * 1000:.2f} ms; "
+          f"with per-process subtrees + top-{process_tree.TOP_K} scoring {tracked / n * 1000:.2f} ms "
+          f"(+{(tracked - base) / n * 1000:.2f} ms)")
+
+    attack_pids = {'5678'} | {str(p) for p in range(5679, 5691)}
+    critical = [(i, c) for i, (prob, c) in enumerate(results) if prob > 0.5]
+    in_attack = [(i, c) for i, c in critical if attack[0] <= i < attack[1]]
+    blamed = sum(1 for _, c in in_attack if c and c['pid'] in attack_pids)
+    root = sum(1 for _, c in in_attack if c and c['pid'] == '5678')
+    print(f"CRITICAL windows: {len(critical)} ({len(in_attack)} during the attack); "
+          f"culprit in the attack subtree: {blamed}/{len(in_attack)}, its root 5678: {root}/{len(in_attack)}")
+    for i, c in in_attack[:3]:
+        print(f"    second {i}: pid {c['pid']} {c['name']} ({c['exe']}), p={c['probability']:.3f}, "
+              f"{c['processes']} processes" if c else f"    second {i}: no culprit")
+    snapshot = tracker.snapshot()
+    print(f"Snapshot: {len(json.dumps(snapshot)) / 1024:.1f} KB, {len(snapshot['top'])} scored subtrees, "
+          f"{len(snapshot['critical'])} attributions kept")
+
+    # PID churn: memory stays bounded
+    tracker = process_tree.ProcessTracker(model, names, max_pids=args.max_pids, snapshot_file=None)
+    churn = synthesize_process_log(args.seconds, attack=(0, 0), churn=args.churn * 20, seed=3)
+    peak = 0
+    for i, lines in enumerate(churn):
+        tracker.observe(extractor.parser.parse(lines), i)
+        peak = max(peak, len(tracker.procs))
+        tracker.close_window(i)
+    print(f"PID churn: {args.churn * 20 * args.seconds:,} short-lived PIDs, max_pids={args.max_pids}: "
+          f"peak {peak:,} tracked, {tracker.stats()}")
+    no_exit = process_tree.ProcessTracker(model, names, max_pids=args.max_pids, snapshot_file=None)
+    peak = 0
+    for i, lines in enumerate(churn):
+        no_exit.observe(extractor.parser.parse([l for l in lines if ' syscall=231 ' not in l]), i)
+        peak = max(peak, len(no_exit.procs))
+        no_exit.close_window(i)
+    print(f"    without exit records (LRU only): peak {peak:,} tracked, {no_exit.stats()}")
+
+# ============ FEATURES ============
+class SixFeatureExtractor(AuditFeatureExtractor):
+    """The six-feature extractor before the syscall table, kept as the CPU baseline"""
+    CLASSES = {'2': 'open', '257': 'open', '85': 'open', '87': 'unlink', '263': 'unlink', '84': 'unlink',
+               '56': 'clone', '57': 'clone', '58': 'clone', '59': 'exec'}
+
+    def __init__(self):
+        super().__init__()
+        from audit_parser import AuditEventParser
+        self.parser = AuditEventParser(record_types=('SYSCALL', 'PATH'))
+
+    def process_events(self, events):
+        stats = defaultdict(int)
+        unique_files = set()
+        for ev in events:
+            if ev.syscall is not None:
+                stats['syscalls'] += 1
+                if ev.success == 'no':
+                    stats['failed'] += 1
+                kind = self.CLASSES.get(ev.syscall)
+                if kind:
+                    stats[kind] += 1
+            if ev.paths:
+                unique_files.update(ev.paths)
+        return {
+            'syscall_rate': stats['syscalls'],
+            'open_unlink_ratio': stats['open'] / max(stats['unlink'], 1),
+            'unique_files_accessed': len(unique_files),
+            'failed_syscall_ratio': stats['failed'] / max(stats['syscalls'], 1),
+            'process_spawn_rate': stats['clone'] + stats['exec'],
+            'file_churn_rate': stats['unlink'],
+        }
+
+def bench_features(args):
+    from feature_extractor import EXTENDED_FEATURE_NAMES
+
+    behaviour_log = synthesize_behaviour_log(args.seconds)
+    new, old = AuditFeatureExtractor(), SixFeatureExtractor()
+    rows = defaultdict(list)
+    for behaviour, lines in behaviour_log:
+        rows[behaviour].append(new.process_window(lines))
+    shown = ['process_spawn_rate', 'file_churn_rate', 'failed_syscall_ratio'] + EXTENDED_FEATURE_NAMES
+    print(f"\nMean per window ({args.seconds} windows, same background load in each):")
+    print(f"{'':<22}" + "".join(f"{b:>22}" for b in BEHAVIOURS))
+    for name in shown:
+        print(f"{name:<22}" + "".join(f"{sum(r[name] for r in rows[b]) / len(rows[b]):>22.2f}" for b in BEHAVIOURS))
+
+    # CPU per window: parse + features, six-feature extractor vs the table-driven one
+    plain = split_windows(synthesize_audit_log(), 5000)
+    mixed = [lines for _, lines in behaviour_log]
+    print(f"\n{'Per window (parse + features)':<34} {'six features':>14} {'all features':>14}")
+    for label, windows in (('synthetic log, 5000 lines', plain), ('behaviour log', mixed)):
+        old_t, _ = time_windows(old, windows, args.repeat)
+        new_t, _ = time_windows(new, windows, args.repeat)
+        print(f"{label:<34} {old_t / len(windows) * 1000:>11.2f} ms {new_t / len(windows) * 1000:>11.2f} ms"
+              f"  ({new_t / old_t - 1:+.0%})")
+
+# ============ ROLLING FEATURES ============
+def legacy_rolling(history, features, spans):
+    """Rebuild-a-DataFrame baseline: the same statistics from the last max(spans) windows"""
+    import math
+    import pandas as pd
+    history.append(features)
+    df = pd.DataFrame(list(history))
+    out = {}
+    for span in spans:
+        recent = df.tail(span)
+        mean, std = recent.mean(), recent.std(ddof=0)
+        ewma = df.ewm(alpha=1 - math.exp(-1 / span), adjust=False).mean().iloc[-1]
+        for name in df.columns:
+            out[f'{name}_mean_{span}s'] = mean[name]
+            out[f'{name}_std_{span}s'] = std[name]
+            out[f'{name}_ewma_{span}s'] = ewma[name]
+    return out
+
+def bench_rolling(args):
+    import tempfile
+    from collections import deque
+    import numpy as np
+    import pandas as pd
+    from feature_extractor import RollingFeatures, ALL_FEATURE_NAMES, ROLLING_SPANS
+
+    # Sparse windows: about one second in ten has no records, with a few long gaps
+    rng = np.random.default_rng(5)
+    starts = np.cumsum(rng.choice([1, 1, 1, 1, 1, 1, 1, 1, 1, 2], size=args.windows))
+    starts[args.windows // 3:] += 400
+    starts[args.windows // 2:] += 37
+    values = rng.gamma(2.0, 50.0, size=(args.windows, len(ALL_FEATURE_NAMES)))
+    values[:, :3] = np.round(values[:, :3])
+    frame = pd.DataFrame(values, index=pd.Index(1700000000 + starts, name='window'),
+                         columns=ALL_FEATURE_NAMES)
+    print(f"[*] {args.windows} windows with gaps, best of {args.repeat}")
+
+    # Per-window cost: the span length does not matter; a rebuilt DataFrame does
+    dicts = frame.to_dict('records')
+    print(f"\n{'Per window':<40} {'us':>10}")
+    for label, spans in (('ring buffers 5s/60s/300s', ROLLING_SPANS), ('ring buffers 5s/60s/3600s', (5, 60, 3600))):
+        best = float('inf')
+        for _ in range(args.repeat):
+            rolling = RollingFeatures(spans=spans)
+            t0 = time.perf_counter()
+            for start, features in zip(frame.index, dicts):
+                rolling.add(dict(features), start)
+            best = min(best, time.perf_counter() - t0)
+        print(f"{label:<40} {best / len(dicts) * 1e6:>10.1f}")
+    n = min(len(dicts), 1000)
+    history = deque(maxlen=max(ROLLING_SPANS))
+    t0 = time.perf_counter()
+    for features in dicts[:n]:
+        legacy_rolling(history, features, ROLLING_SPANS)
+    print(f"{'DataFrame rebuilt per window (300 rows)':<40} {(time.perf_counter() - t0) / n * 1e6:>10.1f}")
+
+    # Offline: parse_file with and without the rolling columns
+    with tempfile.TemporaryDirectory() as workdir:
+        log = os.path.join(workdir, 'audit.log')
+        with open(log, 'w') as f:
+            f.writelines(line for _, lines in synthesize_behaviour_log(args.seconds) for line in lines)
+        times = {}
+        for rolling in (False, True):
+            t0 = time.perf_counter()
+            AuditFeatureExtractor().parse_file(log, rolling=rolling)
+            times[rolling] = time.perf_counter() - t0
+    print(f"\nparse_file, {args.seconds}s behaviour log: {times[False]:.2f}s, "
+          f"with rolling columns {times[True]:.2f}s")
+
+# ============ INFERENCE ============
+def per_call_ms(fn, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for row in rows:
+            fn(row)
+        best = min(best, (time.perf_counter() - start) / len(rows))
+    return best * 1000
+
+def bench_inference(args):
+    import pickle
+    import pandas as pd
+    import numpy as np
+
+    rows = pd.read_csv(args.data).drop(columns=['label'])[FEATURE_NAMES]
+    rows = rows.head(args.rows).to_dict('records')
+    print(f"[*] {len(rows)} windows from {args.data}")
+    print(f"\n{'Path':<34} {'ms/window':<12}")
+    print("-" * 46)
+
+    # Detector path (XGBoost only)
+    with open(os.path.join(args.model_dir, "xgboost_model.pkl"), "rb") as f:
+        model = pickle.load(f)
+
+    def xgb_legacy(features):
+        df = pd.DataFrame([features])
+        return model.predict_proba(df)[0][1], model.predict(df)[0]
+
+    x = np.zeros((1, len(FEATURE_NAMES)), dtype=np.float32)
+
+    def xgb_vector(features):
+        features_to_vector(features, out=x[0])
+        prob = model.predict_proba(x)[0, 1]
+        return prob, int(prob > 0.5)
+
+    before = per_call_ms(xgb_legacy, rows, args.repeat)
+    after = per_call_ms(xgb_vector, rows, args.repeat)
+    print(f"{'detector DataFrame (legacy)':<34} {before:<12.4f}")
+    print(f"{'detector float32 vector':<34} {after:<12.4f} ({before / after:.1f}x)")
+
+    # Ensemble path
+    if not os.path.exists(os.path.join(args.model_dir, "ensemble_model.pkl")):
+        print("\n[!] ensemble_model.pkl not found - run train_ensemble.py to benchmark the ensemble")
+        return
+    from train_ensemble import EnsembleDetector
+    detector = EnsembleDetector()
+    detector.load(args.model_dir, native=False)
+
+    before = per_call_ms(lambda r: legacy_ensemble_predict(detector, r), rows, args.repeat)
+    after = per_call_ms(detector.predict, rows, args.repeat)
+    print(f"{'ensemble DataFrame (legacy)':<34} {before:<12.4f}")
+    print(f"{'ensemble float32 vector':<34} {after:<12.4f} ({before / after:.1f}x)")
+
+    X = np.array([[r[n] for n in detector.feature_names] for r in rows], dtype=np.float32)
+    start = time.perf_counter()
+    detector.predict_batch(X)
+    batch_ms = (time.perf_counter() - start) * 1000 / len(rows)
+    print(f"{'ensemble batch matrix':<34} {batch_ms:<12.4f}")
+
+    native = EnsembleDetector()
+    if os.path.exists(os.path.join(args.model_dir, "ensemble_model.json")) and native.load(args.model_dir):
+        after = per_call_ms(native.predict, rows, args.repeat)
+        print(f"{'ensemble native tree arrays':<34} {after:<12.4f}")
+
+# ============ STARTUP ============
+STARTUP_NATIVE = """
+import numpy as np
+from model_store import XGBoostArrays
+model = XGBoostArrays.from_json("xgboost_model.json")
+model.predict_proba(np.zeros((1, len(model.feature_names_in_)), dtype=np.float32))
+"""
+
+STARTUP_PICKLE = """
+import pickle, numpy as np
+with open("xgboost_model.pkl", "rb") as f:
+    model = pickle.load(f)
+model.predict_proba(np.zeros((1, model.n_features_in_), dtype=np.float32))
+"""
+
+def cold_start(code, cwd, repeat):
+    """Best wall time of a fresh interpreter that loads the model and scores one row"""
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_startup(args):
+    print(f"\n{'Detector model load':<34} {'seconds':<12}")
+    print("-" * 46)
+    for label, code, name in (("pickle (xgboost import)", STARTUP_PICKLE, "xgboost_model.pkl"),
+                              ("native JSON (numpy only)", STARTUP_NATIVE, "xgboost_model.json")):
+        if not os.path.exists(os.path.join(args.model_dir, name)):
+            print(f"{label:<34} {name} not found")
+            continue
+        print(f"{label:<34} {cold_start(code, args.model_dir, args.repeat):<12.3f}")
+
+# ============ COMPILED EVALUATOR ============
+def bench_compiled(args):
+    """
+    Compiled tree evaluator vs the sklearn/xgboost estimators on the whole
+    labeled dataset (bit parity is checked in tests/test_model_store.py)
+    """
+    import pandas as pd
+    import numpy as np
+    from train_ensemble import EnsembleDetector
+
+    detector = EnsembleDetector()
+    if not detector.load(args.model_dir, native=False):
+        sys.exit(1)
+    df = pd.read_csv(args.data)
+    X = df[detector.feature_names].to_numpy(dtype=np.float32)
+    print(f"[*] {len(X)} rows from {args.data}")
+
+    start = time.perf_counter()
+    detector.predict_batch_reference(X)
+    library_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    detector.predict_batch(X)
+    compiled_ms = (time.perf_counter() - start) * 1000  # includes the one-off compile
+
+    start = time.perf_counter()
+    detector.predict_batch(X)
+    batch_ms = (time.perf_counter() - start) * 1000
+    single = per_call_ms(detector.predict_vector, [X[i:i + 1] for i in range(min(len(X), 200))], 3)
+    print(f"\n{'Path':<34} {'ms':<12}")
+    print("-" * 46)
+    print(f"{'library batch':<34} {library_ms:<12.3f}")
+    print(f"{'compiled batch (first, +compile)':<34} {compiled_ms:<12.3f}")
+    print(f"{'compiled batch':<34} {batch_ms:<12.3f}")
+    print(f"{'compiled single row':<34} {single:<12.4f}")
+
+# ============ ANALYTICS ============
+def bench_analytics(args):
+    import sqlite3
+    from datetime import datetime, timedelta
+    import event_counters
+    import rollups
+    import schema
+
+    # Seeded timestamps are UTC ('unixepoch'); query in the same clock
+    end = datetime.utcnow().replace(microsecond=0)
+    if args.reuse and os.path.exists(args.db):
+        conn = sqlite3.connect(args.db)
+        print(f"[*] Reusing {args.db}")
+    else:
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        conn = sqlite3.connect(args.db)
+        conn.execute("PRAGMA journal_mode=WAL")
+        start = time.perf_counter()
+        seed_events(conn, args.rows, end)
+        print(f"[*] Seeded {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        event_counters.install(conn)
+        rollups.install(conn)
+        print(f"[*] Backfilled counters and rollups in {time.perf_counter() - start:.1f}s")
+    schema.migrate(conn)
+    conn.row_factory = sqlite3.Row
+
+    print(f"\n{'Period':<8} {'raw scan (s)':<14} {'rollups (ms)':<14} {'speedup':<10}")
+    print("-" * 48)
+    for period, days in (('week', 7), ('month', 30), ('year', 365)):
+        since = (end - timedelta(days=days)).replace(hour=0, minute=0, second=0)
+
+        t0 = time.perf_counter()
+        for sql in LEGACY_ANALYTICS.values():
+            [dict(r) for r in conn.execute(sql, (since.strftime('%Y-%m-%d'),))]
+        raw_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        rollups.analytics(conn, since)
+        rollup_ms = (time.perf_counter() - t0) * 1000
+        print(f"{period:<8} {raw_s:<14.3f} {rollup_ms:<14.2f} {raw_s * 1000 / rollup_ms:<10.0f}")
+    conn.close()
+
+def bench_schema(args):
+    """Range queries on a legacy (v0) events.db, then the same file migrated in place"""
+    import sqlite3
+    from datetime import datetime
+    import schema
+
+    end = datetime.now().replace(microsecond=0)
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA journal_mode=WAL")
+    t0 = time.perf_counter()
+    seed_events(conn, args.rows, end)
+    # seed_events writes UTC text; rewrite it as local time like the detector
+    conn.execute("UPDATE events SET timestamp = datetime(timestamp, 'localtime')")
+    conn.commit()
+    print(f"[*] Seeded {args.rows:,} legacy rows in {time.perf_counter() - t0:.1f}s (schema version {schema.version(conn)})")
+
+    queries = schema_queries(end)
+
+    def timed(sql, params):
+        best = float('inf')
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            best = min(best, time.perf_counter() - t0)
+        return best * 1000
+
+    before = [timed(*old) for _, old, _ in queries]
+
+    t0 = time.perf_counter()
+    applied = schema.migrate(conn)
+    migrate_s = time.perf_counter() - t0
+    print(f"[*] Migrated in place to version {schema.version(conn)} in {migrate_s:.1f}s: {', '.join(applied)}")
+
+    print(f"\n{'Query':<30} {'before (ms)':<12} {'after (ms)':<12} {'speedup':<9} plan")
+    print("-" * 100)
+    for (name, _, new), old_ms in zip(queries, before):
+        new_ms = timed(*new)
+        plan = next(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + new[0], new[1])
+                    if row[-1].startswith(('SEARCH', 'SCAN')))
+        print(f"{name:<30} {old_ms:<12.2f} {new_ms:<12.3f} {old_ms / new_ms:<9.0f} {plan}")
+    conn.close()
+
+def bench_history(args):
+    """/api/history payloads: raw rows for a range vs the downsampled series"""
+    import json
+    import sqlite3
+    from datetime import datetime, timedelta
+    import event_counters
+    import history
+    import rollups
+    import schema
+
+    end = datetime.now().replace(microsecond=0)
+    if args.reuse and os.path.exists(args.db):
+        conn = sqlite3.connect(args.db)
+    else:
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        conn = sqlite3.connect(args.db)
+        conn.execute("PRAGMA journal_mode=WAL")
+        seed_events(conn, args.rows, end)
+        # seed_events writes UTC text; the detector writes local time
+        conn.execute("UPDATE events SET timestamp = datetime(timestamp, 'localtime')")
+        conn.commit()
+        schema.migrate(conn)
+        event_counters.install(conn)
+        rollups.install(conn)
+    schema.migrate(conn)
+    conn.row_factory = sqlite3.Row
+
+    def timed(fn):
+        t0 = time.perf_counter()
+        result = fn()
+        return (time.perf_counter() - t0) * 1000, result
+
+    print(f"\n{'Range':<8} {'raw rows':<10} {'raw ms':<10} {'raw KB':<10} "
+          f"{'series ms':<10} {'series KB':<10} {'points':<7} source")
+    print("-" * 84)
+    for name, span in (('1h', timedelta(hours=1)), ('1d', timedelta(days=1)),
+                       ('7d', timedelta(days=7)), ('30d', timedelta(days=30))):
+        start = end - span
+        # Before: the whole range as raw rows (limit large enough to cover it)
+        raw_ms, rows = timed(lambda: [dict(r) for r in conn.execute(
+            "SELECT * FROM events WHERE ts >= ? AND ts < ? ORDER BY id", (int(start.timestamp()), int(end.timestamp())))])
+        raw_kb = len(json.dumps(rows)) / 1024
+        series_ms, data = timed(lambda: history.series(conn, start, end, args.points))
+        series_kb = len(json.dumps(data)) / 1024
+        print(f"{name:<8} {len(rows):<10,} {raw_ms:<10.1f} {raw_kb:<10.0f} {series_ms:<10.1f} {series_kb:<10.1f} "
+              f"{len(data['points']):<7} {data['source']}")
+
+    # Polling: re-fetching the last 100 rows vs only the new ones
+    last_id = conn.execute("SELECT max(id) FROM events").fetchone()[0]
+    full_ms, full = timed(lambda: history.recent(conn, 100))
+    poll_ms, new = timed(lambda: history.recent(conn, 100, since_id=last_id - 1))
+    print(f"\nPoll: limit=100 {full_ms:.2f} ms / {len(json.dumps(full)) / 1024:.1f} KB, "
+          f"since_id {poll_ms:.2f} ms / {len(json.dumps(new)) / 1024:.2f} KB ({len(new)} new row)")
+    conn.close()
+
+def bench_auth(args):
+    """Password KDF cost, token validation with/without the cache, overload and rate limiting"""
+    import sqlite3
+    import hashlib
+    import tempfile
+    import threading
+    import auth
+
+    t0 = time.perf_counter()
+    stored = auth.hash_password('sentinel123')
+    kdf_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    hashlib.sha256(b'sentinel123').hexdigest()
+    sha_us = (time.perf_counter() - t0) * 1e6
+    print(f"\nHash: {stored.split('$')[0]} {kdf_ms:.1f} ms (legacy SHA-256 {sha_us:.1f} us)")
+
+    # Saturate the pool: everything beyond workers + pending fails fast
+    hasher = auth.PasswordHasher(workers=args.workers, max_pending=args.pending)
+    results = defaultdict(int)
+    lock = threading.Lock()
+
+    def attempt():
+        try:
+            outcome = 'ok' if hasher.verify('sentinel123', stored) else 'wrong'
+        except auth.Busy:
+            outcome = 'busy'
+        with lock:
+            results[outcome] += 1
+
+    threads = [threading.Thread(target=attempt) for _ in range(args.attempts)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"Pool ({args.workers} workers, {args.pending} pending), {args.attempts} simultaneous logins: "
+          f"{dict(results)} in {time.perf_counter() - t0:.2f}s")
+
+    limiter = auth.RateLimiter(*auth.LOGIN_USER_LIMIT)
+    allowed = sum(limiter.allow('admin', now=i * 0.1)[0] for i in range(100))
+    print(f"Rate limit {auth.LOGIN_USER_LIMIT[0]}/{auth.LOGIN_USER_LIMIT[1]:.0f}s per user: "
+          f"{allowed} of 100 attempts over 10s allowed")
+
+    # Upgrade on login and token validation, through the app
+    os.chdir(tempfile.mkdtemp())
+    conn = sqlite3.connect('events.db')
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, "
+                 "password_hash TEXT NOT NULL, email TEXT, role TEXT DEFAULT 'analyst', created_at TEXT)")
+    conn.execute("INSERT INTO users (username, password_hash, role) VALUES ('admin', ?, 'admin')",
+                 (hashlib.sha256(b'sentinel123').hexdigest(),))
+    conn.commit()
+    import dashboard_backend as backend
+    client = backend.app.test_client()
+    login = lambda: client.post('/api/auth/login', json={'username': 'admin', 'password': 'sentinel123'})
+    first = login()
+    upgraded = conn.execute("SELECT password_hash FROM users WHERE username = 'admin'").fetchone()[0]
+    again = login()
+    print(f"Legacy hash login: {first.status_code}, stored as {upgraded.split('$')[0]}, "
+          f"next login {again.status_code}")
+
+    token = again.get_json()['token']
+    n = 20000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        backend.jwt.decode(token, backend.app.config['SECRET_KEY'], algorithms=['HS256'])
+    decode_us = (time.perf_counter() - t0) / n * 1e6
+    t0 = time.perf_counter()
+    for _ in range(n):
+        backend.decode_token(token)
+    cached_us = (time.perf_counter() - t0) / n * 1e6
+    print(f"Token check: jwt.decode {decode_us:.1f} us, cached {cached_us:.2f} us")
+    conn.close()
+
+def bench_export(args):
+    import sqlite3
+    import tracemalloc
+    from datetime import datetime, timedelta
+    import event_export
+    import schema
+
+    end = datetime.utcnow().replace(microsecond=0)
+    if args.reuse and os.path.exists(args.db):
+        conn = sqlite3.connect(args.db)
+    else:
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        conn = sqlite3.connect(args.db)
+        seed_events(conn, args.rows, end)
+    schema.migrate(conn)
+    conn.row_factory = sqlite3.Row
+
+    def measure(fn):
+        """Timed run, then a traced run for peak Python memory (tracing is slow)"""
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, elapsed, peak / 2**20
+
+    print(f"\n{'Range':<10} {'legacy s':<10} {'legacy MB':<11} {'stream s':<10} {'stream MB':<11} gz MB")
+    print("-" * 64)
+    fmt = '%Y-%m-%d %H:%M:%S'
+    for label, days in (('day', 1), ('week', 7), ('all', None)):
+        start = (end - timedelta(days=days)).strftime(fmt) if days else None
+        stop = end.strftime(fmt) if days else None
+        _, legacy_s, legacy_mb = measure(lambda: legacy_export_csv(conn, start, stop))
+        # Consume the stream the way a response would: chunk by chunk
+        def stream():
+            return sum(len(chunk) for chunk in event_export.iter_csv_gzip(conn, start, stop))
+        size, stream_s, stream_mb = measure(stream)
+        print(f"{label:<10} {legacy_s:<10.2f} {legacy_mb:<11.1f} {stream_s:<10.2f} {stream_mb:<11.1f} "
+              f"{size / 2**20:.1f}")
+
+    # What analysts pay to get the full export into pandas
+    import archive
+    if archive.available():
+        import io
+        import pandas as pd
+        csv_gz = b''.join(event_export.iter_csv_gzip(conn))
+        t0 = time.perf_counter()
+        frame = pd.read_csv(io.BytesIO(csv_gz), compression='gzip')
+        csv_s = time.perf_counter() - t0
+        parquet = io.BytesIO()
+        event_export.write_parquet(conn, parquet)
+        t0 = time.perf_counter()
+        pd.read_parquet(io.BytesIO(parquet.getvalue()))
+        parquet_s = time.perf_counter() - t0
+        print(f"\npandas load, {len(frame):,} rows: csv.gz {csv_s:.2f}s ({len(csv_gz) / 2**20:.1f} MB), "
+              f"parquet {parquet_s:.2f}s ({len(parquet.getvalue()) / 2**20:.1f} MB)")
+    conn.close()
+
+def bench_alerts(args):
+    """Dispatcher against a local stub provider: slow, flaky on first contact"""
+    import json
+    import sqlite3
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    import alert_dispatcher
+
+    hits, lock = defaultdict(int), threading.Lock()
+
+    class StubProvider(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            to = body.get('to', [body.get('channel')])[0]
+            with lock:
+                hits[to] += 1
+                attempt = hits[to]
+            time.sleep(args.latency)
+            # Every --flaky-th recipient gets a 503 on its first attempt
+            if attempt == 1 and int(hashlib.md5(to.encode()).hexdigest(), 16) % args.flaky == 0:
+                self.send_response(503)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'{"ok": true, "id": "stub"}')
+
+        def log_message(self, *a):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    os.environ.update(RESEND_API_URL=base, SLACK_API_URL=base, RESEND_API_KEY='stub')
+
+    config = {'email_enabled': True, 'slack_enabled': True, 'slack_bot_token': 'stub',
+              'slack_channel': '#alerts', 'alert_cooldown_minutes': 5,
+              'email_recipients': [f'analyst{i}@example.com' for i in range(args.recipients)]}
+    event = {'id': 1, 'status': 'CRITICAL', 'probability': 0.97, 'syscall_rate': 900, 'churn_rate': 40,
+             'timestamp': '2026-10-17 12:00:00'}
+    payload = {'subject': 'bench', 'message': alert_dispatcher.render_message(event)}
+
+    # Old behaviour: every recipient in turn, inside the request
+    t0 = time.perf_counter()
+    for recipient in config['email_recipients']:
+        try:
+            alert_dispatcher.send_email(recipient, payload, config, 10)
+        except alert_dispatcher.DeliveryError:
+            pass
+    alert_dispatcher.send_slack('#alerts', payload, config, 10)
+    sequential_s = time.perf_counter() - t0
+    hits.clear()
+
+    db = os.path.join(tempfile.mkdtemp(), 'alerts.db')
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE alert_history (id INTEGER PRIMARY KEY AUTOINCREMENT, event_id INTEGER, "
+                 "alert_type TEXT, recipient TEXT, sent_at TEXT, status TEXT)")
+    alert_dispatcher.install(conn)
+    dispatcher = alert_dispatcher.AlertDispatcher(db, lambda: config, max_workers=args.workers,
+                                                  base_delay=0.2, poll_interval=0.1)
+    dispatcher.start()
+    t0 = time.perf_counter()
+    results = dispatcher.submit(event, ['email', 'slack'])
+    submit_ms = (time.perf_counter() - t0) * 1000
+    total = args.recipients + 1
+    while dispatcher.sent + dispatcher.failed < total and time.perf_counter() - t0 < 60:
+        time.sleep(0.01)
+    delivered_s = time.perf_counter() - t0
+
+    again = dispatcher.submit({**event, 'id': 2}, ['email', 'slack'])
+    forced = dispatcher.submit(event, ['email'], force=True)
+    retries = conn.execute("SELECT COUNT(*) FROM alert_history WHERE status LIKE '%retry%'").fetchone()[0]
+    dispatcher.close()
+    server.shutdown()
+
+    print(f"\n{total} recipients, {args.latency * 1000:.0f} ms provider latency, {args.workers} workers")
+    print(f"  sequential in request: {sequential_s:.2f}s")
+    print(f"  queued: request returned in {submit_ms:.1f} ms {results}")
+    print(f"  delivered in {delivered_s:.2f}s: sent={dispatcher.sent} failed={dispatcher.failed} "
+          f"retried={dispatcher.retried} (history retry rows: {retries})")
+    print(f"  attempts per recipient: {sorted(set(hits.values()))} (first-attempt 503s retried once)")
+    print(f"  within cooldown: {again}")
+    print(f"  same event, forced: {forced}")
+
+def bench_analysis(args):
+    """Cached/coalesced analysis against the fake LLM (fixed model latency)"""
+    import sqlite3
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    import threat_analysis
+
+    db = os.path.join(tempfile.mkdtemp(), 'analysis.db')
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, status TEXT, "
+                 "probability REAL, syscall_rate INTEGER, churn_rate INTEGER, ai_analysis TEXT)")
+    rng = random.Random(7)
+    events = []
+    for i in range(args.events):
+        critical = rng.random() < 0.3
+        event = {'timestamp': f'2026-10-17 12:{i // 60 % 60:02d}:{i % 60:02d}',
+                 'status': 'CRITICAL' if critical else 'SAFE',
+                 'probability': rng.uniform(0.8, 1.0) if critical else rng.uniform(0.0, 0.2),
+                 'syscall_rate': int(rng.lognormvariate(7 if critical else 5, 0.5)),
+                 'churn_rate': int(rng.lognormvariate(4, 0.7)) if critical else rng.randint(0, 3)}
+        event['id'] = conn.execute("INSERT INTO events (timestamp, status, probability, syscall_rate, churn_rate) "
+                                   "VALUES (?, ?, ?, ?, ?)", tuple(event[k] for k in (
+                                       'timestamp', 'status', 'probability', 'syscall_rate', 'churn_rate'))).lastrowid
+        events.append(event)
+    conn.commit()
+
+    client = threat_analysis.FakeLlmClient(delay=args.latency)
+    service = threat_analysis.AnalysisService(db, client=client)
+    pool = ThreadPoolExecutor(max_workers=args.concurrency)
+
+    # One event opened by many analysts at once
+    t0 = time.perf_counter()
+    list(pool.map(lambda _: service.analyze(dict(events[0])), range(args.concurrency)))
+    burst_s = time.perf_counter() - t0
+    burst_calls = client.calls
+
+    # Every event once (similar events share a verdict), then every event again
+    t0 = time.perf_counter()
+    list(pool.map(lambda e: service.analyze(dict(e)), events))
+    first_s = time.perf_counter() - t0
+    first_calls = client.calls - burst_calls
+    t0 = time.perf_counter()
+    list(pool.map(lambda e: service.analyze(dict(e)), events))
+    repeat_s = time.perf_counter() - t0
+    stored = conn.execute("SELECT COUNT(*) FROM events WHERE ai_analysis IS NOT NULL").fetchone()[0]
+    pool.shutdown()
+
+    print(f"\nfake model latency {args.latency * 1000:.0f} ms, {args.concurrency} concurrent requests")
+    print(f"  same event x{args.concurrency}: {burst_calls} model call(s), {burst_s:.2f}s "
+          f"(uncached: {args.concurrency} calls)")
+    print(f"  {len(events)} distinct events: {first_calls} model calls "
+          f"({len(service.cache)} signatures), {first_s:.2f}s")
+    print(f"  same events again: {client.calls - burst_calls - first_calls} model calls, {repeat_s:.2f}s")
+    print(f"  verdicts stored in events.ai_analysis: {stored}/{len(events)}")
+    print(f"  {service.stats()}")
+
+def _load_client(url, token, path, deadline, results):
+    """One keep-alive client hammering `path` until deadline"""
+    import http.client
+    from urllib.parse import urlsplit
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    headers = {'Authorization': f'Bearer {token}'}
+    latencies, errors = [], 0
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - t0)
+    results.append((latencies, errors))
+
+def _load_process(url, token, path, threads, duration, out):
+    import threading
+    results = []
+    deadline = time.perf_counter() + duration
+    workers = [threading.Thread(target=_load_client, args=(url, token, path, deadline, results))
+               for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    out.put(([l for lat, _ in results for l in lat], sum(e for _, e in results)))
+
+def bench_load(args):
+    """Requests/sec for GET routes at N concurrent keep-alive clients"""
+    import json
+    import sqlite3
+    import tempfile
+    import multiprocessing
+    import urllib.request
+    from datetime import datetime
+
+    server = None
+    url = args.url
+    if url is None:
+        import event_counters
+        import rollups
+        workdir = tempfile.mkdtemp()
+        conn = sqlite3.connect(os.path.join(workdir, 'events.db'))
+        conn.execute("PRAGMA journal_mode=WAL")
+        seed_events(conn, args.rows, datetime.now())
+        event_counters.install(conn)
+        rollups.install(conn)
+        conn.close()
+        here = os.path.dirname(os.path.abspath(__file__))
+        port = 5123
+        url = f"http://127.0.0.1:{port}"
+        if args.server == 'gunicorn':
+            cmd = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(here, 'gunicorn.conf.py'),
+                   '--chdir', workdir, '--pythonpath', here, '-b', f'127.0.0.1:{port}', 'wsgi:app']
+            if args.workers:
+                cmd += ['-w', str(args.workers)]
+        else:
+            cmd = [sys.executable, '-c', f"import sys; sys.path.insert(0, {here!r}); import dashboard_backend as b; "
+                   f"b.app.run(port={port}, threaded=True)"]
+        server = subprocess.Popen(cmd, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(url + '/api/auth/me', timeout=1)
+            except urllib.error.HTTPError:
+                break
+            except OSError:
+                time.sleep(0.2)
+
+    try:
+        login = urllib.request.Request(url + '/api/auth/login', method='POST',
+                                       data=json.dumps({'username': args.user, 'password': args.password}).encode(),
+                                       headers={'Content-Type': 'application/json'})
+        token = json.loads(urllib.request.urlopen(login).read())['token']
+
+        procs = max(1, min(args.procs, args.clients))
+        print(f"\n{url} ({args.server if server else 'external'}), {args.clients} clients, {args.duration}s per route")
+        print(f"{'Route':<28} {'req/s':<10} {'p50 ms':<9} {'p99 ms':<9} errors")
+        print("-" * 64)
+        for path in args.paths:
+            out = multiprocessing.Queue()
+            share = [args.clients // procs + (i < args.clients % procs) for i in range(procs)]
+            workers = [multiprocessing.Process(target=_load_process, args=(url, token, path, n, args.duration, out))
+                       for n in share]
+            for w in workers:
+                w.start()
+            collected = [out.get() for _ in workers]
+            for w in workers:
+                w.join()
+            latencies = sorted(l for lat, _ in collected for l in lat)
+            errors = sum(e for _, e in collected)
+            if not latencies:
+                print(f"{path:<28} no successful requests ({errors} errors)")
+                continue
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000
+            print(f"{path:<28} {len(latencies) / args.duration:<10.0f} {p50:<9.1f} {p99:<9.1f} {errors}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SENTINEL OVERWATCH benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("parser", help="Audit line parsing throughput (lines/sec)")
+    p.add_argument("--log", type=str, default=None,
+                   help="Recorded audit.log (default: synthetic log)")
+    p.add_argument("--window", type=int, nargs="+", default=[100, 1000, 5000], help="Lines per window")
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_parser)
+
+    p = sub.add_parser("sources", help="Audit input sources: throughput, wake-up latency, idle CPU")
+    p.add_argument("--events", type=int, default=200000)
+    p.add_argument("--samples", type=int, default=30)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--idle", type=float, default=5.0, help="Seconds of idle following to measure")
+    p.set_defaults(func=bench_sources)
+
+    p = sub.add_parser("features", help="Extended features: separation by behaviour, CPU per window")
+    p.add_argument("--seconds", type=int, default=80)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_features)
+
+    p = sub.add_parser("processes", help="Per-process attribution: overhead, culprit accuracy, bounded PID table")
+    p.add_argument("--model-dir", type=str, default=".")
+    p.add_argument("--seconds", type=int, default=60)
+    p.add_argument("--churn", type=int, default=40, help="New short-lived PIDs per second")
+    p.add_argument("--max-pids", type=int, default=4096)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_processes)
+
+    p = sub.add_parser("rolling", help="Rolling 5s/60s/300s features: cost per window, live and offline")
+    p.add_argument("--windows", type=int, default=20000)
+    p.add_argument("--seconds", type=int, default=80, help="Length of the parse_file log")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_rolling)
+
+    p = sub.add_parser("inference", help="Per-window model latency, DataFrame vs float32 vector")
+    p.add_argument("--model-dir", type=str, default=".")
+    p.add_argument("--data", type=str, default="labeled_data.csv")
+    p.add_argument("--rows", type=int, default=200)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_inference)
+
+    p = sub.add_parser("startup", help="Cold start of a fresh process: pickle vs native model")
+    p.add_argument("--model-dir", type=str, default=".")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("compiled", help="Compiled tree evaluator vs sklearn/xgboost: batch and single-row time")
+    p.add_argument("--model-dir", type=str, default=".")
+    p.add_argument("--data", type=str, default="labeled_data.csv")
+    p.set_defaults(func=bench_compiled)
+
+    p = sub.add_parser("analytics", help="/api/analytics latency: raw-row scans vs rollups")
+    p.add_argument("--rows", type=int, default=30_000_000, help="One-second events to seed")
+    p.add_argument("--db", type=str, default="/tmp/sentinel_bench.db")
+    p.add_argument("--reuse", action="store_true", help="Reuse an already seeded --db")
+    p.set_defaults(func=bench_analytics)
+
+    p = sub.add_parser("schema", help="Range queries before/after migrating a legacy events.db in place")
+    p.add_argument("--rows", type=int, default=5_000_000, help="One-second events to seed")
+    p.add_argument("--db", type=str, default="/tmp/sentinel_schema_bench.db")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_schema)
+
+    p = sub.add_parser("history", help="/api/history: raw rows for a range vs the min/max/avg series")
+    p.add_argument("--rows", type=int, default=2_678_400, help="One-second events to seed (default 31 days)")
+    p.add_argument("--db", type=str, default="/tmp/sentinel_history_bench.db")
+    p.add_argument("--points", type=int, default=300)
+    p.add_argument("--reuse", action="store_true", help="Reuse an already seeded --db")
+    p.set_defaults(func=bench_history)
+
+    p = sub.add_parser("export", help="CSV export: in-memory copy vs streamed gzip pages (time, peak memory)")
+    p.add_argument("--rows", type=int, default=500_000, help="One-second events to seed")
+    p.add_argument("--db", type=str, default="/tmp/sentinel_export_bench.db")
+    p.add_argument("--reuse", action="store_true", help="Reuse an already seeded --db")
+    p.set_defaults(func=bench_export)
+
+    p = sub.add_parser("alerts", help="Alert dispatch against a local stub provider (latency, retries, cooldown)")
+    p.add_argument("--recipients", type=int, default=20, help="Email recipients")
+    p.add_argument("--latency", type=float, default=0.2, help="Stub provider response time (s)")
+    p.add_argument("--flaky", type=int, default=4, help="~1 in N recipients fails its first attempt")
+    p.add_argument("--workers", type=int, default=8)
+    p.set_defaults(func=bench_alerts)
+
+    p = sub.add_parser("analysis", help="LLM analysis cache and request coalescing, with the fake model")
+    p.add_argument("--events", type=int, default=500)
+    p.add_argument("--latency", type=float, default=0.3, help="Fake model response time (s)")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.set_defaults(func=bench_analysis)
+
+    p = sub.add_parser("auth", help="Password hashing pool, login rate limit and token cache")
+    p.add_argument("--workers", type=int, default=2)
+    p.add_argument("--pending", type=int, default=32)
+    p.add_argument("--attempts", type=int, default=100, help="Simultaneous logins")
+    p.set_defaults(func=bench_auth)
+
+    p = sub.add_parser("load", help="Dashboard requests/sec at N concurrent clients (/api/stats, /api/history)")
+    p.add_argument("--url", type=str, default=None, help="Running backend (default: start one on a seeded DB)")
+    p.add_argument("--server", choices=["gunicorn", "dev"], default="gunicorn")
+    p.add_argument("--workers", type=int, default=None, help="gunicorn workers (default: gunicorn.conf.py)")
+    p.add_argument("--rows", type=int, default=200_000, help="Events to seed when starting a server")
+    p.add_argument("--clients", type=int, default=50)
+    p.add_argument("--procs", type=int, default=4, help="Client processes the clients are spread over")
+    p.add_argument("--duration", type=float, default=10.0)
+    p.add_argument("--paths", nargs="+", default=["/api/stats", "/api/history?limit=100"])
+    p.add_argument("--user", type=str, default="admin")
+    p.add_argument("--password", type=str, default="sentinel123")
+    p.set_defaults(func=bench_load)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -4,18 +4,20 @@ import subprocess
 import pandas as pd
 import os
 from feature_extractor import AuditFeatureExtractor
+from windowing import EventTimeWindower
+import audit_sources
 
-def collect_data(label, duration, output_file="labeled_data.csv"):
+AUDIT_LOG = "/var/log/audit/audit.log"
+
+def collect_data(label, duration, output_file="labeled_data.csv", source=AUDIT_LOG):
     extractor = AuditFeatureExtractor()
     data_points = []
     
     print(f"[*] Starting Data Collection for LABEL={label}...")
     print(f"[*] Duration: {duration} seconds")
     
-    # Start tailing audit.log
-    # We use tail -f -n 0 to only get NEW lines
-    proc = subprocess.Popen(['tail', '-F', '-n', '0', '/var/log/audit/audit.log'], 
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    # Only NEW lines (a file source starts at the end of the log), in large blocks
+    batches = audit_sources.open_source(source)
     
     start_time = time.time()
     
@@ -28,29 +30,27 @@ def collect_data(label, duration, output_file="labeled_data.csv"):
         import sys
         attack_proc = subprocess.Popen([sys.executable, 'ultimate_safe_malicious.py'])
     
+    # Cut windows on the audit timestamp so live data matches parse_file() output
+    windower = EventTimeWindower(size=1.0)
+
+    def record(windows):
+        for start, end, lines in windows:
+            features = extractor.add_rolling(extractor.process_window(lines), start)
+            features['label'] = label
+            data_points.append(features)
+            print(f"Captured window: {features['syscall_rate']} syscalls")
+
     try:
-        buffer = []
-        last_flush = time.time()
-        
-        while time.time() - start_time < duration:
-            line = proc.stdout.readline()
-            if line:
-                buffer.append(line)
-            
-            # Process every 1 second
-            if time.time() - last_flush >= 1.0:
-                if buffer:
-                    features = extractor.process_window(buffer)
-                    features['label'] = label
-                    data_points.append(features)
-                    buffer = [] # Clear buffer
-                    print(f"Captured window: {features['syscall_rate']} syscalls")
-                last_flush = time.time()
+        for batch in batches:
+            record(windower.tick() if batch is None else windower.add_lines(batch))
+            if time.time() - start_time >= duration:
+                break
+        record(windower.flush())
                 
     except KeyboardInterrupt:
         print("\nStopping collection...")
     finally:
-        proc.terminate()
+        batches.close()
         if attack_proc:
             print("[!] Stopping Attack Simulation...")
             attack_proc.terminate()
@@ -58,11 +58,33 @@ def collect_data(label, duration, output_file="labeled_data.csv"):
             subprocess.run(['rm', '-rf', 'dummy_files'])
             
     # Save to CSV
-    df = pd.DataFrame(data_points)
-    
+    save_data(pd.DataFrame(data_points), output_file)
+
+def collect_from_log(label, log_path, output_file="labeled_data.csv"):
+    """Derives labeled windows from an archived audit.log or a directory of rotated logs"""
+    extractor = AuditFeatureExtractor()
+
+    print(f"[*] Extracting features from {log_path} (LABEL={label})...")
+    start_time = time.time()
+    df = extractor.parse_file(log_path)
+    print(f"[*] {len(df)} windows in {time.time() - start_time:.2f}s")
+
+    df = df.reset_index(drop=True)
+    df['label'] = label
+    save_data(df, output_file)
+
+def save_data(df, output_file):
     # Append if file exists, else create
     if os.path.exists(output_file):
-        df.to_csv(output_file, mode='a', header=False, index=False)
+        # Keep an existing dataset's columns (e.g. the six features of older
+        # collections); the extended features need a new file
+        columns = list(pd.read_csv(output_file, nrows=0).columns)
+        extra = [c for c in df.columns if c not in columns]
+        if extra:
+            missing = ', '.join(extra) if len(extra) <= 6 else f"{len(extra)} of the"
+            print(f"[*] {output_file} has no {missing} columns; those are not saved "
+                  f"(use --output with a new file to collect them)")
+        df.reindex(columns=columns).to_csv(output_file, mode='a', header=False, index=False)
         print(f"[+] Appended {len(df)} rows to {output_file}")
     else:
         df.to_csv(output_file, index=False)
@@ -72,6 +94,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--label", type=int, required=True, choices=[0, 1], help="0 for Normal, 1 for Malicious")
     parser.add_argument("--duration", type=int, default=60, help="Duration in seconds")
+    parser.add_argument("--from-log", type=str, default=None,
+                        help="Offline mode: archived audit.log or directory of rotated logs")
+    parser.add_argument("--output", type=str, default="labeled_data.csv", help="CSV to create or append to")
+    parser.add_argument("--source", type=str, default=AUDIT_LOG,
+                        help="Live input: file:PATH, stdin, unix:SOCKET or replay:PATH[@SPEED] (see audit_sources.py)")
     args = parser.parse_args()
     
-    collect_data(args.label, args.duration)
+    if args.from_log:
+        collect_from_log(args.label, args.from_log, args.output)
+    else:
+        collect_data(args.label, args.duration, args.output, source=args.source)
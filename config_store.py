@@ -0,0 +1,158 @@
+"""
+Shared sentinel_config.json access for the dashboard and the detector.
+
+The parsed file is cached and only re-read when its inode, mtime or size
+changes (checked at most every check_interval seconds), so per-request and
+per-window lookups cost a dict access, and an edit made by either process
+(or by hand) is picked up without a restart.
+
+Writes go to a temporary file in the same directory, are fsynced and then
+renamed over the config, so a reader sees either the old or the new file,
+never a partial one. Writers are serialized by a lock (threads) plus
+flock() on sentinel_config.json.lock (processes, e.g. several dashboard
+workers); update() re-reads the file under that lock, so concurrent edits
+are not lost.
+"""
+import os
+import copy
+import json
+import stat
+import fcntl
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+CONFIG_FILE = "sentinel_config.json"
+
+DEFAULT_CONFIG = {
+    "detection_threshold": 0.7,
+    "alert_cooldown_minutes": 5,
+    "email_enabled": False,
+    "slack_enabled": False,
+    "email_recipients": [],
+    "slack_webhook_url": "",
+    "slack_bot_token": "",
+    "slack_channel": "",
+    "attack_patterns": {
+        "ransomware": {"enabled": True, "churn_threshold": 100},
+        "fork_bomb": {"enabled": True, "spawn_threshold": 50},
+        "crypto_miner": {"enabled": True, "cpu_threshold": 80},
+        "privilege_escalation": {"enabled": True},
+        "reverse_shell": {"enabled": True}
+    }
+}
+
+
+class ConfigStore:
+    """
+    get() returns the cached config; treat it as read-only (use load() for
+    a copy to modify and pass it to save()).
+    """
+
+    def __init__(self, path=CONFIG_FILE, defaults=DEFAULT_CONFIG, check_interval=0.5):
+        self.path = path
+        self.defaults = defaults
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.config = copy.deepcopy(defaults)
+        self.signature = None
+        self.next_check = 0.0
+        self.reloads = 0
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        # A rename always changes the inode, even within one mtime tick
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def get(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return self.config
+        with self.lock:
+            self.next_check = now + self.check_interval
+            signature = self._signature()
+            if signature != self.signature:
+                self._reload(signature)
+        return self.config
+
+    def _reload(self, signature):
+        if signature is None:
+            self.config = copy.deepcopy(self.defaults)
+        else:
+            try:
+                with open(self.path, 'r') as f:
+                    self.config = {**copy.deepcopy(self.defaults), **json.load(f)}
+            except (OSError, ValueError) as e:
+                # Keep the last good config (e.g. the file is mid-write)
+                print(f"[WARN] Could not read {self.path}: {e}")
+                return
+        self.signature = signature
+        self.reloads += 1
+
+    def load(self):
+        """A private copy of the current config"""
+        return copy.deepcopy(self.get())
+
+    def _refresh(self):
+        """Re-reads the file now if it changed (ignores check_interval)"""
+        with self.lock:
+            signature = self._signature()
+            if signature != self.signature:
+                self._reload(signature)
+            self.next_check = time.monotonic() + self.check_interval
+
+    @contextmanager
+    def _locked(self):
+        with self.write_lock:
+            with open(self.path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, config):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=".sentinel_config.", suffix=".tmp", dir=directory)
+        try:
+            # Keep the existing file's permissions (a new file stays 0600: it holds tokens)
+            try:
+                os.chmod(tmp, stat.S_IMODE(os.stat(self.path).st_mode))
+            except FileNotFoundError:
+                pass
+            with os.fdopen(fd, 'w') as f:
+                json.dump(config, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        with self.lock:
+            self.config = copy.deepcopy(config)
+            self.signature = self._signature()
+
+    def save(self, config):
+        """Replaces the whole config"""
+        with self._locked():
+            self._write(config)
+
+    def update(self, change):
+        """
+        Read-modify-write under the write lock: change(config) edits a copy
+        of the latest on-disk config in place. Returns the saved config.
+        """
+        with self._locked():
+            self._refresh()
+            config = copy.deepcopy(self.config)
+            change(config)
+            self._write(config)
+            return copy.deepcopy(config)
@@ -4,16 +4,26 @@ Features: API Auth, AI Threat Analysis, Slack/Email Alerts, Historical Analytics
 """
 import os
 import time
-import json
-import asyncio
 import sqlite3
-import hashlib
 import secrets
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, jsonify, request, send_file, Response, stream_with_context, has_request_context
 from flask_cors import CORS
 from dotenv import load_dotenv
+from event_stream import EventBroadcaster
+import alert_dispatcher
+import auth
+import threat_analysis
+from config_store import ConfigStore, CONFIG_FILE
+from db_pool import ConnectionPool
+import archive
+import event_counters
+import event_export
+import history
+import process_tree
+import rollups
+import schema
 
 load_dotenv()
 load_dotenv('/app/.env')
@@ -23,57 +33,34 @@ CORS(app, supports_credentials=True)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', secrets.token_hex(32))
 
 DB_FILE = "events.db"
-CONFIG_FILE = "sentinel_config.json"
+# Cold events moved out of the DB by the detector's archiver (None without pyarrow)
+event_archive = archive.open_archive()
 
 # ============ DATABASE SETUP ============
+# One connection per worker thread (see db_pool.py); conn.close() keeps it open
+db_pool = ConnectionPool(DB_FILE)
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """This thread's pooled connection; read-only while serving a GET"""
+    return db_pool.get(readonly=has_request_context() and request.method == 'GET')
 
 def init_db():
     conn = get_db_connection()
-    # Events table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            status TEXT,
-            probability REAL,
-            syscall_rate INTEGER,
-            churn_rate INTEGER,
-            ai_analysis TEXT
-        )
-    ''')
-    # Users table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            email TEXT,
-            role TEXT DEFAULT 'analyst',
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    # Alert history
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS alert_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            event_id INTEGER,
-            alert_type TEXT,
-            recipient TEXT,
-            sent_at TEXT,
-            status TEXT
-        )
-    ''')
-    conn.commit()
-    
-    # Create default admin user if not exists
+    # Tables, columns and indexes (versioned; migrates older files in place)
+    schema.migrate(conn, log=print)
+    # Per-day / per-status counters kept up to date by triggers
+    event_counters.install(conn)
+    # Minute / hour / day rollups for analytics
+    rollups.install(conn)
+    # Durable alert queue
+    alert_dispatcher.install(conn)
+    
+    # Create default admin user if not exists (every gunicorn worker runs
+    # this at import; OR IGNORE lets the first one win the race)
     cursor = conn.execute("SELECT * FROM users WHERE username = 'admin'")
     if not cursor.fetchone():
-        password_hash = hashlib.sha256('sentinel123'.encode()).hexdigest()
-        conn.execute("INSERT INTO users (username, password_hash, email, role) VALUES (?, ?, ?, ?)",
+        password_hash = auth.hash_password('sentinel123')
+        conn.execute("INSERT OR IGNORE INTO users (username, password_hash, email, role) VALUES (?, ?, ?, ?)",
                     ('admin', password_hash, 'admin@sentinel.local', 'admin'))
         conn.commit()
     conn.close()
@@ -81,32 +68,16 @@ def init_db():
 init_db()
 
 # ============ CONFIG MANAGEMENT ============
+# Cached; re-read only when the file changes (the detector shares the file).
+# Writes are atomic and serialized across threads and processes.
+config_store = ConfigStore(CONFIG_FILE)
+
 def load_config():
-    default_config = {
-        "detection_threshold": 0.7,
-        "alert_cooldown_minutes": 5,
-        "email_enabled": False,
-        "slack_enabled": False,
-        "email_recipients": [],
-        "slack_webhook_url": "",
-        "slack_bot_token": "",
-        "slack_channel": "",
-        "attack_patterns": {
-            "ransomware": {"enabled": True, "churn_threshold": 100},
-            "fork_bomb": {"enabled": True, "spawn_threshold": 50},
-            "crypto_miner": {"enabled": True, "cpu_threshold": 80},
-            "privilege_escalation": {"enabled": True},
-            "reverse_shell": {"enabled": True}
-        }
-    }
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            return {**default_config, **json.load(f)}
-    return default_config
+    return config_store.load()
 
-def save_config(config):
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+# The detector's latest per-process attribution (process_tree.py), same
+# cached-by-signature reads
+process_tree_store = ConfigStore(process_tree.SNAPSHOT_FILE, defaults=process_tree.EMPTY_SNAPSHOT)
 
 # ============ JWT AUTH ============
 import jwt
@@ -120,28 +91,49 @@ def create_token(user_id, username, role):
     }
     return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-        
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-        
-        try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            request.user = data
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-        
-        return f(*args, **kwargs)
-    return decorated
+# Slow KDF on a bounded pool; per-IP / per-user login buckets; decoded tokens
+password_hasher = auth.PasswordHasher()
+login_ip_limiter = auth.RateLimiter(*auth.LOGIN_IP_LIMIT)
+login_user_limiter = auth.RateLimiter(*auth.LOGIN_USER_LIMIT)
+token_cache = auth.TokenCache()
+
+def decode_token(token):
+    """JWT payload; tokens seen before skip the signature check until they expire"""
+    data = token_cache.get(token)
+    if data is None:
+        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        token_cache.put(token, data)
+    return data
+
+def token_required(f=None, allow_query=False):
+    """
+    Requires a valid JWT in the Authorization header. allow_query also
+    accepts ?token= (EventSource cannot set headers).
+    """
+    def wrap(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            token = None
+            if 'Authorization' in request.headers:
+                auth_header = request.headers['Authorization']
+                if auth_header.startswith('Bearer '):
+                    token = auth_header.split(' ')[1]
+            if not token and allow_query:
+                token = request.args.get('token')
+            
+            if not token:
+                return jsonify({'error': 'Token is missing'}), 401
+            
+            try:
+                request.user = decode_token(token)
+            except jwt.ExpiredSignatureError:
+                return jsonify({'error': 'Token has expired'}), 401
+            except jwt.InvalidTokenError:
+                return jsonify({'error': 'Invalid token'}), 401
+            
+            return f(*args, **kwargs)
+        return decorated
+    return wrap(f) if f else wrap
 
 def admin_required(f):
     @wraps(f)
@@ -161,15 +153,36 @@ def login():
     if not username or not password:
         return jsonify({'error': 'Username and password required'}), 400
     
+    allowed, retry_after = login_ip_limiter.allow(request.remote_addr)
+    if allowed:
+        allowed, retry_after = login_user_limiter.allow(username)
+        if not allowed:
+            # The attempt is refused, so it does not count against the client's IP
+            login_ip_limiter.refund(request.remote_addr)
+    if not allowed:
+        return (jsonify({'error': 'Too many login attempts, try again later'}), 429,
+                {'Retry-After': str(max(1, round(retry_after)))})
+    
     conn = get_db_connection()
     user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
-    conn.close()
     
-    if not user:
-        return jsonify({'error': 'Invalid credentials'}), 401
+    try:
+        valid = password_hasher.verify(password, user['password_hash'] if user else None)
+        if valid and auth.needs_upgrade(user['password_hash']):
+            # Older (e.g. unsalted SHA-256) hash: store the current format.
+            # Skipped if the pool is busy; the next login retries.
+            try:
+                conn.execute("UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                             (password_hasher.hash(password), user['id'], user['password_hash']))
+                conn.commit()
+            except auth.Busy:
+                pass
+    except auth.Busy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    finally:
+        conn.close()
     
-    password_hash = hashlib.sha256(password.encode()).hexdigest()
-    if user['password_hash'] != password_hash:
+    if not valid:
         return jsonify({'error': 'Invalid credentials'}), 401
     
     token = create_token(user['id'], user['username'], user['role'])
@@ -188,6 +201,16 @@ def login():
 def get_current_user():
     return jsonify({'user': request.user})
 
+@app.route('/api/auth/stats', methods=['GET'])
+@token_required
+@admin_required
+def auth_stats():
+    return jsonify({
+        'password_hasher': password_hasher.stats(),
+        'token_cache': token_cache.stats(),
+        'rate_limited': {'ip': login_ip_limiter.limited, 'user': login_user_limiter.limited},
+    })
+
 # ============ DASHBOARD ROUTES ============
 @app.route('/api/stats', methods=['GET'])
 @token_required
@@ -197,16 +220,8 @@ def get_stats():
         
     conn = get_db_connection()
     latest = conn.execute('SELECT * FROM events ORDER BY id DESC LIMIT 1').fetchone()
-    total_anomalies = conn.execute("SELECT COUNT(*) FROM events WHERE status = 'CRITICAL'").fetchone()[0]
-    total_events = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
-    
-    # Get today's stats
-    today = datetime.now().strftime('%Y-%m-%d')
-    today_anomalies = conn.execute(
-        "SELECT COUNT(*) FROM events WHERE status = 'CRITICAL' AND timestamp LIKE ?", 
-        (f'{today}%',)
-    ).fetchone()[0]
-    
+    # Trigger-maintained counters: a few primary-key rows, no table scan
+    counts = event_counters.read_counts(conn, datetime.now().strftime('%Y-%m-%d'))
     conn.close()
     
     if latest:
@@ -216,9 +231,9 @@ def get_stats():
             "timestamp": latest['timestamp'],
             "syscall_rate": latest['syscall_rate'],
             "churn_rate": latest['churn_rate'],
-            "total_anomalies": total_anomalies,
-            "total_events": total_events,
-            "today_anomalies": today_anomalies,
+            "total_anomalies": counts['total_anomalies'],
+            "total_events": counts['total_events'],
+            "today_anomalies": counts['today_anomalies'],
             "ai_analysis": latest['ai_analysis']
         })
     else:
@@ -227,17 +242,80 @@ def get_stats():
 @app.route('/api/history', methods=['GET'])
 @token_required
 def get_history():
-    limit = request.args.get('limit', 100, type=int)
-    
+    """
+    Raw events, oldest first:
+        ?limit=100          the newest rows (capped at history.MAX_ROWS)
+        ?since_id=ID        only rows after ID (poll with the last id seen)
+    or a downsampled series (min/max/avg per bucket, see history.py):
+        ?start=&end=&points=300   local-time bounds; end defaults to now,
+                                  start to an hour before end
+    """
     if not os.path.exists(DB_FILE):
         return jsonify([])
-        
+    
+    if 'start' in request.args or 'points' in request.args:
+        try:
+            end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else datetime.now()
+            start = (datetime.fromisoformat(request.args['start']) if request.args.get('start')
+                     else end - timedelta(hours=1))
+        except ValueError:
+            return jsonify({'error': 'start/end must be YYYY-MM-DD[ HH:MM:SS]'}), 400
+        if start >= end:
+            return jsonify({'error': 'start must be before end'}), 400
+        conn = get_db_connection()
+        data = history.series(conn, start, end, request.args.get('points', history.DEFAULT_POINTS, type=int))
+        conn.close()
+        return jsonify(data)
+    
+    limit = min(request.args.get('limit', 100, type=int), history.MAX_ROWS)
+    since_id = request.args.get('since_id', type=int)
     conn = get_db_connection()
-    events = conn.execute('SELECT * FROM events ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    events = history.recent(conn, limit, since_id)
     conn.close()
     
-    data = [dict(row) for row in reversed(events)]
-    return jsonify(data)
+    # Older rows continue in the Parquet archive
+    if since_id is None and len(events) < limit and event_archive is not None:
+        events = event_archive.read(limit - len(events), before_id=events[0]['id'] if events else None)[::-1] + events
+    
+    return jsonify(events)
+
+# One producer tails the events table for every connected dashboard
+broadcaster = EventBroadcaster(DB_FILE)
+
+@app.route('/api/stream', methods=['GET'])
+@token_required(allow_query=True)
+def stream_events():
+    """
+    Server-Sent Events: a `snapshot` (stats + last 100 rows) on connect,
+    then an `events` message per batch of new rows with counter deltas.
+    """
+    sub, snapshot = broadcaster.subscribe()
+    
+    def generate():
+        try:
+            yield "retry: 3000\n" + snapshot
+            yield from sub.messages()
+        finally:
+            broadcaster.unsubscribe(sub)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # don't let a reverse proxy buffer the stream
+    })
+
+@app.route('/api/stream/stats', methods=['GET'])
+@token_required
+@admin_required
+def stream_stats():
+    return jsonify(broadcaster.stats())
+
+@app.route('/api/process-tree', methods=['GET'])
+@token_required
+def get_process_tree():
+    """Hottest process subtrees of the detector's last window, as a tree"""
+    snapshot = process_tree_store.get()
+    stale = time.time() - (snapshot.get('updated') or 0) > process_tree.STALE_SECONDS
+    return jsonify({**snapshot, 'stale': stale})
 
 @app.route('/api/analytics', methods=['GET'])
 @token_required
@@ -254,197 +332,65 @@ def get_analytics():
     else:
         days = 365
     
-    start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-    
-    # Daily threat counts
-    daily_stats = conn.execute('''
-        SELECT 
-            date(timestamp) as date,
-            COUNT(*) as total_events,
-            SUM(CASE WHEN status = 'CRITICAL' THEN 1 ELSE 0 END) as threats,
-            AVG(probability) as avg_probability,
-            AVG(syscall_rate) as avg_syscall_rate,
-            AVG(churn_rate) as avg_churn_rate
-        FROM events 
-        WHERE timestamp >= ?
-        GROUP BY date(timestamp)
-        ORDER BY date(timestamp)
-    ''', (start_date,)).fetchall()
-    
-    # Threat distribution by hour
-    hourly_dist = conn.execute('''
-        SELECT 
-            strftime('%H', timestamp) as hour,
-            COUNT(*) as count
-        FROM events 
-        WHERE status = 'CRITICAL' AND timestamp >= ?
-        GROUP BY strftime('%H', timestamp)
-    ''', (start_date,)).fetchall()
-    
-    # Top threat patterns
-    threat_summary = conn.execute('''
-        SELECT 
-            COUNT(*) as total_threats,
-            AVG(probability) as avg_threat_prob,
-            MAX(probability) as max_threat_prob
-        FROM events 
-        WHERE status = 'CRITICAL' AND timestamp >= ?
-    ''', (start_date,)).fetchone()
-    
+    # Midnight `days` ago: whole days, so everything is answered from the rollups
+    start = (datetime.now() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    data = rollups.analytics(conn, start)
     conn.close()
     
-    return jsonify({
-        'daily_stats': [dict(row) for row in daily_stats],
-        'hourly_distribution': [dict(row) for row in hourly_dist],
-        'summary': dict(threat_summary) if threat_summary else {},
-        'period': period
-    })
+    return jsonify({**data, 'period': period})
 
 # ============ AI THREAT ANALYSIS ============
+# Verdicts cached by event signature and stored in events.ai_analysis
+analysis_service = threat_analysis.AnalysisService(DB_FILE)
+
 @app.route('/api/analyze-threat', methods=['POST'])
 @token_required
 def analyze_threat():
-    """AI-powered threat analysis using Gemini 3 Flash"""
+    """AI-powered threat analysis using Gemini 3 Flash (cached, see threat_analysis.py)"""
     data = request.get_json()
     event_data = data.get('event', {})
     
-    api_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not api_key:
-        return jsonify({'error': 'AI service not configured'}), 500
-    
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"threat-analysis-{int(time.time())}",
-            system_message="""You are a cybersecurity threat analyst AI. Analyze system events and provide:
-1. Threat Classification (ransomware, fork bomb, crypto miner, privilege escalation, reverse shell, or other)
-2. Severity Assessment (Critical, High, Medium, Low)
-3. Brief explanation of why this pattern is suspicious
-4. Recommended actions
-Keep responses concise and actionable. Format as JSON."""
-        ).with_model("gemini", "gemini-3-flash-preview")
-        
-        prompt = f"""Analyze this system event for potential security threats:
-- Status: {event_data.get('status', 'Unknown')}
-- Threat Probability: {event_data.get('probability', 0):.2%}
-- Syscall Rate: {event_data.get('syscall_rate', 0)}/sec
-- File Churn Rate: {event_data.get('churn_rate', 0)}/sec
-- Timestamp: {event_data.get('timestamp', 'Unknown')}
-
-Provide a threat analysis in JSON format with keys: classification, severity, explanation, recommendations"""
-
-        user_message = UserMessage(text=prompt)
-        
-        # Run async in sync context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        response = loop.run_until_complete(chat.send_message(user_message))
-        loop.close()
-        
-        # Try to parse as JSON
-        try:
-            # Clean response if it has markdown code blocks
-            clean_response = response.strip()
-            if clean_response.startswith('```'):
-                clean_response = clean_response.split('```')[1]
-                if clean_response.startswith('json'):
-                    clean_response = clean_response[4:]
-            analysis = json.loads(clean_response)
-        except:
-            analysis = {
-                "classification": "Unknown",
-                "severity": "Medium",
-                "explanation": response,
-                "recommendations": ["Review system logs", "Monitor for recurring patterns"]
-            }
-        
-        return jsonify({'analysis': analysis})
-        
+        analysis, source = analysis_service.analyze(event_data)
+    except threat_analysis.NotConfigured as e:
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         return jsonify({'error': f'AI analysis failed: {str(e)}'}), 500
+    
+    return jsonify({'analysis': analysis, 'source': source})
+
+@app.route('/api/analyze-threat/stats', methods=['GET'])
+@token_required
+@admin_required
+def analysis_stats():
+    return jsonify(analysis_service.stats())
 
 # ============ ALERTS ============
+# Alerts are queued and delivered in the background (retries, cooldown, dedup)
+dispatcher = alert_dispatcher.AlertDispatcher(DB_FILE, load_config)
+dispatcher.start()
+
 @app.route('/api/alerts/send', methods=['POST'])
 @token_required
 def send_alert():
-    """Send alert via configured channels"""
+    """
+    Queue an alert on the configured channels. Returns per-channel queue
+    status at once; delivery results appear in /api/alerts/history.
+    `force` skips the channel cooldown (manual sends).
+    """
     data = request.get_json()
     event_data = data.get('event', {})
     channels = data.get('channels', ['email', 'slack'])
     
-    config = load_config()
-    results = {'email': None, 'slack': None}
-    
-    alert_message = f"""🚨 SENTINEL OVERWATCH - THREAT DETECTED
-
-Status: {event_data.get('status', 'CRITICAL')}
-Probability: {event_data.get('probability', 0):.2%}
-Syscall Rate: {event_data.get('syscall_rate', 0)}/sec
-File Churn: {event_data.get('churn_rate', 0)}/sec
-Time: {event_data.get('timestamp', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))}
-
-Immediate investigation recommended."""
-    
-    # Send Email
-    if 'email' in channels and config.get('email_enabled'):
-        try:
-            import resend
-            resend.api_key = os.environ.get('RESEND_API_KEY')
-            
-            for recipient in config.get('email_recipients', []):
-                resend.Emails.send({
-                    "from": os.environ.get('SENDER_EMAIL', 'alerts@sentinel.local'),
-                    "to": [recipient],
-                    "subject": "🚨 SENTINEL ALERT: Threat Detected",
-                    "html": f"<pre>{alert_message}</pre>"
-                })
-            results['email'] = 'sent'
-        except Exception as e:
-            results['email'] = f'error: {str(e)}'
-    
-    # Send Slack
-    if 'slack' in channels and config.get('slack_enabled'):
-        try:
-            from slack_sdk import WebClient
-            slack_token = config.get('slack_bot_token') or os.environ.get('SLACK_BOT_TOKEN')
-            slack_channel = config.get('slack_channel', '#security-alerts')
-            
-            if slack_token:
-                client = WebClient(token=slack_token)
-                client.chat_postMessage(
-                    channel=slack_channel,
-                    text=alert_message,
-                    blocks=[
-                        {
-                            "type": "header",
-                            "text": {"type": "plain_text", "text": "🚨 SENTINEL ALERT"}
-                        },
-                        {
-                            "type": "section",
-                            "text": {"type": "mrkdwn", "text": alert_message}
-                        }
-                    ]
-                )
-                results['slack'] = 'sent'
-            else:
-                results['slack'] = 'not configured'
-        except Exception as e:
-            results['slack'] = f'error: {str(e)}'
-    
-    # Log alert
-    conn = get_db_connection()
-    conn.execute(
-        "INSERT INTO alert_history (event_id, alert_type, recipient, sent_at, status) VALUES (?, ?, ?, ?, ?)",
-        (event_data.get('id'), json.dumps(channels), json.dumps(config.get('email_recipients', [])), 
-         datetime.now().isoformat(), json.dumps(results))
-    )
-    conn.commit()
-    conn.close()
-    
+    results = dispatcher.submit(event_data, channels, force=bool(data.get('force')))
     return jsonify({'results': results})
 
+@app.route('/api/alerts/stats', methods=['GET'])
+@token_required
+@admin_required
+def alert_stats():
+    return jsonify(dispatcher.stats())
+
 @app.route('/api/alerts/history', methods=['GET'])
 @token_required
 def get_alert_history():
@@ -469,7 +415,6 @@ def get_config():
 @admin_required
 def update_config():
     data = request.get_json()
-    config = load_config()
     
     # Update allowed fields
     allowed_fields = [
@@ -479,57 +424,69 @@ def update_config():
         'attack_patterns'
     ]
     
-    for field in allowed_fields:
-        if field in data:
-            # Don't overwrite token if placeholder
-            if field == 'slack_bot_token' and data[field] == '***':
-                continue
-            config[field] = data[field]
+    def change(config):
+        for field in allowed_fields:
+            if field in data:
+                # Don't overwrite token if placeholder
+                if field == 'slack_bot_token' and data[field] == '***':
+                    continue
+                config[field] = data[field]
     
-    save_config(config)
+    # Read-modify-write under the config write lock (atomic replace on disk)
+    config = config_store.update(change)
     return jsonify({'message': 'Configuration updated', 'config': config})
 
 # ============ EXPORT ROUTES ============
 @app.route('/api/export/csv', methods=['GET'])
-@token_required
+@token_required(allow_query=True)
 def export_csv():
-    """Export events to CSV"""
-    import csv
-    import io
-    
+    """
+    Export events to gzip-compressed CSV, streamed page by page (constant
+    memory for any range). ?token= is accepted so a plain link can download.
+    """
     start_date = request.args.get('start')
     end_date = request.args.get('end')
     
-    conn = get_db_connection()
-    
-    query = "SELECT * FROM events"
-    params = []
-    
-    if start_date and end_date:
-        query += " WHERE timestamp BETWEEN ? AND ?"
-        params = [start_date, end_date]
-    
-    query += " ORDER BY id DESC"
-    events = conn.execute(query, params).fetchall()
-    conn.close()
+    def generate():
+        conn = sqlite3.connect(DB_FILE)
+        try:
+            yield from event_export.iter_csv_gzip(conn, start_date, end_date, event_archive=event_archive)
+        finally:
+            conn.close()
+    
+    filename = f'sentinel_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv.gz'
+    return Response(stream_with_context(generate()), mimetype='application/gzip', headers={
+        'Content-Disposition': f'attachment; filename={filename}',
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.route('/api/export/parquet', methods=['GET'])
+@token_required(allow_query=True)
+def export_parquet():
+    """
+    Export events (archive + hot table) to Parquet, for pandas/pyarrow.
+    Built page by page into a temporary file, then streamed.
+    """
+    import tempfile
     
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['ID', 'Timestamp', 'Status', 'Probability', 'Syscall Rate', 'Churn Rate', 'AI Analysis'])
+    if not archive.available():
+        return jsonify({'error': 'Parquet export requires pyarrow (pip install pyarrow)'}), 501
     
-    for event in events:
-        writer.writerow([
-            event['id'], event['timestamp'], event['status'],
-            event['probability'], event['syscall_rate'], event['churn_rate'],
-            event['ai_analysis'] or ''
-        ])
+    start_date = request.args.get('start')
+    end_date = request.args.get('end')
     
+    output = tempfile.TemporaryFile()
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        event_export.write_parquet(conn, output, start_date, end_date, event_archive)
+    finally:
+        conn.close()
     output.seek(0)
     return send_file(
-        io.BytesIO(output.getvalue().encode()),
-        mimetype='text/csv',
+        output,
+        mimetype='application/vnd.apache.parquet',
         as_attachment=True,
-        download_name=f'sentinel_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        download_name=f'sentinel_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.parquet'
     )
 
 @app.route('/api/export/pdf', methods=['GET'])
@@ -544,10 +501,11 @@ def export_pdf():
     conn = get_db_connection()
     
     # Get summary stats
-    total_events = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
-    total_threats = conn.execute("SELECT COUNT(*) FROM events WHERE status = 'CRITICAL'").fetchone()[0]
+    counts = event_counters.read_counts(conn, datetime.now().strftime('%Y-%m-%d'))
+    total_events = counts['total_events']
+    total_threats = counts['total_anomalies']
     recent_threats = conn.execute(
-        "SELECT * FROM events WHERE status = 'CRITICAL' ORDER BY id DESC LIMIT 10"
+        "SELECT * FROM events WHERE status = 'CRITICAL' ORDER BY ts DESC, id DESC LIMIT 10"
     ).fetchall()
     conn.close()
     
@@ -608,9 +566,11 @@ def get_attack_patterns():
 def update_attack_patterns():
     """Update attack detection patterns"""
     data = request.get_json()
-    config = load_config()
-    config['attack_patterns'] = data
-    save_config(config)
+    
+    def change(config):
+        config['attack_patterns'] = data
+    
+    config_store.update(change)
     return jsonify({'message': 'Patterns updated', 'patterns': data})
 
 # ============ USER MANAGEMENT ============
@@ -636,7 +596,10 @@ def create_user():
     if not username or not password:
         return jsonify({'error': 'Username and password required'}), 400
     
-    password_hash = hashlib.sha256(password.encode()).hexdigest()
+    try:
+        password_hash = password_hasher.hash(password)
+    except auth.Busy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     
     conn = get_db_connection()
     try:
@@ -653,5 +616,6 @@ def create_user():
     return jsonify({'message': 'User created'})
 
 if __name__ == '__main__':
+    # Development server; production: gunicorn -c gunicorn.conf.py wsgi:app
     print("Starting SENTINEL OVERWATCH Backend on port 5000...")
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    app.run(debug=True, port=5000, host='0.0.0.0', threaded=True)
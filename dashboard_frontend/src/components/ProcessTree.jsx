@@ -99,7 +99,7 @@ export function ProcessTree({ onClose }) {
           <div className="flex items-center gap-4 text-xs">
             <span className="text-gray-400 flex items-center gap-1">
               <Cpu size={12} />
-              {process.cpu || 0}%
+              {process.syscall_rate || 0}/s
             </span>
             <span className="text-gray-400 flex items-center gap-1">
               <Clock size={12} />
@@ -257,7 +257,7 @@ function generateMockProcessTree() {
       pid: '1',
       name: 'systemd',
       cmdline: '/sbin/init splash',
-      cpu: 0.1,
+      syscall_rate: 1,
       runtime: '2h 34m',
       suspicious: false,
       children: [
@@ -265,7 +265,7 @@ function generateMockProcessTree() {
           pid: '423',
           name: 'sshd',
           cmdline: '/usr/sbin/sshd -D',
-          cpu: 0.0,
+          syscall_rate: 0,
           runtime: '2h 33m',
           suspicious: false,
           children: [
@@ -273,7 +273,7 @@ function generateMockProcessTree() {
               pid: '2341',
               name: 'bash',
               cmdline: '-bash',
-              cpu: 0.1,
+              syscall_rate: 1,
               runtime: '45m',
               suspicious: false,
               children: [
@@ -281,7 +281,7 @@ function generateMockProcessTree() {
                   pid: '5678',
                   name: 'python',
                   cmdline: 'python ultimate_safe_malicious.py',
-                  cpu: 85.2,
+                  syscall_rate: 852,
                   runtime: '5m',
                   suspicious: true,
                   children: [
@@ -289,7 +289,7 @@ function generateMockProcessTree() {
                       pid: '5679',
                       name: 'python',
                       cmdline: 'fork_bomb_child',
-                      cpu: 25.1,
+                      syscall_rate: 251,
                       runtime: '3m',
                       suspicious: true,
                       children: []
@@ -298,7 +298,7 @@ function generateMockProcessTree() {
                       pid: '5680',
                       name: 'python',
                       cmdline: 'ransomware_simulator',
-                      cpu: 45.3,
+                      syscall_rate: 453,
                       runtime: '3m',
                       suspicious: true,
                       children: []
@@ -313,7 +313,7 @@ function generateMockProcessTree() {
           pid: '567',
           name: 'cron',
           cmdline: '/usr/sbin/cron -f',
-          cpu: 0.0,
+          syscall_rate: 0,
           runtime: '2h 33m',
           suspicious: false,
           children: []
@@ -322,7 +322,7 @@ function generateMockProcessTree() {
           pid: '890',
           name: 'nginx',
           cmdline: 'nginx: master process',
-          cpu: 0.2,
+          syscall_rate: 2,
           runtime: '2h 32m',
           suspicious: false,
           children: [
@@ -330,7 +330,7 @@ function generateMockProcessTree() {
               pid: '891',
               name: 'nginx',
               cmdline: 'nginx: worker process',
-              cpu: 0.1,
+              syscall_rate: 1,
               runtime: '2h 32m',
               suspicious: false,
               children: []
@@ -5,9 +5,18 @@ import { Brain, X, AlertTriangle, Shield, Loader, Send } from 'lucide-react';
 // const API_BASE = 'http://localhost:5000/api';
 const API_BASE = import.meta.env.VITE_API_BASE || 'http://localhost:5000/api';
 
+// Verdict already stored with the event by an earlier analysis, if any
+const storedAnalysis = (event) => {
+  try {
+    return event?.ai_analysis ? JSON.parse(event.ai_analysis) : null;
+  } catch {
+    return null;
+  }
+};
+
 export function ThreatModal({ event, onClose }) {
   const { token } = useAuth();
-  const [analysis, setAnalysis] = useState(null);
+  const [analysis, setAnalysis] = useState(() => storedAnalysis(event));
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [alertSent, setAlertSent] = useState(false);
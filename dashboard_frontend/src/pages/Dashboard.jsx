@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useAuth } from '../context/AuthContext';
 import { 
   Shield, AlertTriangle, Activity, Database, Cpu, HardDrive,
@@ -12,6 +12,7 @@ import ThreatModal from '../components/ThreatModal';
 import ProcessTree from '../components/ProcessTree';
 
 const API_BASE = import.meta.env.VITE_API_BASE || 'http://localhost:5000/api';
+const HISTORY_SIZE = 100;
 
 export default function Dashboard() {
   const { token } = useAuth();
@@ -22,36 +23,46 @@ export default function Dashboard() {
   const [showModal, setShowModal] = useState(false);
   const [showProcessTree, setShowProcessTree] = useState(false);
 
-  const fetchData = useCallback(async () => {
-    try {
-      const headers = { 'Authorization': `Bearer ${token}` };
-      
-      const [statsRes, historyRes] = await Promise.all([
-        fetch(`${API_BASE}/stats`, { headers }),
-        fetch(`${API_BASE}/history?limit=100`, { headers })
-      ]);
-      
-      if (statsRes.ok) {
-        const statsData = await statsRes.json();
-        setStats(statsData);
-      }
-      
-      if (historyRes.ok) {
-        const historyData = await historyRes.json();
-        setHistory(historyData);
-      }
-    } catch (err) {
-      console.error('Failed to fetch data', err);
-    } finally {
+  // Live updates: one snapshot on connect, then new rows + counter deltas pushed by the server
+  useEffect(() => {
+    if (!token) return;
+    const source = new EventSource(`${API_BASE}/stream?token=${encodeURIComponent(token)}`);
+    let day = null;
+
+    source.addEventListener('snapshot', (e) => {
+      const data = JSON.parse(e.data);
+      day = data.date;
+      setStats(data.stats);
+      setHistory(data.history);
       setLoading(false);
-    }
-  }, [token]);
+    });
 
-  useEffect(() => {
-    fetchData();
-    const interval = setInterval(fetchData, 1000);
-    return () => clearInterval(interval);
-  }, [fetchData]);
+    source.addEventListener('events', (e) => {
+      const { rows, deltas, date } = JSON.parse(e.data);
+      const latest = rows[rows.length - 1];
+      const newDay = date !== day;
+      day = date;
+
+      setStats((prev) => ({
+        ...prev,
+        status: latest.status,
+        probability: latest.probability,
+        timestamp: latest.timestamp,
+        syscall_rate: latest.syscall_rate,
+        churn_rate: latest.churn_rate,
+        ai_analysis: latest.ai_analysis,
+        total_events: (prev?.total_events || 0) + deltas.total_events,
+        total_anomalies: (prev?.total_anomalies || 0) + deltas.total_anomalies,
+        today_anomalies: (newDay ? 0 : prev?.today_anomalies || 0) + deltas.today_anomalies,
+      }));
+      setHistory((prev) => [...prev, ...rows].slice(-HISTORY_SIZE));
+    });
+
+    // EventSource reconnects by itself and gets a fresh snapshot
+    source.onerror = () => setLoading(false);
+
+    return () => source.close();
+  }, [token]);
 
   const handleAnalyze = (event) => {
     setSelectedEvent(event);
@@ -99,7 +110,7 @@ export default function Dashboard() {
           </button>
           
           <a 
-            href={`${API_BASE}/export/csv`}
+            href={`${API_BASE}/export/csv?token=${encodeURIComponent(token)}`}
             data-testid="export-csv-btn"
             className="btn-ghost flex items-center gap-2"
           >
@@ -0,0 +1,74 @@
+"""
+Per-thread SQLite connections for the dashboard.
+
+Each worker thread keeps one read-write and one read-only connection per
+database for its whole life instead of connecting on every request. That
+also keeps sqlite3's per-connection prepared-statement cache warm: a route
+that runs the same SQL text again skips the parse/plan step.
+
+Read-only connections (file:...?mode=ro plus PRAGMA query_only) serve GET
+requests. They cannot take a write lock by accident, and in WAL mode they
+never wait for the detector's writes.
+
+close() on a pooled connection only ends any open transaction, so existing
+`conn = get_db_connection(); ...; conn.close()` code pools transparently.
+Connections are keyed by PID as well, so a forked worker never reuses its
+parent's handles.
+"""
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+STATEMENT_CACHE = 256
+BUSY_TIMEOUT_MS = 5000
+
+
+class PooledConnection(sqlite3.Connection):
+    """A connection that survives close(); release() really closes it"""
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def release(self):
+        super().close()
+
+
+class ConnectionPool:
+    def __init__(self, db_file, row_factory=sqlite3.Row):
+        self.db_file = db_file
+        self.row_factory = row_factory
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def _open(self, readonly):
+        if readonly:
+            conn = sqlite3.connect(f"file:{quote(os.path.abspath(self.db_file))}?mode=ro", uri=True,
+                                   factory=PooledConnection, cached_statements=STATEMENT_CACHE)
+            conn.execute("PRAGMA query_only = 1")
+        else:
+            conn = sqlite3.connect(self.db_file, factory=PooledConnection,
+                                   cached_statements=STATEMENT_CACHE)
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.row_factory = self.row_factory
+        with self.lock:
+            self.opened += 1
+        return conn
+
+    def get(self, readonly=False):
+        """This thread's connection (opened on first use)"""
+        pid = os.getpid()
+        if getattr(self.local, 'pid', None) != pid:
+            self.local.pid = pid
+            self.local.connections = {}
+        connections = self.local.connections
+        conn = connections.get(readonly)
+        if conn is None:
+            conn = connections[readonly] = self._open(readonly)
+        return conn
+
+    def stats(self):
+        return {'db_file': self.db_file, 'connections_opened': self.opened}
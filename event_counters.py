@@ -0,0 +1,137 @@
+"""
+Incrementally maintained event counters.
+
+event_counts holds one row per (day, status) plus all-time rows under
+day '*'. Triggers on events keep it in step with every INSERT, DELETE and
+status/timestamp UPDATE inside the writer's own transaction, so /api/stats
+reads a few primary-key rows instead of scanning the events table.
+
+Backfill an existing database (also done automatically the first time the
+table is created):
+    python event_counters.py [--db events.db]
+"""
+import sqlite3
+import argparse
+
+ALL_DAYS = '*'
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS event_counts (
+        day TEXT NOT NULL,        -- YYYY-MM-DD, or '*' for all time
+        status TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, status)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS event_counts_insert AFTER INSERT ON events BEGIN
+        INSERT INTO event_counts (day, status, count)
+        VALUES (substr(NEW.timestamp, 1, 10), coalesce(NEW.status, ''), 1)
+        ON CONFLICT (day, status) DO UPDATE SET count = count + 1;
+        INSERT INTO event_counts (day, status, count)
+        VALUES ('*', coalesce(NEW.status, ''), 1)
+        ON CONFLICT (day, status) DO UPDATE SET count = count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS event_counts_delete AFTER DELETE ON events BEGIN
+        UPDATE event_counts SET count = count - 1
+        WHERE day IN (substr(OLD.timestamp, 1, 10), '*') AND status = coalesce(OLD.status, '');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS event_counts_update AFTER UPDATE OF timestamp, status ON events BEGIN
+        UPDATE event_counts SET count = count - 1
+        WHERE day IN (substr(OLD.timestamp, 1, 10), '*') AND status = coalesce(OLD.status, '');
+        INSERT INTO event_counts (day, status, count)
+        VALUES (substr(NEW.timestamp, 1, 10), coalesce(NEW.status, ''), 1)
+        ON CONFLICT (day, status) DO UPDATE SET count = count + 1;
+        INSERT INTO event_counts (day, status, count)
+        VALUES ('*', coalesce(NEW.status, ''), 1)
+        ON CONFLICT (day, status) DO UPDATE SET count = count + 1;
+    END;
+'''
+
+
+def install(conn):
+    """
+    Creates the counters table and triggers (idempotent). A newly created
+    table is backfilled in the same transaction, so no insert is missed.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'event_counts'").fetchone()
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for statement in _statements(SCHEMA):
+            conn.execute(statement)
+        if not exists:
+            _backfill(conn)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def backfill(conn):
+    """Recomputes every counter from the events table"""
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _backfill(conn)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def _backfill(conn):
+    conn.execute("DELETE FROM event_counts")
+    conn.execute('''
+        INSERT INTO event_counts (day, status, count)
+        SELECT substr(timestamp, 1, 10), coalesce(status, ''), COUNT(*)
+        FROM events GROUP BY 1, 2
+    ''')
+    conn.execute('''
+        INSERT INTO event_counts (day, status, count)
+        SELECT '*', coalesce(status, ''), COUNT(*)
+        FROM events GROUP BY 2
+    ''')
+
+
+def _statements(script):
+    """Splits SCHEMA into statements (trigger bodies contain ';')"""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip():
+                yield statement.strip()
+            statement = ''
+
+
+def read_counts(conn, today):
+    """Returns total_events, total_anomalies and today_anomalies"""
+    rows = conn.execute(
+        "SELECT day, status, count FROM event_counts WHERE day IN (?, ?)",
+        (ALL_DAYS, today)).fetchall()
+    totals = {'total_events': 0, 'total_anomalies': 0, 'today_anomalies': 0}
+    for day, status, count in rows:
+        if day == ALL_DAYS:
+            totals['total_events'] += count
+            if status == 'CRITICAL':
+                totals['total_anomalies'] = count
+        elif status == 'CRITICAL':
+            totals['today_anomalies'] = count
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the event counters from the events table")
+    parser.add_argument("--db", type=str, default="events.db")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    install(conn)
+    backfill(conn)
+    counts = read_counts(conn, '')
+    conn.close()
+    print(f"[*] Backfilled counters: {counts['total_events']} events, "
+          f"{counts['total_anomalies']} anomalies")
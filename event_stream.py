@@ -0,0 +1,193 @@
+"""
+Live event fan-out for the dashboard (Server-Sent Events).
+
+One producer thread tails the events table (`id > last_id`, a primary-key
+range scan) and turns every batch of new rows into a single pre-serialized
+SSE message: the rows plus counter deltas. The message is pushed to one
+bounded queue per connected client, so database load does not grow with the
+number of open dashboards. New clients start from a snapshot kept in memory
+(latest stats + recent rows) instead of querying the database.
+"""
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import event_counters
+
+HISTORY_SIZE = 100
+
+
+def sse(event, data, event_id=None):
+    """Formats one SSE message"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscription:
+    """One client's queue; closed by the producer if the client falls behind"""
+
+    def __init__(self, max_queue):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.closed = False
+
+    def messages(self, heartbeat=15.0):
+        """Yields SSE messages, with keep-alive comments while idle"""
+        while not self.closed:
+            try:
+                message = self.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield message
+
+
+class EventBroadcaster(threading.Thread):
+    """
+    Single producer for every /api/stream subscriber.
+
+    poll_interval - seconds between checks for new rows
+    max_queue     - messages buffered per client before it is disconnected
+                    (EventSource reconnects and resumes from a fresh snapshot)
+    """
+
+    def __init__(self, db_file, poll_interval=0.5, max_queue=256, batch_limit=1000):
+        super().__init__(name="event-broadcaster", daemon=True)
+        self.db_file = db_file
+        self.poll_interval = poll_interval
+        self.max_queue = max_queue
+        self.batch_limit = batch_limit
+
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.recent = deque(maxlen=HISTORY_SIZE)
+        self.counters = {'total_events': 0, 'total_anomalies': 0, 'today_anomalies': 0}
+        self.date = None
+        self.last_id = 0
+        self.ready = threading.Event()
+        self._launched = False
+        self.messages_sent = 0
+        self.subscribers_dropped = 0
+
+    # ---------- subscribers ----------
+    def subscribe(self):
+        """Registers a client; returns (Subscription, snapshot message)"""
+        with self.lock:
+            if not self._launched:
+                self._launched = True
+                self.start()
+        self.ready.wait(timeout=10)
+
+        sub = Subscription(self.max_queue)
+        with self.lock:
+            self.subscribers.add(sub)
+            snapshot = sse('snapshot', {
+                'stats': self._stats(),
+                'history': list(self.recent),
+                'date': self.date,
+            }, self.last_id)
+        return sub, snapshot
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subscribers.discard(sub)
+        sub.closed = True
+
+    def _publish(self, message):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            try:
+                sub.queue.put_nowait(message)
+            except queue.Full:
+                # Never let one slow browser stall the others
+                self.subscribers_dropped += 1
+                self.unsubscribe(sub)
+        self.messages_sent += 1
+
+    # ---------- producer ----------
+    def _stats(self):
+        latest = self.recent[-1] if self.recent else None
+        if latest is None:
+            return {"status": "No data yet"}
+        return {
+            "status": latest['status'],
+            "probability": latest['probability'],
+            "timestamp": latest['timestamp'],
+            "syscall_rate": latest['syscall_rate'],
+            "churn_rate": latest['churn_rate'],
+            "ai_analysis": latest.get('ai_analysis'),
+            **self.counters,
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _load_initial(self, conn):
+        today = datetime.now().strftime('%Y-%m-%d')
+        rows = conn.execute('SELECT * FROM events ORDER BY id DESC LIMIT ?', (HISTORY_SIZE,)).fetchall()
+        counts = event_counters.read_counts(conn, today)
+        with self.lock:
+            self.recent.clear()
+            self.recent.extend(dict(r) for r in reversed(rows))
+            self.counters = counts
+            self.date = today
+            self.last_id = rows[0]['id'] if rows else 0
+
+    def _poll(self, conn):
+        rows = conn.execute('SELECT * FROM events WHERE id > ? ORDER BY id LIMIT ?',
+                            (self.last_id, self.batch_limit)).fetchall()
+        if not rows:
+            return False
+        rows = [dict(r) for r in rows]
+
+        today = datetime.now().strftime('%Y-%m-%d')
+        critical = [r for r in rows if r['status'] == 'CRITICAL']
+        deltas = {
+            'total_events': len(rows),
+            'total_anomalies': len(critical),
+            'today_anomalies': sum(1 for r in critical if (r['timestamp'] or '').startswith(today)),
+        }
+        with self.lock:
+            if today != self.date:
+                self.counters['today_anomalies'] = 0
+                self.date = today
+            for key, value in deltas.items():
+                self.counters[key] += value
+            self.recent.extend(rows)
+            self.last_id = rows[-1]['id']
+            message = sse('events', {'rows': rows, 'deltas': deltas, 'date': today}, self.last_id)
+        self._publish(message)
+        return len(rows) == self.batch_limit
+
+    def run(self):
+        conn = None
+        while True:
+            try:
+                if conn is None:
+                    conn = self._connect()
+                    self._load_initial(conn)
+                    self.ready.set()
+                # Drain a backlog without sleeping, then wait for new rows
+                while self._poll(conn):
+                    pass
+            except sqlite3.Error as e:
+                print(f"[stream] DB error: {e}")
+                if conn is not None:
+                    conn.close()
+                conn = None
+            time.sleep(self.poll_interval)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'subscribers': len(self.subscribers),
+                'last_id': self.last_id,
+                'messages_sent': self.messages_sent,
+                'subscribers_dropped': self.subscribers_dropped,
+            }
@@ -0,0 +1,149 @@
+"""
+Background SQLite writer for detection events.
+
+Keeps one connection open in WAL mode and commits rows in batches from a
+queue, so the detection loop never waits on the disk.
+"""
+import time
+import queue
+import sqlite3
+import threading
+
+import rollups
+
+EVENT_COLUMNS = ('timestamp', 'status', 'probability', 'syscall_rate', 'churn_rate', 'ts')
+INSERT_EVENT = f"INSERT INTO events ({', '.join(EVENT_COLUMNS)}) VALUES ({', '.join('?' * len(EVENT_COLUMNS))})"
+
+_STOP = object()
+
+
+class EventWriter(threading.Thread):
+    """
+    Dedicated writer thread.
+
+    submit() never blocks: if the queue is full the row is dropped and
+    counted. Rows are committed when batch_size rows are pending or when the
+    oldest pending row is flush_interval seconds old, whichever comes first.
+    """
+
+    def __init__(self, db_file, batch_size=50, flush_interval=1.0, max_queue=10000,
+                 retention_interval=3600.0, raw_retention_days=rollups.RAW_RETENTION_DAYS,
+                 archive=None):
+        super().__init__(name="event-writer", daemon=True)
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        # Raw rows older than raw_retention_days are aged out (rollups keep the history);
+        # retention_interval=None disables it
+        self.retention_interval = retention_interval
+        self.raw_retention_days = raw_retention_days
+        # Optional archive.EventArchive: aged-out rows are moved to Parquet instead of dropped
+        self.archive = archive
+
+        # Counters
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.commits = 0
+        self.errors = 0
+        self.last_commit_ms = 0.0
+        self.max_commit_ms = 0.0
+        self.total_commit_ms = 0.0
+        self.rows_aged_out = 0
+
+    def submit(self, row):
+        """Queues one event row (tuple in EVENT_COLUMNS order). Returns False if dropped."""
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.rows_dropped += 1
+            return False
+
+    def close(self, timeout=5.0):
+        """Flushes pending rows and stops the thread"""
+        self.queue.put(_STOP)
+        self.join(timeout)
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'rows_written': self.rows_written,
+            'rows_dropped': self.rows_dropped,
+            'commits': self.commits,
+            'errors': self.errors,
+            'last_commit_ms': round(self.last_commit_ms, 3),
+            'max_commit_ms': round(self.max_commit_ms, 3),
+            'avg_commit_ms': round(self.total_commit_ms / max(self.commits, 1), 3),
+            'rows_aged_out': self.rows_aged_out,
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only fsyncs at checkpoints; a crash can lose the last batch at most
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _commit(self, conn, batch):
+        start = time.perf_counter()
+        try:
+            conn.executemany(INSERT_EVENT, batch)
+            conn.commit()
+            self.rows_written += len(batch)
+        except sqlite3.Error as e:
+            conn.rollback()
+            self.errors += 1
+            print(f"DB Error: {e}")
+        elapsed = (time.perf_counter() - start) * 1000
+        self.commits += 1
+        self.last_commit_ms = elapsed
+        self.total_commit_ms += elapsed
+        self.max_commit_ms = max(self.max_commit_ms, elapsed)
+        if elapsed > self.flush_interval * 1000:
+            print(f"[WARN] DB commit took {elapsed:.0f} ms "
+                  f"({self.queue.qsize()} rows queued) - disk is falling behind")
+
+    def _retain(self, conn):
+        try:
+            self.rows_aged_out += rollups.apply_retention(conn, self.raw_retention_days,
+                                                          archive=self.archive)
+            if self.archive is not None:
+                self.archive.prune()
+        except (sqlite3.Error, OSError) as e:
+            self.errors += 1
+            print(f"DB Error (retention): {e}")
+
+    def run(self):
+        conn = self._connect()
+        batch = []
+        deadline = None
+        next_retention = time.monotonic() if self.retention_interval else None
+        try:
+            while True:
+                if next_retention is not None and not batch and time.monotonic() >= next_retention:
+                    self._retain(conn)
+                    next_retention = time.monotonic() + self.retention_interval
+
+                wake = deadline if deadline is not None else next_retention
+                timeout = None if wake is None else max(wake - time.monotonic(), 0)
+                try:
+                    row = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    row = None
+
+                if row is _STOP:
+                    break
+                if row is not None:
+                    if not batch:
+                        deadline = time.monotonic() + self.flush_interval
+                    batch.append(row)
+
+                if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                    self._commit(conn, batch)
+                    batch = []
+                    deadline = None
+        finally:
+            if batch:
+                self._commit(conn, batch)
+            conn.close()
@@ -1,79 +1,441 @@
+import os
 import re
-import pandas as pd
-from collections import defaultdict
+import math
+from collections import Counter
+import numpy as np
+from audit_parser import (AuditEventParser, SYSCALL_CLASSES, SYSCALL_CLASS,
+                          ARCH_X86_64, SYSCALL_SEC_RE, PATH_SEC_RE, EXEC_SEC_RE, CONNECT_SEC_RE,
+                          SOCKADDR_SEC_RE, OPEN, UNLINK, STAT, CLONE, EXEC, CONNECT, CHMOD, SETUID,
+                          decode_value, remote_endpoint)
+
+# Column order used for training and inference (and the fallback for models
+# that do not record their feature names)
+FEATURE_NAMES = [
+    'syscall_rate', 'open_unlink_ratio', 'unique_files_accessed',
+    'failed_syscall_ratio', 'process_spawn_rate', 'file_churn_rate'
+]
+# Computed alongside; a model trained on data with these columns uses them
+# (the detector picks columns by the model's feature names)
+EXTENDED_FEATURE_NAMES = [
+    'stat_rate', 'connect_rate', 'unique_remote_addrs', 'chmod_count',
+    'setuid_count', 'exec_entropy'
+]
+ALL_FEATURE_NAMES = FEATURE_NAMES + EXTENDED_FEATURE_NAMES
+
+# Horizons (seconds) of the rolling statistics kept for every feature above
+ROLLING_SPANS = (5, 60, 300)
+ROLLING_STATS = ('mean', 'std', 'ewma')
+
+def rolling_feature_names(names=ALL_FEATURE_NAMES, spans=ROLLING_SPANS):
+    """Columns RollingFeatures adds, in its output order"""
+    out = [f'{name}_{stat}_{span}s' for span in spans for stat in ROLLING_STATS for name in names]
+    return out + [f'{name}_roc' for name in names]
+
+ROLLING_FEATURE_NAMES = rolling_feature_names()
+
+def features_to_vector(features, names=FEATURE_NAMES, out=None):
+    """
+    Writes a feature dict into a float32 vector in `names` order.
+    Pass a preallocated `out` (1-D, or a row of a batch matrix) to avoid allocating.
+    """
+    if out is None:
+        out = np.empty(len(names), dtype=np.float32)
+    for i, name in enumerate(names):
+        out[i] = features[name]
+    return out
+
+def window_features(syscalls, failed, kinds, unique_files, remote_addrs=0, entropy=0.0):
+    """
+    The feature dictionary from one window's counts (host or single process);
+    kinds has one count per audit_parser.SYSCALL_CLASSES entry
+    """
+    # Avoid division by zero with max(x, 1)
+    return {
+        'syscall_rate': syscalls,
+        'open_unlink_ratio': kinds[OPEN] / max(kinds[UNLINK], 1),
+        'unique_files_accessed': unique_files,
+        'failed_syscall_ratio': failed / max(syscalls, 1),
+        'process_spawn_rate': kinds[CLONE] + kinds[EXEC],
+        'file_churn_rate': kinds[UNLINK],  # Absolute churn
+        'stat_rate': kinds[STAT],
+        'connect_rate': kinds[CONNECT],
+        'unique_remote_addrs': remote_addrs,    # distinct (address, port) connected to
+        'chmod_count': kinds[CHMOD],
+        'setuid_count': kinds[SETUID],
+        'exec_entropy': entropy,
+    }
+
+def exec_entropy(exes):
+    """Shannon entropy (bits) of the executed binaries; 0 for fewer than two execs"""
+    n = len(exes)
+    if n < 2:
+        return 0.0
+    return -sum(c / n * math.log2(c / n) for c in Counter(exes).values())
+
+class RollingFeatures:
+    """
+    Multi-scale history of the per-window features: mean, std and EWMA over
+    each span, plus the rate of change from the previous window (0 for the
+    first window of a stream).
+
+    One ring buffer per span holds the last span/step windows, with running
+    sums and sums of squares, so update() costs the same whatever the spans
+    (the sums are recomputed from the buffer once per lap to stop float
+    drift). Windows are expected in order; seconds without audit records
+    (the windower emits nothing for them) count as all-zero windows.
+    The live detector and parse_file() both run this class, so training and
+    serving see the same values.
+
+    names - base feature columns
+    spans - horizons in seconds
+    step  - seconds between consecutive window starts (the window slide)
+    """
+
+    def __init__(self, names=ALL_FEATURE_NAMES, spans=ROLLING_SPANS, step=1.0):
+        self.names = list(names)
+        self.spans = tuple(spans)
+        self.step = float(step)
+        self.output_names = rolling_feature_names(self.names, self.spans)
+
+        n = len(self.names)
+        self.sizes = [max(1, int(round(span / self.step))) for span in self.spans]
+        self.buffers = [np.zeros((size, n)) for size in self.sizes]
+        self.sums = np.zeros((len(self.spans), n))
+        self.squares = np.zeros((len(self.spans), n))
+        # A time constant of one span per EWMA
+        self.decay = np.array([[math.exp(-self.step / span)] for span in self.spans])
+        self.ewma = np.zeros((len(self.spans), n))
+        self.previous = np.zeros(n)
+        self.x = np.zeros(n)
+        self.count = 0          # windows pushed, including filled gaps
+        self.last = None        # start of the previous window
+
+    def update(self, start, values):
+        """
+        Adds the window starting at `start` (epoch seconds); values are the
+        base features in `names` order. Returns the rolling features as a
+        new float64 vector in output_names order.
+        """
+        x = self.x
+        x[:] = values
+        if self.last is not None:
+            missing = int(round((start - self.last) / self.step)) - 1
+            if missing > 0:
+                self._skip(missing)
+        self.last = start
+
+        if self.count == 0:
+            # Nothing to compare the first window with: its rate of change is 0
+            self.ewma[:] = x
+            self.previous[:] = x
+        for i, (size, buf) in enumerate(zip(self.sizes, self.buffers)):
+            slot = self.count % size
+            old = buf[slot]
+            self.sums[i] += x - old
+            self.squares[i] += x * x - old * old
+            buf[slot] = x
+            if slot == size - 1:
+                self.sums[i] = buf.sum(axis=0)
+                self.squares[i] = np.square(buf).sum(axis=0)
+        self.ewma += (1.0 - self.decay) * (x - self.ewma)
+        self.count += 1
+
+        filled = np.minimum(self.count, self.sizes)[:, None]
+        mean = self.sums / filled
+        std = np.sqrt(np.maximum(self.squares / filled - mean * mean, 0.0))
+        roc = (x - self.previous) / self.step
+        self.previous[:] = x
+        return np.concatenate([np.stack([mean, std, self.ewma], axis=1).ravel(), roc])
+
+    def _skip(self, k):
+        """Pushes k all-zero windows in O(min(k, span)) per span"""
+        if self.count == 0:
+            return
+        for i, (size, buf) in enumerate(zip(self.sizes, self.buffers)):
+            if k >= size:
+                buf[:] = 0.0
+                self.sums[i] = 0.0
+                self.squares[i] = 0.0
+                continue
+            for j in range(k):
+                slot = (self.count + j) % size
+                self.sums[i] -= buf[slot]
+                self.squares[i] -= buf[slot] * buf[slot]
+                buf[slot] = 0.0
+        self.ewma *= self.decay ** k
+        self.previous[:] = 0.0
+        self.count += k
+
+    def add(self, features, start):
+        """Adds the rolling features for one window to its feature dict"""
+        row = self.update(start, [features[name] for name in self.names])
+        features.update(zip(self.output_names, row.tolist()))
+        return features
+
+    def frame(self, df):
+        """Rolling columns for a DataFrame of windows (index: window start), row by row"""
+        import pandas as pd
+        values = df[self.names].to_numpy(dtype=np.float64)
+        out = np.empty((len(df), len(self.output_names)))
+        for i, start in enumerate(df.index):
+            out[i] = self.update(start, values[i])
+        return pd.DataFrame(out, index=df.index, columns=self.output_names)
+
+def steady_rolling(features, names=ALL_FEATURE_NAMES, spans=ROLLING_SPANS):
+    """
+    Rolling features for something with no history (e.g. one process
+    subtree), as if this window's values had held for every span
+    """
+    out = {}
+    for span in spans:
+        for name in names:
+            out[f'{name}_mean_{span}s'] = features[name]
+            out[f'{name}_std_{span}s'] = 0.0
+            out[f'{name}_ewma_{span}s'] = features[name]
+    for name in names:
+        out[f'{name}_roc'] = 0.0
+    return out
+
+# Read archived logs in large blocks (characters)
+CHUNK_SIZE = 16 * 1024 * 1024
+
+def rotated_logs(path):
+    """
+    Returns the audit logs to read for path, oldest first.
+    A directory is expanded to audit.log.N ... audit.log.1, audit.log.
+    """
+    if not os.path.isdir(path):
+        return [path]
+
+    def rotation(name):
+        m = re.match(r'.*\.log(?:\.(\d+))?$', name)
+        return int(m.group(1) or 0) if m else -1
+
+    names = [n for n in os.listdir(path) if rotation(n) >= 0]
+    names.sort(key=rotation, reverse=True)
+    return [os.path.join(path, n) for n in names]
+
+def read_chunks(file_path, chunk_size=CHUNK_SIZE):
+    """Yields blocks of whole lines from a file"""
+    with open(file_path, 'r', errors='replace') as f:
+        tail = ''
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            block = tail + block
+            cut = block.rfind('\n') + 1
+            if cut == 0:
+                tail = block
+                continue
+            tail = block[cut:]
+            yield block[:cut]
+        if tail:
+            yield tail
 
 class AuditFeatureExtractor:
-    def __init__(self):
+    def __init__(self, step=1.0):
         self.features = []
-        # Regex patterns for fast parsing
-        self.syscall_pat = re.compile(r'type=SYSCALL.*syscall=(\d+).*success=(\w+)')
-        self.exec_pat = re.compile(r'type=EXECVE')
-        self.path_pat = re.compile(r'type=PATH.*name="(.*?)"')
-        
+        # Single-pass event parser; the features only need SYSCALL, PATH and SOCKADDR records
+        self.parser = AuditEventParser(record_types=('SYSCALL', 'PATH', 'SOCKADDR'))
+        # History of this stream's windows (step: seconds between window starts)
+        self.rolling = RollingFeatures(step=step)
+
+    def add_rolling(self, features, start):
+        """
+        Adds ROLLING_FEATURE_NAMES to the features of the window starting at
+        `start`; call once per window, in window order.
+        """
+        return self.rolling.add(features, start)
+
     def process_window(self, log_lines):
         """
         Processes a list of raw log lines (1 second window) and returns a feature dictionary.
         """
-        stats = {
-            'syscall_count': 0,
-            'failed_syscalls': 0,
-            'open_count': 0,
-            'unlink_count': 0,
-            'exec_count': 0,
-            'clone_count': 0,
-            'unique_files': set()
-        }
-        
-        # Mapping syscall numbers to names (x86_64)
-        # 2=open, 257=openat, 85=creat
-        # 87=unlink, 263=unlinkat, 84=rmdir
-        # 56=clone, 57=fork, 58=vfork, 59=execve
-        syscall_map = {
-            '2': 'open', '257': 'open', '85': 'open',
-            '87': 'unlink', '263': 'unlink', '84': 'unlink',
-            '56': 'clone', '57': 'clone', '58': 'clone', '59': 'exec' 
-        }
-
-        for line in log_lines:
-            # Syscall Check
-            m_sys = self.syscall_pat.search(line)
-            if m_sys:
-                syscall_nr = m_sys.group(1)
-                success = m_sys.group(2)
-                
-                stats['syscall_count'] += 1
-                if success == 'no':
-                    stats['failed_syscalls'] += 1
-                
-                s_type = syscall_map.get(syscall_nr)
-                if s_type == 'open':
-                    stats['open_count'] += 1
-                elif s_type == 'unlink':
-                    stats['unlink_count'] += 1
-                elif s_type == 'clone':
-                    stats['clone_count'] += 1
-                elif s_type == 'exec':
-                    stats['exec_count'] += 1
-
-            # Path Check
-            m_path = self.path_pat.search(line)
-            if m_path:
-                stats['unique_files'].add(m_path.group(1))
-
-        # Calculate Derived Features
-        # Avoid division by zero with max(x, 1) or adding epsilon
-        
-        features = {
-            'syscall_rate': stats['syscall_count'],
-            'open_unlink_ratio': stats['open_count'] / max(stats['unlink_count'], 1),
-            'unique_files_accessed': len(stats['unique_files']),
-            'failed_syscall_ratio': stats['failed_syscalls'] / max(stats['syscall_count'], 1),
-            'process_spawn_rate': stats['clone_count'] + stats['exec_count'],
-            'file_churn_rate': stats['unlink_count']  # Absolute churn
-        }
-        
-        return features
+        return self.process_events(self.parser.parse(log_lines))
+
+    def process_events(self, events):
+        """
+        Computes the feature dictionary from parsed AuditEvents.
+        """
+        syscall_count = 0
+        failed_syscalls = 0
+        kinds = [0] * len(SYSCALL_CLASSES)
+        unique_files = set()
+        remotes = set()
+        exes = []
+        arch = classes = None
+
+        for ev in events:
+            if ev.syscall is not None:
+                syscall_count += 1
+                if ev.success == 'no':
+                    failed_syscalls += 1
+
+                # One arch per host in practice: look its table up once
+                if ev.arch != arch:
+                    arch = ev.arch
+                    classes = SYSCALL_CLASS.get(arch, {})
+                kind = classes.get(ev.syscall)
+                if kind is not None:
+                    kinds[kind] += 1
+                    if kind == EXEC:
+                        exe = ev.image[1]
+                        if exe is not None:
+                            exes.append(exe)
+                    elif kind == CONNECT and ev.saddr:
+                        endpoint = remote_endpoint(ev.saddr)
+                        if endpoint:
+                            remotes.add(endpoint)
+
+            if ev.paths:
+                unique_files.update(ev.paths)
+
+        return window_features(syscall_count, failed_syscalls, kinds, len(unique_files),
+                               len(remotes), exec_entropy(exes))
+
+    def parse_file(self, file_path, chunk_size=CHUNK_SIZE, rolling=True):
+        """
+        Offline feature extraction for training data.
+
+        Reads an archived audit.log (or a directory of rotated logs) in large
+        chunks and buckets records into 1-second windows by their audit
+        timestamp. Returns a DataFrame indexed by window start (epoch seconds)
+        with the same columns process_window produces, plus (with rolling)
+        the ROLLING_FEATURE_NAMES add_rolling() gives the live windows.
+        """
+        # pandas is only needed offline; keep it out of the detector's startup
+        import pandas as pd
+        sys_frames = []
+        path_frames = []
+        exec_frames = []
+        connect_frames = []
+        sockaddr_frames = []
+
+        for log in rotated_logs(file_path):
+            for text in read_chunks(log, chunk_size):
+                records = SYSCALL_SEC_RE.findall(text)
+                if records:
+                    df = pd.DataFrame(records, columns=['window', 'arch', 'nr', 'success'])
+                    sys_frames.append(pd.DataFrame({
+                        'window': df['window'].astype(np.int64),
+                        'kind': _classify(df),
+                        'failed': df['success'].eq('no'),
+                    }))
+
+                records = PATH_SEC_RE.findall(text)
+                if records:
+                    df = pd.DataFrame(records, columns=['window', 'name'])
+                    df['window'] = df['window'].astype(np.int64)
+                    # Dedupe per chunk so a day of paths never sits in memory
+                    path_frames.append(df.drop_duplicates())
+
+                records = EXEC_SEC_RE.findall(text)
+                if records:
+                    df = pd.DataFrame(records, columns=['window', 'arch', 'nr', 'exe'])
+                    df = df[_classify(df).eq(EXEC)]
+                    exec_frames.append(pd.DataFrame({'window': df['window'].astype(np.int64),
+                                                     'exe': df['exe']}))
+
+                records = CONNECT_SEC_RE.findall(text)
+                if records:
+                    df = pd.DataFrame(records, columns=['window', 'serial', 'arch', 'nr'])
+                    df = df[_classify(df).eq(CONNECT)]
+                    connect_frames.append(df[['window', 'serial']])
+
+                records = SOCKADDR_SEC_RE.findall(text)
+                if records:
+                    sockaddr_frames.append(pd.DataFrame(records, columns=['window', 'serial', 'saddr']))
+
+        df = self._window_features(sys_frames, path_frames, exec_frames,
+                                   connect_frames, sockaddr_frames)
+        if rolling:
+            # A fresh history: the log is its own stream
+            df = df.join(RollingFeatures().frame(df))
+        return df
+
+    def _window_features(self, sys_frames, path_frames, exec_frames=(), connect_frames=(),
+                         sockaddr_frames=()):
+        """Vectorized per-window feature computation"""
+        import pandas as pd
+        classes = list(range(len(SYSCALL_CLASSES)))
+        if sys_frames:
+            sc = pd.concat(sys_frames, ignore_index=True)
+            by_window = sc.groupby('window')
+            kinds = (sc.dropna(subset=['kind']).astype({'kind': np.int64})
+                       .groupby(['window', 'kind']).size()
+                       .unstack(fill_value=0)
+                       .reindex(columns=classes, fill_value=0))
+            counts = pd.DataFrame({
+                'syscall_count': by_window.size(),
+                'failed_syscalls': by_window['failed'].sum(),
+            }).join(kinds).fillna(0)
+        else:
+            counts = pd.DataFrame(columns=['syscall_count', 'failed_syscalls'] + classes)
+
+        if path_frames:
+            paths = pd.concat(path_frames, ignore_index=True)
+            quoted = paths['name'].str.startswith('"')
+            paths.loc[quoted, 'name'] = paths.loc[quoted, 'name'].str.slice(1, -1)
+            if not quoted.all():
+                paths.loc[~quoted, 'name'] = paths.loc[~quoted, 'name'].map(decode_value)
+            unique_files = paths.dropna().groupby('window')['name'].nunique()
+        else:
+            unique_files = pd.Series(dtype=np.int64)
+
+        if exec_frames:
+            # Decoded like the live path's ev.image, so hex-encoded names match
+            execs = pd.concat(exec_frames, ignore_index=True)
+            execs['exe'] = execs['exe'].map(decode_value)
+            per_exe = execs.dropna().groupby(['window', 'exe']).size()
+            p = per_exe / per_exe.groupby(level='window').transform('sum')
+            entropy = (-p * np.log2(p)).groupby(level='window').sum()
+        else:
+            entropy = pd.Series(dtype=np.float64)
+
+        if connect_frames and sockaddr_frames:
+            # A connect's SOCKADDR record shares its event ID
+            addrs = pd.concat(sockaddr_frames, ignore_index=True).merge(
+                pd.concat(connect_frames, ignore_index=True), on=['window', 'serial'])
+            saddr, family = addrs['saddr'], addrs['saddr'].str.slice(0, 4).str.upper()
+            endpoint = pd.Series(None, index=addrs.index, dtype=object)
+            inet = family.eq('0200')
+            endpoint[inet] = saddr[inet].str.slice(4, 16)
+            inet6 = family.eq('0A00')
+            endpoint[inet6] = saddr[inet6].str.slice(4, 8) + saddr[inet6].str.slice(16, 48)
+            addrs['endpoint'] = endpoint
+            remotes = addrs.dropna(subset=['endpoint']).astype({'window': np.int64}) \
+                           .groupby('window')['endpoint'].nunique()
+        else:
+            remotes = pd.Series(dtype=np.int64)
+
+        index = counts.index.union(unique_files.index)
+        counts = counts.reindex(index, fill_value=0).astype(np.int64)
+        syscall_count = counts['syscall_count'].values
+        unlink = counts[UNLINK].values
+
+        df = pd.DataFrame({
+            'syscall_rate': syscall_count,
+            'open_unlink_ratio': counts[OPEN].values / np.maximum(unlink, 1),
+            'unique_files_accessed': unique_files.reindex(index, fill_value=0).values.astype(np.int64),
+            'failed_syscall_ratio': counts['failed_syscalls'].values / np.maximum(syscall_count, 1),
+            'process_spawn_rate': counts[CLONE].values + counts[EXEC].values,
+            'file_churn_rate': unlink,
+            'stat_rate': counts[STAT].values,
+            'connect_rate': counts[CONNECT].values,
+            'unique_remote_addrs': remotes.reindex(index, fill_value=0).values.astype(np.int64),
+            'chmod_count': counts[CHMOD].values,
+            'setuid_count': counts[SETUID].values,
+            'exec_entropy': entropy.reindex(index, fill_value=0.0).values,
+        }, index=pd.Index(index, name='window'))
+        return df[ALL_FEATURE_NAMES]
+
 
-    def parse_file(self, file_path):
-        """Helper to parse a full file for offline training data"""
-        pass # Not used in streaming mode
+def _classify(df):
+    """Class index per (arch, nr) row of a DataFrame (NaN where unclassified)"""
+    kind = df['nr'].map(SYSCALL_CLASS[ARCH_X86_64])
+    other = df['arch'].ne(ARCH_X86_64)
+    if other.any():
+        kind[other] = [SYSCALL_CLASS.get(arch, {}).get(nr, np.nan)
+                       for arch, nr in zip(df['arch'][other], df['nr'][other])]
+    return kind
@@ -0,0 +1,18 @@
+"""
+gunicorn settings for the dashboard backend (see wsgi.py).
+
+Threaded workers: every open dashboard holds one thread for its
+/api/stream connection, and each worker thread keeps its own SQLite
+connections (db_pool.py). Override with SENTINEL_BIND / SENTINEL_WORKERS /
+SENTINEL_THREADS.
+"""
+import os
+import multiprocessing
+
+bind = os.environ.get("SENTINEL_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("SENTINEL_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("SENTINEL_THREADS", 32))
+keepalive = 5
+# Not preloaded: the broadcaster and alert dispatcher threads start in each worker
+preload_app = False
@@ -0,0 +1,110 @@
+"""
+Downsampled event history for charts.
+
+series() splits [start, end) into at most `points` equal buckets and returns
+count, threats and min/max/avg of probability, syscall_rate and churn_rate
+per non-empty bucket, so the payload size depends on `points`, not on the
+range. Sub-minute buckets are computed from raw rows through the events.ts
+index; anything coarser is folded from the minute/hour/day rollups (whole
+rollup buckets per point), which also covers ranges whose raw rows have
+aged out.
+"""
+import math
+import time
+from datetime import datetime, timedelta
+
+import rollups
+import schema
+
+DEFAULT_POINTS = 300
+MAX_POINTS = 1000
+MAX_ROWS = 1000
+
+# rollup level -> (unit in seconds, suffix turning a bucket into a full timestamp)
+UNITS = {'minute': (60, ':00'), 'hour': (3600, ':00:00'), 'day': (86400, ' 00:00:00')}
+
+METRICS = (('probability', 'prob'), ('syscall_rate', 'syscall'), ('churn_rate', 'churn'))
+
+
+def _level(bucket, start, now):
+    """Coarsest rollup level whose unit fits in one output bucket"""
+    if bucket >= UNITS['day'][0]:
+        return 'day'
+    if bucket >= UNITS['hour'][0] or start < now - timedelta(days=rollups.MINUTE_RETENTION_DAYS):
+        return 'hour'
+    return 'minute'
+
+
+def _raw_covers(conn, start):
+    """True if raw rows still reach back to start"""
+    row = conn.execute("SELECT ts FROM events ORDER BY id LIMIT 1").fetchone()
+    return row is not None and row[0] is not None and row[0] <= start.timestamp()
+
+
+def series(conn, start, end, points=DEFAULT_POINTS):
+    """
+    start, end - naive local datetimes; points is capped at MAX_POINTS.
+    Returns the /api/history series payload.
+    """
+    points = max(1, min(int(points), MAX_POINTS))
+    span = max((end - start).total_seconds(), 1)
+    bucket = math.ceil(span / points)
+    source = 'raw'
+    if bucket < 60 and _raw_covers(conn, start):
+        lo = int(start.timestamp())
+        bucket = max(1, math.ceil((int(end.timestamp()) - lo) / points))
+        rows = conn.execute('''
+            SELECT ? + ((ts - ?) / ?) * ?, COUNT(*), coalesce(SUM(status = 'CRITICAL'), 0),
+                   MIN(probability), MAX(probability), AVG(probability),
+                   MIN(syscall_rate), MAX(syscall_rate), AVG(syscall_rate),
+                   MIN(churn_rate), MAX(churn_rate), AVG(churn_rate)
+            FROM events WHERE ts >= ? AND ts < ?
+            GROUP BY 1 ORDER BY 1
+        ''', (lo, lo, bucket, bucket, lo, int(end.timestamp()))).fetchall()
+    else:
+        source = _level(bucket, start, datetime.now())
+        unit, suffix = UNITS[source]
+        aligned = rollups.floor_bucket(start, source)
+        lo = int(aligned.timestamp())
+        # Whole rollup buckets per point
+        bucket = unit * max(1, math.ceil((end.timestamp() - lo) / points / unit))
+        n = rollups.LEVELS[source]
+        epoch = schema.EPOCH.format(f"bucket || '{suffix}'")
+        aggregates = ", ".join(f"MIN({short}_min), MAX({short}_max), SUM({short}_sum) * 1.0 / SUM(count)"
+                               for _, short in METRICS)
+        rows = conn.execute(f'''
+            SELECT ? + (({epoch} - ?) / ?) * ?, SUM(count), SUM(threats), {aggregates}
+            FROM events_rollup_{source} WHERE bucket >= ? AND bucket < ?
+            GROUP BY 1 ORDER BY 1
+        ''', (lo, lo, bucket, bucket, aligned.strftime(rollups.TS_FORMAT)[:n],
+              end.strftime(rollups.TS_FORMAT)[:n])).fetchall()
+
+    result = []
+    for row in rows:
+        point = {'ts': row[0], 'timestamp': time.strftime(rollups.TS_FORMAT, time.localtime(row[0])),
+                 'count': row[1], 'threats': row[2]}
+        for i, (name, _) in enumerate(METRICS):
+            low, high, avg = row[3 + 3 * i:6 + 3 * i]
+            # The average under the plain name, so charts of raw rows plot it as is
+            point.update({name: avg, f'{name}_min': low, f'{name}_max': high})
+        result.append(point)
+    return {
+        'start': start.strftime(rollups.TS_FORMAT),
+        'end': end.strftime(rollups.TS_FORMAT),
+        'bucket_seconds': bucket,
+        'source': source,
+        'points': result,
+    }
+
+
+def recent(conn, limit=100, since_id=None):
+    """
+    Raw rows as dicts, oldest first: the newest `limit`, or the first
+    `limit` after since_id. limit is capped at MAX_ROWS.
+    """
+    limit = max(0, min(int(limit), MAX_ROWS))
+    if since_id is None:
+        rows = conn.execute('SELECT * FROM events ORDER BY id DESC LIMIT ?', (limit,)).fetchall()[::-1]
+    else:
+        rows = conn.execute('SELECT * FROM events WHERE id > ? ORDER BY id LIMIT ?', (since_id, limit)).fetchall()
+    return [dict(row) for row in rows]
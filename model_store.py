@@ -0,0 +1,565 @@
+"""
+Pickle-free model storage for the detectors.
+
+Training exports each model in a library-neutral form next to the legacy
+pickles:
+
+    xgboost_model.json               XGBoost's native booster (save_model)
+    random_forest_model.trees/       flat node table (.npy) + meta.json
+    isolation_forest_model.trees/
+    ensemble_model.json              voting weights, classes, feature names
+
+Loading needs nothing but numpy: node tables are opened memory-mapped and
+the XGBoost JSON is compiled into the same table layout, so the detector
+starts without importing xgboost, sklearn or pandas (each of which takes
+longer to import than a full cold start is allowed to). The loaded objects
+expose the subset of the estimator API the detectors call (predict_proba,
+score_samples, classes_, offset_, ...) and reproduce the library outputs.
+Inputs must be finite; missing-value routing is not stored.
+"""
+import os
+import json
+import ctypes
+import ctypes.util
+import numpy as np
+
+NODE_DTYPE = np.dtype([
+    ('feature', '<i4'),
+    ('left', '<i4'),
+    ('right', '<i4'),
+    ('threshold', '<f8'),
+])
+
+XGB_FILE = "xgboost_model.json"
+RF_DIR = "random_forest_model.trees"
+ISO_DIR = "isolation_forest_model.trees"
+ENSEMBLE_FILE = "ensemble_model.json"
+
+
+class TreeArrays:
+    """
+    All trees of one model in a single node table.
+
+    Node ids are global (tree offsets already applied). Leaves point to
+    themselves on both sides, so every row can be walked a fixed max_depth
+    steps for all trees at once without masking. values holds one row of
+    outputs per node; only leaf rows are read.
+
+    split is 'le' (sklearn: x <= threshold goes left) or 'lt' (XGBoost:
+    x < threshold goes left).
+    """
+
+    def __init__(self, nodes, values, roots, max_depth, split='le', meta=None):
+        self.nodes = nodes
+        self.values = values
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.split = split
+        self.meta = meta or {}
+
+        self.feature = nodes['feature']
+        self.left = nodes['left']
+        self.right = nodes['right']
+        self.threshold = nodes['threshold']
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_children(cls, left, right, feature, threshold, values, roots, split='le', meta=None):
+        """Builds the table from library-style child arrays (-1 marks a leaf)"""
+        left = np.asarray(left, dtype=np.int32)
+        right = np.asarray(right, dtype=np.int32)
+        leaf = left < 0
+        ids = np.arange(len(left), dtype=np.int32)
+
+        nodes = np.empty(len(left), dtype=NODE_DTYPE)
+        nodes['left'] = np.where(leaf, ids, left)
+        nodes['right'] = np.where(leaf, ids, right)
+        nodes['feature'] = np.where(leaf, 0, feature)
+        nodes['threshold'] = np.where(leaf, 0.0, threshold)
+        roots = np.asarray(roots, dtype=np.int32)
+        return cls(nodes, np.asarray(values, dtype=np.float64), roots,
+                   _max_depth(left, right, roots), split, meta)
+
+    def apply(self, X):
+        """Leaf id reached by every row in every tree, shape (n_trees, n_rows)"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        rows = np.arange(X.shape[0])
+        node = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        le = self.split == 'le'
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = x <= self.threshold[node] if le else x < self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def leaf_sum(self, X, column=0, initial=0.0, dtype=np.float64):
+        """
+        Sums the leaf value of every tree per row, tree by tree in order (the
+        same accumulation order the libraries use, so results are identical).
+        """
+        return sequential_sum(self.values[self.apply(X), column], initial, dtype)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "nodes.npy"), self.nodes)
+        np.save(os.path.join(path, "values.npy"), self.values)
+        np.save(os.path.join(path, "roots.npy"), self.roots)
+        meta = dict(self.meta, max_depth=self.max_depth, split=self.split)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mode = 'r' if mmap else None
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(np.load(os.path.join(path, "nodes.npy"), mmap_mode=mode),
+                   np.load(os.path.join(path, "values.npy"), mmap_mode=mode),
+                   np.load(os.path.join(path, "roots.npy")),
+                   meta.pop('max_depth'), meta.pop('split'), meta)
+
+
+def _libm_expf():
+    try:
+        expf = ctypes.CDLL(ctypes.util.find_library('m') or 'libm.so.6').expf
+    except (OSError, AttributeError):
+        return None
+    expf.restype, expf.argtypes = ctypes.c_float, [ctypes.c_float]
+    return expf
+
+
+_EXPF = _libm_expf()
+
+
+def expf(x):
+    """
+    float32 exp with libm's expf results (XGBoost's sigmoid calls it).
+    exp in double rounded to float32 agrees except within a hair of a
+    rounding midpoint, where expf itself (not correctly rounded there) is
+    called per element. Without a loadable libm the rounded double is used.
+    """
+    x = np.asarray(x, dtype=np.float32)
+    if _EXPF is not None and x.size <= 8:
+        # The detector's single row: cheaper than the vectorized check
+        return np.array([_EXPF(v) for v in x.ravel().tolist()], dtype=np.float32).reshape(x.shape)
+    wide = np.exp(x.astype(np.float64))
+    out = wide.astype(np.float32)
+    if _EXPF is not None:
+        other = np.nextafter(out, np.where(wide < out, -np.inf, np.inf).astype(np.float32))
+        gap = np.abs(other.astype(np.float64) - out)
+        near = np.isfinite(gap) & (np.abs(wide - (out + other.astype(np.float64)) / 2) < gap * 0.01)
+        for i in zip(*np.nonzero(near)):
+            out[i] = _EXPF(float(x[i]))
+    return out
+
+
+def sequential_sum(leaves, initial=0.0, dtype=np.float64):
+    """
+    Sums a (n_trees, n_rows) matrix over trees strictly in order, starting
+    from initial (np.sum would use pairwise summation and round differently).
+    """
+    acc = np.empty((leaves.shape[0] + 1, leaves.shape[1]), dtype=dtype)
+    acc[0] = initial
+    acc[1:] = leaves
+    return np.cumsum(acc, axis=0, dtype=dtype)[-1]
+
+
+def _tree_depths(left, right, leaf, roots):
+    """Number of splits on the longest root-to-leaf path of each tree"""
+    depth = np.zeros(len(roots), dtype=np.int64)
+    frontier = np.asarray(roots)
+    tree = np.arange(len(roots))
+    level = 0
+    while len(frontier):
+        inner = ~leaf[frontier]
+        frontier, tree = frontier[inner], tree[inner]
+        level += 1
+        depth[tree] = level
+        frontier = np.concatenate([left[frontier], right[frontier]])
+        tree = np.concatenate([tree, tree])
+    return depth
+
+
+def _max_depth(left, right, roots):
+    """Number of splits on the longest root-to-leaf path"""
+    depth = 0
+    frontier = np.asarray(roots)
+    while True:
+        inner = frontier[left[frontier] >= 0]
+        if not len(inner):
+            return depth
+        frontier = np.concatenate([left[inner], right[inner]])
+        depth += 1
+
+
+# ============ SKLEARN FORESTS ============
+def _concat_sklearn_trees(estimators, leaf_values):
+    """Concatenates sklearn tree_ arrays; leaf_values(tree_) -> (n_nodes, k)"""
+    parts = {'left': [], 'right': [], 'feature': [], 'threshold': [], 'values': []}
+    roots = []
+    offset = 0
+    for est in estimators:
+        t = est.tree_
+        roots.append(offset)
+        leaf = t.children_left < 0
+        parts['left'].append(np.where(leaf, -1, t.children_left + offset))
+        parts['right'].append(np.where(leaf, -1, t.children_right + offset))
+        parts['feature'].append(t.feature)
+        parts['threshold'].append(t.threshold)
+        parts['values'].append(leaf_values(t))
+        offset += t.node_count
+    return {k: np.concatenate(v) for k, v in parts.items()}, roots
+
+
+def forest_arrays(model, feature_names=None):
+    """Flattens a fitted RandomForestClassifier or IsolationForest into a TreeArrays"""
+    names = list(feature_names if feature_names is not None
+                 else getattr(model, 'feature_names_in_', []))
+
+    if hasattr(model, 'offset_'):
+        from sklearn.ensemble._iforest import _average_path_length
+        if model._max_features != model.n_features_in_:
+            raise ValueError("IsolationForest with max_features < 1.0 is not supported")
+
+        # Per-leaf contribution to the path length, exactly as score_samples adds it
+        per_tree = iter(zip(model._decision_path_lengths, model._average_path_length_per_tree))
+
+        def leaf_values(t):
+            lengths, average = next(per_tree)
+            return (lengths + average - 1.0).reshape(-1, 1)
+
+        arrays, roots = _concat_sklearn_trees(model.estimators_, leaf_values)
+        meta = {
+            'kind': 'isolation_forest',
+            'feature_names': names,
+            'offset': float(model.offset_),
+            'denominator': float(len(model.estimators_) *
+                                 _average_path_length([model._max_samples])[0]),
+        }
+    else:
+        def leaf_values(t):
+            # DecisionTreeClassifier.predict_proba: class weights normalized per leaf
+            v = t.value[:, 0, :]
+            normalizer = v.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            return v / normalizer
+
+        arrays, roots = _concat_sklearn_trees(model.estimators_, leaf_values)
+        meta = {
+            'kind': 'random_forest',
+            'feature_names': names,
+            'classes': model.classes_.tolist(),
+        }
+
+    return TreeArrays.from_children(arrays['left'], arrays['right'], arrays['feature'],
+                                    arrays['threshold'], arrays['values'], roots,
+                                    split='le', meta=meta)
+
+
+def export_forest(model, path, feature_names=None):
+    """Writes a RandomForestClassifier or IsolationForest as a node table directory"""
+    forest_arrays(model, feature_names).save(path)
+
+
+class ForestClassifierArrays:
+    """RandomForestClassifier.predict_proba over a node table"""
+
+    def __init__(self, trees):
+        self.trees = trees
+        self.classes_ = np.asarray(trees.meta['classes'])
+        self.feature_names_in_ = np.asarray(trees.meta['feature_names'], dtype=object)
+        self.n_jobs = 1
+
+    @classmethod
+    def from_model(cls, model, feature_names=None):
+        return cls(forest_arrays(model, feature_names))
+
+    def proba_from_sums(self, sums):
+        return np.column_stack(sums) / self.trees.n_trees
+
+    def predict_proba(self, X):
+        return self.proba_from_sums([self.trees.leaf_sum(X, k) for k in range(len(self.classes_))])
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+class IsolationForestArrays:
+    """IsolationForest.score_samples / predict over a node table"""
+
+    def __init__(self, trees):
+        self.trees = trees
+        self.offset_ = trees.meta['offset']
+        self.feature_names_in_ = np.asarray(trees.meta['feature_names'], dtype=object)
+        self.n_jobs = 1
+
+    @classmethod
+    def from_model(cls, model, feature_names=None):
+        return cls(forest_arrays(model, feature_names))
+
+    def score_samples(self, X):
+        return self.score_from_depths(self.trees.leaf_sum(X))
+
+    def score_from_depths(self, depths):
+        denominator = self.trees.meta['denominator']
+        if denominator == 0:
+            return -np.ones_like(depths)
+        return -(2 ** (-(depths / denominator)))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+
+# ============ XGBOOST ============
+def export_xgboost(model, path):
+    """Saves the booster in XGBoost's native format (.json or .ubj by extension)"""
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    booster.save_model(path)
+
+
+class XGBoostArrays:
+    """
+    XGBClassifier.predict_proba for a binary:logistic booster read from its
+    native JSON, without importing xgboost. Margins are accumulated in float32
+    starting from the base margin, like XGBoost's CPU predictor.
+    """
+
+    def __init__(self, trees, base_margin, feature_names):
+        self.trees = trees
+        self.base_margin = np.float32(base_margin)
+        self.classes_ = np.array([0, 1])
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def from_model(cls, model):
+        """Compiles a fitted XGBClassifier / Booster (needs xgboost)"""
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        return cls.from_dict(json.loads(booster.save_raw('json')))
+
+    @classmethod
+    def from_dict(cls, model):
+        learner = model['learner']
+        objective = learner['objective']['name']
+        if objective != 'binary:logistic':
+            raise ValueError(f"Unsupported XGBoost objective: {objective}")
+        booster = learner['gradient_booster']
+        if booster['name'] != 'gbtree':
+            raise ValueError(f"Unsupported XGBoost booster: {booster['name']}")
+
+        trees = booster['model']['trees']
+        sizes = [len(t['left_children']) for t in trees]
+        offsets = np.cumsum([0] + sizes[:-1])
+
+        def stacked(key, dtype):
+            return np.concatenate([np.asarray(t[key], dtype=dtype) for t in trees])
+
+        left = stacked('left_children', np.int32)
+        right = stacked('right_children', np.int32)
+        shift = np.repeat(offsets, sizes).astype(np.int32)
+        inner = left >= 0
+        left[inner] += shift[inner]
+        right[inner] += shift[inner]
+        # split_conditions holds the split value on inner nodes, the leaf weight on leaves
+        conditions = stacked('split_conditions', np.float32)
+
+        arrays = TreeArrays.from_children(left, right, stacked('split_indices', np.int32),
+                                          conditions.astype(np.float64),
+                                          conditions.astype(np.float64).reshape(-1, 1),
+                                          offsets, split='lt')
+
+        base_score = np.float32(learner['learner_model_param']['base_score'].strip('[]'))
+        # ProbToMargin for the logistic objective, in float32; log is evaluated
+        # in double and rounded like libm's logf (numpy's float32 log can be
+        # one ulp off, which shifts every margin)
+        base_margin = np.float32(-np.log(np.float64(np.float32(1.0) / base_score - np.float32(1.0))))
+        return cls(arrays, base_margin, learner.get('feature_names') or [])
+
+    def predict_margin(self, X):
+        return self.trees.leaf_sum(X, initial=self.base_margin, dtype=np.float32)
+
+    def predict_proba(self, X):
+        return self.proba_from_margin(self.predict_margin(X))
+
+    @staticmethod
+    def proba_from_margin(margin):
+        # Sigmoid in float32, with libm's expf like XGBoost
+        e = expf(-margin)
+        prob = np.float32(1.0) / (e + np.float32(1.0))
+        return np.column_stack([np.float32(1.0) - prob, prob])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+
+# ============ ENSEMBLE ============
+class VotingArrays:
+    """The parts of the soft VotingClassifier the detectors use"""
+
+    def __init__(self, weights, classes):
+        self.weights = list(weights)
+        self.classes_ = np.asarray(classes)
+
+
+def export_ensemble(ensemble, feature_names, path):
+    with open(path, "w") as f:
+        json.dump({
+            'weights': list(ensemble.weights),
+            'classes': ensemble.classes_.tolist(),
+            'feature_names': list(feature_names),
+            'models': {'xgb': XGB_FILE, 'rf': RF_DIR, 'iso': ISO_DIR},
+        }, f, indent=2)
+
+
+def load_ensemble(model_dir="."):
+    """Returns (xgb, rf, iso, voting, feature_names) from native files"""
+    with open(os.path.join(model_dir, ENSEMBLE_FILE)) as f:
+        meta = json.load(f)
+    models = meta['models']
+    return (XGBoostArrays.from_json(os.path.join(model_dir, models['xgb'])),
+            ForestClassifierArrays(TreeArrays.load(os.path.join(model_dir, models['rf']))),
+            IsolationForestArrays(TreeArrays.load(os.path.join(model_dir, models['iso']))),
+            VotingArrays(meta['weights'], meta['classes']),
+            meta['feature_names'])
+
+
+# ============ COMPILED ENSEMBLE ============
+def _float32_le_threshold(threshold, split):
+    """
+    The float32 t32 such that, for every float32 x, `x <= t32` decides the
+    same as the original split: `x <= t` (sklearn, float64 t) or `x < t`
+    (XGBoost, float32 t).
+    """
+    t32 = threshold.astype(np.float32)
+    if split == 'lt':
+        return np.nextafter(t32, np.float32(-np.inf))
+    return np.where(t32.astype(np.float64) > threshold,
+                    np.nextafter(t32, np.float32(-np.inf)), t32)
+
+
+class CompiledEnsemble:
+    """
+    The XGBoost, Random Forest and Isolation Forest trees fused into one
+    contiguous node table, walked for all trees and all rows of a batch at
+    once.
+
+    Nodes are renumbered breadth-first so that siblings are adjacent: one
+    step is `node = child[node] + (x > threshold[node])`. Thresholds are
+    rounded to float32 so that comparing the float32 input gives exactly the
+    decision each library makes (x <= t in sklearn, x < t in XGBoost). Leaves
+    point to themselves with an infinite threshold. Leaf values are summed
+    per model in tree order, giving the same bits as predict_proba /
+    score_samples of the original estimators.
+    """
+
+    def __init__(self, xgb, rf, iso):
+        self.xgb, self.rf, self.iso = xgb, rf, iso
+        parts = (xgb.trees, rf.trees, iso.trees)
+
+        feature, threshold, left, right, values, roots = [], [], [], [], [], []
+        offset = 0
+        for trees in parts:
+            n = len(trees.nodes)
+            feature.append(trees.feature)
+            threshold.append(_float32_le_threshold(np.asarray(trees.threshold), trees.split))
+            left.append(np.asarray(trees.left) + offset)
+            right.append(np.asarray(trees.right) + offset)
+            # Two value columns: RF class 0/1 probabilities, one column otherwise
+            v = np.zeros((n, 2))
+            v[:, :trees.values.shape[1]] = trees.values
+            values.append(v)
+            roots.append(np.asarray(trees.roots) + offset)
+            offset += n
+        feature, threshold, left, right, values, roots = (
+            np.concatenate(a) for a in (feature, threshold, left, right, values, roots))
+        leaf = left == np.arange(len(left))
+
+        # Walk deepest trees first so each step only touches trees still descending
+        depth = _tree_depths(left, right, leaf, roots)
+        by_depth = np.argsort(-depth, kind='stable')
+        roots = roots[by_depth]
+        self.tree_order = np.argsort(by_depth)   # sorted position of each tree
+        self.active = [int(np.count_nonzero(depth > step)) for step in range(int(depth.max()))]
+
+        # Breadth-first renumbering: the children of a node get ids child, child + 1
+        order = [roots]
+        child = np.empty(len(left), dtype=np.intp)
+        frontier = roots
+        frontier_ids = np.arange(len(roots))
+        next_id = len(roots)
+        while len(frontier):
+            inner = ~leaf[frontier]
+            child[frontier_ids[~inner]] = frontier_ids[~inner]
+            parents = frontier[inner]
+            child[frontier_ids[inner]] = next_id + 2 * np.arange(len(parents))
+            frontier = np.empty(2 * len(parents), dtype=left.dtype)
+            frontier[0::2] = left[parents]
+            frontier[1::2] = right[parents]
+            frontier_ids = next_id + np.arange(len(frontier))
+            next_id += len(frontier)
+            order.append(frontier)
+        order = np.concatenate(order)
+
+        self.child = child
+        self.feature = feature[order].astype(np.intp)
+        self.threshold = np.where(leaf[order], np.float32(np.inf), threshold[order]).astype(np.float32)
+        self.values = np.ascontiguousarray(values[order])
+        self.n_roots = len(roots)
+
+        n_xgb, n_rf = xgb.trees.n_trees, rf.trees.n_trees
+        self.segments = (slice(0, n_xgb), slice(n_xgb, n_xgb + n_rf),
+                         slice(n_xgb + n_rf, self.n_roots))
+
+    @classmethod
+    def from_models(cls, xgb_model, rf_model, iso_model):
+        """Accepts the fitted library estimators or their *Arrays counterparts"""
+        if not isinstance(xgb_model, XGBoostArrays):
+            xgb_model = XGBoostArrays.from_model(xgb_model)
+        if not isinstance(rf_model, ForestClassifierArrays):
+            rf_model = ForestClassifierArrays.from_model(rf_model)
+        if not isinstance(iso_model, IsolationForestArrays):
+            iso_model = IsolationForestArrays.from_model(iso_model)
+        return cls(xgb_model, rf_model, iso_model)
+
+    def apply(self, X):
+        """Leaf id per (tree, row) for every tree of the three models, in tree order"""
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_base = np.arange(n_rows) * n_features
+        node = np.repeat(np.arange(self.n_roots)[:, None], n_rows, axis=1)
+        feature, threshold, child = self.feature, self.threshold, self.child
+        for k in self.active:
+            walk = node[:k]
+            x = flat.take(row_base + feature.take(walk))
+            node[:k] = child.take(walk) + (x > threshold.take(walk))
+        return node.take(self.tree_order, axis=0)
+
+    def scores(self, X):
+        """Returns (xgb_proba, rf_proba, iso_score) for a float32 matrix"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        leaves = self.apply(X)
+        xgb_leaves, rf_leaves, iso_leaves = (leaves[s] for s in self.segments)
+
+        margin = sequential_sum(self.values[xgb_leaves, 0], self.xgb.base_margin, np.float32)
+        xgb_proba = self.xgb.proba_from_margin(margin)
+
+        rf_values = self.values[rf_leaves]
+        rf_proba = self.rf.proba_from_sums(
+            [sequential_sum(rf_values[:, :, k]) for k in range(len(self.rf.classes_))])
+
+        iso_score = self.iso.score_from_depths(sequential_sum(self.values[iso_leaves, 0]))
+        return xgb_proba, rf_proba, iso_score
@@ -0,0 +1,422 @@
+"""
+Per-process attribution for the live detector.
+
+The host-level features say *that* a window looks malicious; ProcessTracker
+says *which* process tree is behind it. It keeps one Process per PID (keyed
+on the pid/ppid fields of SYSCALL records; comm/exe are read when a process
+first shows up in a window and on execve) with that window's counts,
+computes the detector's features per process and per subtree (a process
+plus every tracked descendant), and scores the K hottest subtrees with the
+same model in one batched call.
+
+A subtree is only a candidate if no single child subtree accounts for
+DOMINANT_CHILD of its syscalls; otherwise the child is the more specific
+explanation (systemd's subtree is the whole host and would always be the
+hottest). Of the candidates scoring above 0.5, the deepest is blamed: an
+ancestor's aggregate includes its children, so a shell above an attacking
+child scores at least as high as the child. The culprit then moves on to
+its heaviest candidate descendant while the rest of the subtree (without
+that descendant) scores 0.5 or less and lower than the descendant: the
+descendant is what made the subtree suspicious, even if alone it scores
+just under the threshold.
+
+Memory is bounded: at most max_pids processes are kept, least recently
+active first out, and a process that called exit/exit_group is dropped once
+its last window is scored. A PID that reappears with another parent is a new
+process.
+
+The tree (candidates, their ancestors and active descendants) is written
+atomically to process_tree.json at most every SNAPSHOT_INTERVAL seconds,
+where the dashboard serves it as /api/process-tree.
+"""
+import os
+import json
+import time
+import tempfile
+from collections import OrderedDict, Counter
+
+import numpy as np
+
+from audit_parser import SYSCALL_CLASSES, SYSCALL_CLASS, EXEC, CONNECT, EXIT, remote_endpoint
+from feature_extractor import (window_features, exec_entropy, features_to_vector,
+                               steady_rolling, ROLLING_FEATURE_NAMES)
+
+MAX_PIDS = 4096
+MAX_DEPTH = 64
+TOP_K = 5
+DOMINANT_CHILD = 0.9
+MAX_NODES = 300
+CRITICAL_HISTORY = 50
+
+SNAPSHOT_FILE = "process_tree.json"
+SNAPSHOT_INTERVAL = 2.0
+# The dashboard flags a snapshot older than this (detector stopped)
+STALE_SECONDS = 30
+
+EMPTY_SNAPSHOT = {'updated': 0, 'window': None, 'timestamp': None, 'tracked': 0,
+                  'processes': [], 'top': [], 'critical': []}
+
+# Per-window counters: syscalls, failed, then one per syscall class
+SYSCALLS, FAILED, KINDS = 0, 1, 2
+N_COUNTS = KINDS + len(SYSCALL_CLASSES)
+
+
+class Counts:
+    """One window's counts, paths, remote endpoints and executed binaries"""
+    __slots__ = ('counts', 'files', 'remotes', 'exes')
+
+    def __init__(self):
+        self.counts = [0] * N_COUNTS
+        self.files = set()
+        self.remotes = set()
+        self.exes = []
+
+
+class Process:
+    __slots__ = ('pid', 'ppid', 'comm', 'exe', 'first_seen', 'exited', 'window')
+
+    def __init__(self, pid, ppid, first_seen):
+        self.pid = pid
+        self.ppid = ppid
+        self.comm = None
+        self.exe = None
+        self.first_seen = first_seen
+        self.exited = False
+        self.window = None      # Counts of the current window while active in it
+
+    @property
+    def name(self):
+        return self.comm or os.path.basename(self.exe or '') or self.pid
+
+
+class Subtree(Counts):
+    """A process plus its tracked descendants, for one window"""
+    __slots__ = ('processes', 'max_child')
+
+    def __init__(self):
+        super().__init__()
+        self.processes = 0
+        self.max_child = 0
+
+    def without(self, other):
+        """This subtree minus a descendant's (files and endpoints only it touched)"""
+        rest = Counts()
+        rest.counts = [a - b for a, b in zip(self.counts, other.counts)]
+        rest.files = self.files - other.files
+        rest.remotes = self.remotes - other.remotes
+        rest.exes = list((Counter(self.exes) - Counter(other.exes)).elements())
+        return rest
+
+
+def _features(item):
+    """Features of a Counts' window"""
+    counts = item.counts
+    return window_features(counts[SYSCALLS], counts[FAILED], counts[KINDS:], len(item.files),
+                           len(item.remotes), exec_entropy(item.exes))
+
+
+def _runtime(seconds):
+    seconds = int(max(seconds, 0))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m"
+    return f"{seconds}s"
+
+
+class ProcessTracker:
+    """
+    model         - anything with predict_proba(matrix) (the detector's model)
+    feature_names - the model's column order
+    """
+
+    def __init__(self, model, feature_names, top_k=TOP_K, max_pids=MAX_PIDS,
+                 snapshot_file=SNAPSHOT_FILE, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.model = model
+        self.feature_names = list(feature_names)
+        # Subtrees have no history: a model using the rolling columns scores
+        # them as if this window had held steady
+        self.steady = not set(self.feature_names).isdisjoint(ROLLING_FEATURE_NAMES)
+        self.top_k = top_k
+        self.max_pids = max_pids
+        self.snapshot_file = snapshot_file
+        self.snapshot_interval = snapshot_interval
+
+        self.procs = OrderedDict()      # pid -> Process, least recently active first
+        self.active = {}                # pid -> Process with records in the current window
+        # Preallocated model input, one row per candidate
+        self.x = np.zeros((top_k, len(self.feature_names)), dtype=np.float32)
+        self.critical = []
+        self.last_snapshot = None
+        self.next_write = 0.0
+
+        # Counters
+        self.windows = 0
+        self.evicted = 0
+        self.exited = 0
+        self.snapshots_written = 0
+
+    def observe(self, events, now):
+        """Adds parsed AuditEvents to the current window (now: its start, epoch seconds)"""
+        procs = self.procs
+        active = self.active
+        arch = classes = None
+        for ev in events:
+            if ev.syscall is None:
+                continue
+            ids = ev.pids
+            if ids is None:
+                continue
+            pid, ppid = ids
+            proc = active.get(pid)
+            if proc is None or proc.ppid != ppid:
+                proc = procs.get(pid)
+                if proc is None or proc.ppid != ppid:
+                    # New process, or the PID was reused
+                    proc = Process(pid, ppid, now)
+                    procs[pid] = proc
+                else:
+                    procs.move_to_end(pid)
+                active[pid] = proc
+                proc.window = Counts()
+                proc.comm, proc.exe = ev.image
+            if ev.arch != arch:
+                arch = ev.arch
+                classes = SYSCALL_CLASS.get(arch, {})
+            kind = classes.get(ev.syscall)
+            window = proc.window
+            counts = window.counts
+            counts[SYSCALLS] += 1
+            if ev.success == 'no':
+                counts[FAILED] += 1
+            if kind is not None:
+                counts[KINDS + kind] += 1
+                if kind == EXEC:
+                    proc.comm, proc.exe = ev.image
+                    if proc.exe is not None:
+                        window.exes.append(proc.exe)
+                elif kind == CONNECT and ev.saddr:
+                    endpoint = remote_endpoint(ev.saddr)
+                    if endpoint:
+                        window.remotes.add(endpoint)
+                elif kind == EXIT:
+                    proc.exited = True
+            if ev.paths:
+                window.files.update(ev.paths)
+
+        while len(procs) > self.max_pids:
+            pid, _ = procs.popitem(last=False)
+            active.pop(pid, None)
+            self.evicted += 1
+
+    def _subtrees(self):
+        """pid -> Subtree for every active process and its ancestors"""
+        procs = self.procs
+        subtrees = {}
+        for proc in self.active.values():
+            window = proc.window
+            node, depth = proc, 0
+            while node is not None and depth < MAX_DEPTH:
+                sub = subtrees.get(node.pid)
+                if sub is None:
+                    sub = subtrees[node.pid] = Subtree()
+                for i, n in enumerate(window.counts):
+                    sub.counts[i] += n
+                sub.files |= window.files
+                sub.remotes |= window.remotes
+                sub.exes += window.exes
+                sub.processes += 1
+                parent = procs.get(node.ppid)
+                node, depth = (parent if parent is not node else None), depth + 1
+        for pid, sub in subtrees.items():
+            parent = procs[pid].ppid
+            if parent in subtrees:
+                above = subtrees[parent]
+                above.max_child = max(above.max_child, sub.counts[SYSCALLS])
+        return subtrees
+
+    def close_window(self, start):
+        """
+        Scores the window built by observe(): returns the culprit
+        {pid, name, exe, probability, processes} or None, and resets the
+        per-window counts.
+        """
+        self.windows += 1
+        subtrees = self._subtrees()
+        candidates = [pid for pid, sub in subtrees.items()
+                      if sub.counts[SYSCALLS] and sub.max_child < DOMINANT_CHILD * sub.counts[SYSCALLS]]
+        candidates.sort(key=lambda pid: subtrees[pid].counts[SYSCALLS], reverse=True)
+        candidates = candidates[:self.top_k]
+
+        scores = {}
+        if candidates:
+            x = self.x[:len(candidates)]
+            for row, pid in zip(x, candidates):
+                features = _features(subtrees[pid])
+                if self.steady:
+                    features.update(steady_rolling(features))
+                features_to_vector(features, self.feature_names, out=row)
+            probs = self.model.predict_proba(x)[:, 1]
+            scores = {pid: float(p) for pid, p in zip(candidates, probs)}
+
+        culprit = None
+        best = self._culprit(candidates, subtrees, scores)
+        if best is not None:
+            proc = self.procs[best]
+            culprit = {'pid': best, 'name': proc.name, 'exe': proc.exe,
+                       'probability': scores[best], 'processes': subtrees[best].processes}
+            self.critical.append({'ts': int(start),
+                                  'timestamp': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start)),
+                                  **culprit})
+            del self.critical[:-CRITICAL_HISTORY]
+
+        # Everything snapshot() needs, as exited processes are dropped below
+        own = {pid: proc.window for pid, proc in self.active.items()}
+        seen = {pid: self.procs[pid] for pid in subtrees}
+        self.last_snapshot = (start, subtrees, candidates, scores, own, seen)
+        if time.monotonic() >= self.next_write:
+            self.write_snapshot()
+
+        for proc in self.active.values():
+            if proc.exited and self.procs.get(proc.pid) is proc:
+                del self.procs[proc.pid]
+                self.exited += 1
+        self.active = {}
+        return culprit
+
+    def _ancestors(self, pid):
+        """Tracked ancestors of pid, nearest first"""
+        out, node, depth = [], self.procs.get(pid), 0
+        while node is not None and depth < MAX_DEPTH:
+            parent = self.procs.get(node.ppid)
+            if parent is None or parent is node:
+                break
+            out.append(parent.pid)
+            node, depth = parent, depth + 1
+        return out
+
+    def _culprit(self, candidates, subtrees, scores):
+        """The candidate to blame (see the module docstring), or None"""
+        flagged = [pid for pid in candidates if scores[pid] > 0.5]
+        if not flagged:
+            return None
+        ancestors = {pid: self._ancestors(pid) for pid in candidates}
+        # Deepest: drop every flagged candidate with a flagged descendant
+        covered = {a for pid in flagged for a in ancestors[pid]}
+        best = max((pid for pid in flagged if pid not in covered), key=lambda pid: scores[pid])
+
+        while True:
+            below = [pid for pid in candidates if best in ancestors[pid]]
+            if not below:
+                return best
+            child = max(below, key=lambda pid: subtrees[pid].counts[SYSCALLS])
+            rest = _features(subtrees[best].without(subtrees[child]))
+            if self.steady:
+                rest.update(steady_rolling(rest))
+            row = features_to_vector(rest, self.feature_names, out=self.x[0])
+            rest = self.model.predict_proba(row[None, :])[0, 1]
+            if rest > 0.5 or rest >= scores[child]:
+                return best
+            best = child
+
+    def snapshot(self):
+        """The /api/process-tree payload for the last closed window"""
+        if self.last_snapshot is None:
+            return dict(EMPTY_SNAPSHOT, updated=time.time(), tracked=len(self.procs))
+        start, subtrees, candidates, scores, own, procs = self.last_snapshot
+
+        suspicious_roots = {pid for pid in candidates if scores[pid] > 0.5}
+        included = {}
+        # Candidate roots with their ancestors, then their active descendants
+        for pid in candidates:
+            node, depth = procs.get(pid), 0
+            while node is not None and depth < MAX_DEPTH and node.pid not in included:
+                included[node.pid] = False
+                parent = procs.get(node.ppid)
+                node, depth = (parent if parent is not node else None), depth + 1
+        for pid in own:
+            if len(included) >= MAX_NODES:
+                break
+            chain, node, depth = [], procs.get(pid), 0
+            while node is not None and depth < MAX_DEPTH:
+                chain.append(node.pid)
+                if node.pid in candidates:
+                    for p in chain:
+                        included.setdefault(p, False)
+                    break
+                parent = procs.get(node.ppid)
+                node, depth = (parent if parent is not node else None), depth + 1
+        # Everything under a suspicious root is suspicious
+        for pid in included:
+            node, depth = procs.get(pid), 0
+            while node is not None and depth < MAX_DEPTH:
+                if node.pid in suspicious_roots:
+                    included[pid] = True
+                    break
+                parent = procs.get(node.ppid)
+                node, depth = (parent if parent is not node else None), depth + 1
+
+        nodes = {}
+        for pid, suspicious in included.items():
+            proc = procs[pid]
+            features = _features(own[pid]) if pid in own else None
+            sub = subtrees.get(pid)
+            nodes[pid] = {
+                'pid': pid,
+                'ppid': proc.ppid,
+                'name': proc.name,
+                'cmdline': proc.exe,
+                'syscall_rate': features['syscall_rate'] if features else 0,
+                'features': features,
+                'subtree': _features(sub) if sub else None,
+                'score': scores.get(pid),
+                'suspicious': suspicious,
+                'runtime': _runtime(start - proc.first_seen),
+                'children': [],
+            }
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node['ppid'])
+            (parent['children'] if parent is not None and parent is not node else roots).append(node)
+
+        top = [{'pid': pid, 'name': procs[pid].name, 'exe': procs[pid].exe, 'score': scores[pid],
+                'processes': subtrees[pid].processes,
+                'features': _features(subtrees[pid])}
+               for pid in candidates]
+        return {
+            'updated': time.time(),
+            'window': int(start),
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start)),
+            'tracked': len(self.procs),
+            'processes': roots,
+            'top': top,
+            'critical': list(self.critical),
+        }
+
+    def write_snapshot(self):
+        """Writes snapshot() to snapshot_file (temporary file + rename)"""
+        self.next_write = time.monotonic() + self.snapshot_interval
+        if not self.snapshot_file:
+            return
+        directory = os.path.dirname(os.path.abspath(self.snapshot_file))
+        try:
+            fd, tmp = tempfile.mkstemp(prefix=".process_tree.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.snapshot(), f)
+                os.replace(tmp, self.snapshot_file)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            self.snapshots_written += 1
+        except OSError as e:
+            print(f"[WARN] Could not write {self.snapshot_file}: {e}")
+
+    def stats(self):
+        return {
+            'tracked': len(self.procs),
+            'windows': self.windows,
+            'evicted': self.evicted,
+            'exited': self.exited,
+            'snapshots_written': self.snapshots_written,
+        }
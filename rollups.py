@@ -0,0 +1,404 @@
+"""
+Minute / hour / day rollups of the events table.
+
+Each level keeps, per time bucket: count, threats, sum and max of
+probability (overall and over threats only), syscall_rate and churn_rate,
+and the minimum of probability, syscall_rate and churn_rate.
+Buckets are timestamp prefixes ('YYYY-MM-DD HH:MM', 'YYYY-MM-DD HH',
+'YYYY-MM-DD'), so they sort chronologically like the TEXT timestamps.
+An INSERT trigger updates all three levels in the writer's transaction.
+
+Queries are planned over the coarsest level whose buckets fit the requested
+range, falling back to finer levels (and finally raw rows) only for the
+unaligned edges. Because analytics no longer need the raw 1-second rows,
+apply_retention() ages them out; rollups and the all-time counters stay.
+
+    python rollups.py rebuild  [--db events.db]
+    python rollups.py retain   [--db events.db] [--raw-days 30]
+"""
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+
+import event_counters
+
+# level -> timestamp prefix length
+LEVELS = {'day': 10, 'hour': 13, 'minute': 16}
+ORDER = ('day', 'hour', 'minute')
+UNITS = {'day': timedelta(days=1), 'hour': timedelta(hours=1), 'minute': timedelta(minutes=1)}
+
+RAW_RETENTION_DAYS = 30
+MINUTE_RETENTION_DAYS = 90
+RETENTION_BATCH = 50000
+
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+COLUMNS = ('bucket', 'count', 'threats', 'prob_sum', 'prob_max', 'threat_prob_sum',
+           'threat_prob_max', 'syscall_sum', 'syscall_max', 'churn_sum', 'churn_max',
+           'prob_min', 'syscall_min', 'churn_min')
+
+# Added after the first release (see add_minimums)
+MIN_COLUMNS = {'prob_min': 'REAL', 'syscall_min': 'INTEGER', 'churn_min': 'INTEGER'}
+
+
+def _table(level):
+    return f"events_rollup_{level}"
+
+
+def _max(column, fn='max'):
+    """Two-argument max that ignores NULL (SQLite's scalar max() returns NULL)"""
+    return (f"CASE WHEN excluded.{column} IS NULL THEN {column} "
+            f"WHEN {column} IS NULL THEN excluded.{column} "
+            f"ELSE {fn}({column}, excluded.{column}) END")
+
+
+def _min(column):
+    return _max(column, 'min')
+
+
+def _schema(level):
+    table = _table(level)
+    n = LEVELS[level]
+    return [f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            bucket TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            threats INTEGER NOT NULL,
+            prob_sum REAL NOT NULL,
+            prob_max REAL,
+            threat_prob_sum REAL NOT NULL,
+            threat_prob_max REAL,
+            syscall_sum INTEGER NOT NULL,
+            syscall_max INTEGER,
+            churn_sum INTEGER NOT NULL,
+            churn_max INTEGER,
+            prob_min REAL,
+            syscall_min INTEGER,
+            churn_min INTEGER
+        ) WITHOUT ROWID
+    ''', f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON events BEGIN
+            INSERT INTO {table} ({', '.join(COLUMNS)})
+            VALUES (
+                substr(NEW.timestamp, 1, {n}), 1,
+                coalesce(NEW.status = 'CRITICAL', 0),
+                coalesce(NEW.probability, 0), NEW.probability,
+                CASE WHEN NEW.status = 'CRITICAL' THEN coalesce(NEW.probability, 0) ELSE 0 END,
+                CASE WHEN NEW.status = 'CRITICAL' THEN NEW.probability END,
+                coalesce(NEW.syscall_rate, 0), NEW.syscall_rate,
+                coalesce(NEW.churn_rate, 0), NEW.churn_rate,
+                NEW.probability, NEW.syscall_rate, NEW.churn_rate
+            )
+            ON CONFLICT (bucket) DO UPDATE SET
+                count = count + 1,
+                threats = threats + excluded.threats,
+                prob_sum = prob_sum + excluded.prob_sum,
+                prob_max = {_max('prob_max')},
+                threat_prob_sum = threat_prob_sum + excluded.threat_prob_sum,
+                threat_prob_max = {_max('threat_prob_max')},
+                syscall_sum = syscall_sum + excluded.syscall_sum,
+                syscall_max = {_max('syscall_max')},
+                churn_sum = churn_sum + excluded.churn_sum,
+                churn_max = {_max('churn_max')},
+                prob_min = {_min('prob_min')},
+                syscall_min = {_min('syscall_min')},
+                churn_min = {_min('churn_min')};
+        END
+    ''']
+
+
+def _backfill(conn, level, after='', inclusive=False):
+    """Recomputes the buckets of one level that sort after `after` from raw rows"""
+    n = LEVELS[level]
+    op = '>=' if inclusive else '>'
+    conn.execute(f"DELETE FROM {_table(level)} WHERE bucket {op} ?", (after,))
+    conn.execute(f'''
+        INSERT INTO {_table(level)} ({', '.join(COLUMNS)})
+        SELECT substr(timestamp, 1, {n}), COUNT(*),
+               coalesce(SUM(status = 'CRITICAL'), 0),
+               TOTAL(probability), MAX(probability),
+               TOTAL(CASE WHEN status = 'CRITICAL' THEN probability END),
+               MAX(CASE WHEN status = 'CRITICAL' THEN probability END),
+               TOTAL(syscall_rate), MAX(syscall_rate),
+               TOTAL(churn_rate), MAX(churn_rate),
+               MIN(probability), MIN(syscall_rate), MIN(churn_rate)
+        FROM events WHERE substr(timestamp, 1, {n}) {op} ? GROUP BY 1
+    ''', (after,))
+
+
+def install(conn):
+    """
+    Creates the rollup tables and triggers (idempotent); a newly created
+    level is backfilled from the raw rows in the same transaction.
+    """
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for level in ORDER:
+            for statement in _schema(level):
+                conn.execute(statement)
+            if _table(level) not in existing:
+                _backfill(conn, level)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def add_minimums(conn):
+    """
+    Upgrades rollup tables created before the *_min columns existed: adds
+    the columns, replaces the insert triggers and recomputes the buckets
+    that raw rows still fully cover (older buckets keep NULL minimums).
+    Runs in the caller's transaction (schema migration 5).
+    """
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    oldest = conn.execute("SELECT MIN(timestamp) FROM events").fetchone()[0]
+    for level in ORDER:
+        table = _table(level)
+        if table not in existing:
+            continue
+        present = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column, kind in MIN_COLUMNS.items():
+            if column not in present:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+        conn.execute(f"DROP TRIGGER IF EXISTS {table}_insert")
+        for statement in _schema(level):
+            conn.execute(statement)
+        if oldest:
+            n = LEVELS[level]
+            # The oldest bucket is complete unless retention deleted part of it
+            kept = conn.execute(f"SELECT count FROM {table} WHERE bucket = ?", (oldest[:n],)).fetchone()
+            raw = conn.execute("SELECT COUNT(*) FROM events WHERE timestamp >= ? AND timestamp < ?",
+                               (oldest[:n], oldest[:n] + '~')).fetchone()[0]
+            _backfill(conn, level, oldest[:n], inclusive=kept is not None and kept[0] == raw)
+
+
+def rebuild(conn):
+    """
+    Recomputes every level from the raw rows still in events. Buckets up to
+    and including the one holding the oldest raw row are left alone, since
+    their rows may already have been aged out.
+    """
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        oldest = conn.execute("SELECT MIN(timestamp) FROM events").fetchone()[0]
+        for level in ORDER:
+            _backfill(conn, level, oldest[:LEVELS[level]] if oldest else '')
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+# ============ QUERY PLANNING ============
+def floor_bucket(t, level):
+    """Start of the minute / hour / day bucket (level) that datetime t falls in"""
+    if level == 'day':
+        return t.replace(hour=0, minute=0, second=0, microsecond=0)
+    if level == 'hour':
+        return t.replace(minute=0, second=0, microsecond=0)
+    return t.replace(second=0, microsecond=0)
+
+
+def _ceil(t, level):
+    f = floor_bucket(t, level)
+    return f if f == t else f + UNITS[level]
+
+
+def plan(start, end=None, coarsest='day'):
+    """
+    Splits [start, end) into (level, lo, hi) segments, using the coarsest
+    level whose whole buckets fit and finer ones for the edges. level None
+    means raw rows. end=None is open-ended (up to the newest row), which any
+    level can answer from the aligned start onwards.
+    """
+    levels = ORDER[ORDER.index(coarsest):]
+
+    def split(lo, hi, i):
+        if hi is not None and lo >= hi:
+            return []
+        if i == len(levels):
+            return [(None, lo, hi)]
+        level = levels[i]
+        a = _ceil(lo, level)
+        b = None if hi is None else floor_bucket(hi, level)
+        if b is not None and a >= b:
+            return split(lo, hi, i + 1)
+        return split(lo, a, i + 1) + [(level, a, b)] + ([] if b is None else split(b, hi, i + 1))
+
+    return split(start, end, 0)
+
+
+def _segment_sql(level, lo, hi):
+    """A SELECT producing COLUMNS for one planned segment"""
+    if level is None:
+        select = '''
+            SELECT timestamp AS bucket, 1 AS count, status = 'CRITICAL' AS threats,
+                   coalesce(probability, 0) AS prob_sum, probability AS prob_max,
+                   CASE WHEN status = 'CRITICAL' THEN coalesce(probability, 0) ELSE 0 END AS threat_prob_sum,
+                   CASE WHEN status = 'CRITICAL' THEN probability END AS threat_prob_max,
+                   coalesce(syscall_rate, 0) AS syscall_sum, syscall_rate AS syscall_max,
+                   coalesce(churn_rate, 0) AS churn_sum, churn_rate AS churn_max,
+                   probability AS prob_min, syscall_rate AS syscall_min, churn_rate AS churn_min
+            FROM events WHERE ts >= ?'''
+        # Naive local datetimes -> epoch seconds, matched through idx_events_ts
+        lo_key = int(lo.timestamp())
+        hi_key = None if hi is None else int(hi.timestamp())
+        column = 'ts'
+    else:
+        n = LEVELS[level]
+        select = f"SELECT {', '.join(COLUMNS)} FROM {_table(level)} WHERE bucket >= ?"
+        lo_key = lo.strftime(TS_FORMAT)[:n]
+        hi_key = None if hi is None else hi.strftime(TS_FORMAT)[:n]
+        column = 'bucket'
+    if hi_key is None:
+        return select, [lo_key]
+    return f"{select} AND {column} < ?", [lo_key, hi_key]
+
+
+def source(start, end=None, coarsest='day'):
+    """UNION ALL of the planned segments, as (sql, params)"""
+    parts, params = [], []
+    for level, lo, hi in plan(start, end, coarsest):
+        sql, args = _segment_sql(level, lo, hi)
+        parts.append(sql)
+        params.extend(args)
+    return " UNION ALL ".join(parts), params
+
+
+def analytics(conn, start, end=None):
+    """
+    The /api/analytics payload for [start, end): daily stats and the threat
+    summary come from day buckets, the hour-of-day distribution from hour
+    buckets.
+    """
+    days_sql, days_params = source(start, end, 'day')
+    daily_stats = conn.execute(f'''
+        SELECT substr(bucket, 1, 10) AS date,
+               SUM(count) AS total_events,
+               SUM(threats) AS threats,
+               SUM(prob_sum) / SUM(count) AS avg_probability,
+               SUM(syscall_sum) * 1.0 / SUM(count) AS avg_syscall_rate,
+               SUM(churn_sum) * 1.0 / SUM(count) AS avg_churn_rate
+        FROM ({days_sql})
+        GROUP BY 1 ORDER BY 1
+    ''', days_params).fetchall()
+
+    summary = conn.execute(f'''
+        SELECT coalesce(SUM(threats), 0) AS total_threats,
+               SUM(threat_prob_sum) / SUM(threats) AS avg_threat_prob,
+               MAX(threat_prob_max) AS max_threat_prob
+        FROM ({days_sql})
+    ''', days_params).fetchone()
+
+    hours_sql, hours_params = source(start, end, 'hour')
+    hourly_dist = conn.execute(f'''
+        SELECT substr(bucket, 12, 2) AS hour, SUM(threats) AS count
+        FROM ({hours_sql})
+        GROUP BY 1 HAVING SUM(threats) > 0 ORDER BY 1
+    ''', hours_params).fetchall()
+
+    return {
+        'daily_stats': [dict(row) for row in daily_stats],
+        'hourly_distribution': [dict(row) for row in hourly_dist],
+        'summary': dict(summary) if summary else {},
+    }
+
+
+# ============ RETENTION ============
+def _last_id_before(conn, cutoff):
+    """
+    Highest id whose timestamp is before cutoff, by binary search over the
+    primary key (rows are appended in time order) instead of a table scan.
+    """
+    lo, hi = conn.execute("SELECT MIN(id), MAX(id) FROM events").fetchone()
+    if lo is None:
+        return None
+    found = None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        row = conn.execute("SELECT id, timestamp FROM events WHERE id >= ? ORDER BY id LIMIT 1",
+                           (mid,)).fetchone()
+        if row is None:
+            hi = mid - 1
+        elif row[1] is not None and row[1] < cutoff:
+            found = row[0]
+            lo = row[0] + 1
+        else:
+            hi = mid - 1
+    return found
+
+
+def apply_retention(conn, raw_days=RAW_RETENTION_DAYS, minute_days=MINUTE_RETENTION_DAYS,
+                    batch=RETENTION_BATCH, now=None, archive=None):
+    """
+    Deletes raw events older than raw_days and minute buckets older than
+    minute_days. Hour and day buckets are kept. The all-time counters are
+    unchanged: the rows being aged out are added back before the delete
+    trigger subtracts them. Works in batches so the writer is never blocked
+    for long. Returns the number of raw rows deleted.
+
+    archive(conn, first_id, last_id), if given, is called for every batch
+    before it is deleted (see archive.EventArchive); if it raises, the batch
+    stays in the table.
+    """
+    conn.commit()
+    now = now or datetime.now()
+    cutoff = (now - timedelta(days=raw_days)).strftime(TS_FORMAT)
+    last_id = _last_id_before(conn, cutoff)
+    deleted = 0
+    if last_id is not None:
+        first = conn.execute("SELECT MIN(id) FROM events").fetchone()[0]
+        while first is not None and first <= last_id:
+            upper = min(first + batch - 1, last_id)
+            if archive is not None:
+                archive(conn, first, upper)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(f'''
+                    INSERT INTO event_counts (day, status, count)
+                    SELECT '{event_counters.ALL_DAYS}', coalesce(status, ''), COUNT(*)
+                    FROM events WHERE id BETWEEN ? AND ? GROUP BY 2
+                    ON CONFLICT (day, status) DO UPDATE SET count = count + excluded.count
+                ''', (first, upper))
+                conn.execute('''
+                    INSERT INTO event_counts (day, status, count)
+                    SELECT substr(timestamp, 1, 10), coalesce(status, ''), COUNT(*)
+                    FROM events WHERE id BETWEEN ? AND ? GROUP BY 1, 2
+                    ON CONFLICT (day, status) DO UPDATE SET count = count + excluded.count
+                ''', (first, upper))
+                deleted += conn.execute("DELETE FROM events WHERE id BETWEEN ? AND ?",
+                                        (first, upper)).rowcount
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            first = upper + 1
+
+    minute_cutoff = (now - timedelta(days=minute_days)).strftime(TS_FORMAT)[:LEVELS['minute']]
+    conn.execute(f"DELETE FROM {_table('minute')} WHERE bucket < ?", (minute_cutoff,))
+    conn.commit()
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event rollup maintenance")
+    parser.add_argument("command", choices=["rebuild", "retain"])
+    parser.add_argument("--db", type=str, default="events.db")
+    parser.add_argument("--raw-days", type=int, default=RAW_RETENTION_DAYS)
+    parser.add_argument("--minute-days", type=int, default=MINUTE_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    event_counters.install(conn)
+    install(conn)
+    if args.command == "rebuild":
+        rebuild(conn)
+        print("[*] Rollups rebuilt from raw events")
+    else:
+        n = apply_retention(conn, args.raw_days, args.minute_days)
+        print(f"[*] Aged out {n} raw events older than {args.raw_days} days")
+    conn.close()
@@ -1,116 +1,163 @@
 import time
-import pandas as pd
+import numpy as np
 import pickle
 import os
 import sys
-from feature_extractor import AuditFeatureExtractor
+import argparse
+import itertools
+import importlib.util
+from feature_extractor import AuditFeatureExtractor, FEATURE_NAMES, features_to_vector
+from windowing import EventTimeWindower
+import audit_sources
+import process_tree
+from event_writer import EventWriter
+from model_store import XGBoostArrays
+import event_counters
+import rollups
+import schema
+import alert_dispatcher
+import alert_rules
+from config_store import ConfigStore, CONFIG_FILE
 import sqlite3
 
 LOG_FILE = "/var/log/audit/audit.log"
 DB_FILE = "events.db"
+MODEL_FILE = "xgboost_model.json"      # native booster, scored with numpy only
+LEGACY_MODEL_FILE = "xgboost_model.pkl"
+
+# End-of-input marker after a finite source (replay:, stdin at EOF)
+FLUSH = object()
+
+# Event-time windowing (seconds)
+WINDOW_SIZE = 1.0
+WINDOW_SLIDE = None         # None = tumbling
+ALLOWED_LATENESS = 2.0
 
 def init_db():
     conn = sqlite3.connect(DB_FILE)
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            status TEXT,
-            probability REAL,
-            syscall_rate INTEGER,
-            churn_rate INTEGER
-        )
-    ''')
-    conn.commit()
+    conn.execute("PRAGMA journal_mode=WAL")
+    schema.migrate(conn, log=print)
+    event_counters.install(conn)
+    rollups.install(conn)
+    alert_dispatcher.install(conn)
     conn.close()
 
-def follow(file_path):
+def load_model():
     """
-    Generator that yields new lines from a file, handling log rotation.
+    Loads the native booster when present (no xgboost/sklearn import, well
+    under a second); falls back to the pickle written by older trainers.
     """
-    if not os.path.exists(file_path):
-        print(f"Waiting for {file_path} to exist...")
-        while not os.path.exists(file_path):
-            time.sleep(1)
-
-    f = open(file_path, 'r')
-    f.seek(0, 2) # Go to end
-    
-    inode = os.fstat(f.fileno()).st_ino
-    
-    while True:
-        line = f.readline()
-        if not line:
-            time.sleep(0.1)
-            # Check for rotation
-            try:
-                if os.stat(file_path).st_ino != inode:
-                    print("\n[INFO] Log rotation detected! Reopening file...")
-                    f.close()
-                    f = open(file_path, 'r')
-                    inode = os.fstat(f.fileno()).st_ino
-            except FileNotFoundError:
-                pass # Log might briefly disappear during rotation
-            continue
-            
-        yield line
+    if os.path.exists(MODEL_FILE):
+        return XGBoostArrays.from_json(MODEL_FILE)
+    if os.path.exists(LEGACY_MODEL_FILE):
+        print(f"[WARN] {MODEL_FILE} not found, loading {LEGACY_MODEL_FILE} (slow start; re-run train_supervised.py)")
+        with open(LEGACY_MODEL_FILE, "rb") as f:
+            return pickle.load(f)
+    return None
 
-def main():
+def main(window=WINDOW_SIZE, slide=WINDOW_SLIDE, lateness=ALLOWED_LATENESS, source=LOG_FILE):
     init_db() # Initialize Database
-    if not os.path.exists("xgboost_model.pkl"):
+    print("Loading Model...")
+    model = load_model()
+    if model is None:
         print("Error: Model not found. Train the model first using train_supervised.py")
         sys.exit(1)
         
-    print("Loading Model...")
-    with open("xgboost_model.pkl", "rb") as f:
-        model = pickle.load(f)
+    # Preallocated input row in the model's column order
+    feature_names = list(getattr(model, 'feature_names_in_', FEATURE_NAMES))
+    x = np.zeros((1, len(feature_names)), dtype=np.float32)
         
-    extractor = AuditFeatureExtractor()
-    buffer = []
-    last_check = time.time()
+    # Keeps the rolling 5s/60s/300s history of the window features
+    extractor = AuditFeatureExtractor(step=slide or window)
+    # Per-process aggregates: which process subtree a CRITICAL window comes from
+    tracker = process_tree.ProcessTracker(model, feature_names)
+    # Windows are cut on the audit(epoch:serial) timestamp, not on arrival time
+    windower = EventTimeWindower(size=window, slide=slide, allowed_lateness=lateness)
+    # Rows are batched and committed off the detection thread; with pyarrow
+    # installed, rows older than a week move to the Parquet archive. archive
+    # (and pyarrow, the slowest import of this module) is only imported then
+    if importlib.util.find_spec('pyarrow') is None:
+        writer = EventWriter(DB_FILE)
+    else:
+        import archive
+        writer = EventWriter(DB_FILE, raw_retention_days=archive.HOT_DAYS, archive=archive.open_archive())
+    writer.start()
+    # Thresholds from sentinel_config.json, reloaded when the file changes;
+    # matches are queued for the dashboard's alert dispatcher off this thread
+    config_store = ConfigStore(CONFIG_FILE)
+    alerts = alert_rules.AlertSink(DB_FILE, config_store)
+    alerts.start()
     
     print("\n[*] Starting Real-Time Anomaly Detection...")
-    print(f"[*] Monitoring {LOG_FILE}")
+    print(f"[*] Monitoring {source}")
     print("-" * 65)
     print(f"{'TIMESTAMP':<25} | {'STATUS':<15} | {'PROBABILITY':<12}")
     print("-" * 65)
     
     try:
-        for line in follow(LOG_FILE):
-            buffer.append(line)
+        batches = audit_sources.open_source(source)
+        for batch in itertools.chain(batches, [FLUSH]):
+            if batch is FLUSH:
+                # A replayed log ended: score the windows still open
+                windows = windower.flush()
+            else:
+                windows = windower.tick() if batch is None else windower.add_lines(batch)
             
-            # Check every 1 second
-            if time.time() - last_check >= 1.0:
-                if buffer:
-                    features = extractor.process_window(buffer)
-                    df = pd.DataFrame([features])
-                    
-                    # Predict
-                    prob = model.predict_proba(df)[0][1] # Probability of Class 1 (Malicious)
-                    pred = model.predict(df)[0]
-                    
-                    status = "\033[91mCRITICAL\033[0m" if pred == 1 else "\033[92mSAFE\033[0m"
-                    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    
-                    # Print log line (scrolling)
-                    print(f"{timestamp:<25} | {status:<24} | {prob:.4f}")
-                    
-                    # Write to DB
-                    try:
-                        conn = sqlite3.connect(DB_FILE)
-                        conn.execute("INSERT INTO events (timestamp, status, probability, syscall_rate, churn_rate) VALUES (?, ?, ?, ?, ?)",
-                                     (timestamp, "CRITICAL" if pred == 1 else "SAFE", float(prob), features['syscall_rate'], features['file_churn_rate']))
-                        conn.commit()
-                        conn.close()
-                    except Exception as e:
-                        print(f"DB Error: {e}")
-                    
-                    buffer = []
-                last_check = time.time()
+            for start, end, lines in windows:
+                events = extractor.parser.parse(lines)
+                features = extractor.add_rolling(extractor.process_events(events), start)
+                features_to_vector(features, feature_names, out=x[0])
+                
+                # Predict (one model call; XGBoost's predict() is just prob > 0.5)
+                prob = model.predict_proba(x)[0, 1] # Probability of Class 1 (Malicious)
+                pred = 1 if prob > 0.5 else 0
+                
+                # Score the hottest process subtrees of the same window
+                tracker.observe(events, start)
+                culprit = tracker.close_window(start)
+                
+                status = "\033[91mCRITICAL\033[0m" if pred == 1 else "\033[92mSAFE\033[0m"
+                timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start))
+                blame = ""
+                if pred == 1 and culprit:
+                    blame = f" | pid {culprit['pid']} {culprit['name']} ({culprit['probability']:.2f})"
+                
+                # Print log line (scrolling)
+                print(f"{timestamp:<25} | {status:<24} | {prob:.4f}{blame}")
+                
+                # Queue for the DB writer (never blocks)
+                writer.submit((timestamp, "CRITICAL" if pred == 1 else "SAFE", float(prob),
+                               features['syscall_rate'], features['file_churn_rate'], int(start)))
+                
+                # Rule stage: configured thresholds -> alert sink (never blocks)
+                matches = alert_rules.evaluate(features, prob, config_store.get(), window)
+                if matches:
+                    alerts.submit({'timestamp': timestamp, 'status': "CRITICAL" if pred == 1 else "SAFE",
+                                   'probability': float(prob), 'syscall_rate': features['syscall_rate'],
+                                   'churn_rate': features['file_churn_rate'],
+                                   'process': culprit}, matches)
                 
     except KeyboardInterrupt:
         print("\n\nStopping detector...")
+        if windower.late_lines:
+            print(f"[*] Dropped {windower.late_lines} late audit lines")
+    finally:
+        writer.close()
+        alerts.close()
+        tracker.write_snapshot()
+        print(f"[*] DB writer: {writer.stats()}")
+        print(f"[*] Alerts: {alerts.stats()}")
+        print(f"[*] Processes: {tracker.stats()}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Real-time audit anomaly detector")
+    parser.add_argument("--window", type=float, default=WINDOW_SIZE, help="Window length in seconds")
+    parser.add_argument("--slide", type=float, default=WINDOW_SLIDE,
+                        help="Hop between windows in seconds (default: tumbling)")
+    parser.add_argument("--lateness", type=float, default=ALLOWED_LATENESS,
+                        help="Allowed lateness of audit records in seconds")
+    parser.add_argument("--source", type=str, default=LOG_FILE,
+                        help="file:PATH, stdin, unix:SOCKET or replay:PATH[@SPEED] (see audit_sources.py)")
+    args = parser.parse_args()
+
+    main(args.window, args.slide, args.lateness, args.source)
@@ -0,0 +1,163 @@
+"""
+Versioned schema for events.db, shared by the dashboard and the detector.
+
+The database's version is PRAGMA user_version; migrate() applies the steps in
+MIGRATIONS that it has not seen yet, in order, so whichever process starts
+first brings an existing file up to date in place and the other one finds
+nothing to do. Each step runs in its own BEGIN IMMEDIATE transaction and
+re-checks the version inside it, so two processes starting together never
+apply a step twice. Steps that rewrite every row run in batches instead
+(short write transactions; the detector keeps writing meanwhile) and are
+idempotent, so an interrupted run simply resumes.
+
+    1  base tables (events, users, alert_history), events.ai_analysis
+    2  events.ts: integer epoch seconds next to the local-time TEXT timestamp,
+       filled in by an INSERT trigger for writers that do not set it
+    3  backfill events.ts for existing rows
+    4  indexes on (ts) and (status, ts); drops the TEXT timestamp index
+    5  minimum columns in the rollup tables (rollups.add_minimums)
+
+Range filters compare integers through these indexes instead of parsing or
+comparing text; the TEXT timestamp stays for display, counters and rollups.
+
+    python schema.py [--db events.db]
+"""
+import sqlite3
+import argparse
+
+import rollups
+
+BACKFILL_BATCH = 50000
+
+# SQL for the epoch of a local-time 'YYYY-MM-DD HH:MM:SS' value (the 'utc'
+# modifier treats its input as local time), e.g. EPOCH.format('?')
+EPOCH = "CAST(strftime('%s', {}, 'utc') AS INTEGER)"
+
+
+def _base_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            status TEXT,
+            probability REAL,
+            syscall_rate INTEGER,
+            churn_rate INTEGER,
+            ai_analysis TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            email TEXT,
+            role TEXT DEFAULT 'analyst',
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS alert_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER,
+            alert_type TEXT,
+            recipient TEXT,
+            sent_at TEXT,
+            status TEXT
+        )
+    ''')
+    # Tables created by older detectors have no ai_analysis column
+    if 'ai_analysis' not in _columns(conn, 'events'):
+        conn.execute("ALTER TABLE events ADD COLUMN ai_analysis TEXT")
+
+
+def _epoch_column(conn):
+    if 'ts' not in _columns(conn, 'events'):
+        conn.execute("ALTER TABLE events ADD COLUMN ts INTEGER")
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS events_ts_default AFTER INSERT ON events
+        WHEN NEW.ts IS NULL BEGIN
+            UPDATE events SET ts = {EPOCH.format('NEW.timestamp')} WHERE id = NEW.id;
+        END
+    ''')
+
+
+def _backfill_epoch(conn, batch=BACKFILL_BATCH):
+    last_id = 0
+    while True:
+        upper = conn.execute("SELECT max(id) FROM (SELECT id FROM events WHERE id > ? ORDER BY id LIMIT ?)",
+                             (last_id, batch)).fetchone()[0]
+        if upper is None:
+            return
+        conn.execute(f"UPDATE events SET ts = {EPOCH.format('timestamp')} "
+                     "WHERE id > ? AND id <= ? AND ts IS NULL", (last_id, upper))
+        conn.commit()
+        last_id = upper
+
+
+def _indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_status_ts ON events(status, ts)")
+    # Superseded by idx_events_ts (one index less to maintain per insert)
+    conn.execute("DROP INDEX IF EXISTS idx_events_timestamp")
+
+
+# (description, apply, batched); a step's version is its position (from 1).
+# Batched steps run outside a transaction and commit as they go.
+MIGRATIONS = (
+    ("base tables", _base_tables, False),
+    ("events.ts epoch column", _epoch_column, False),
+    ("backfill events.ts", _backfill_epoch, True),
+    ("ts and (status, ts) indexes", _indexes, False),
+    ("rollup minimums", rollups.add_minimums, False),
+)
+LATEST = len(MIGRATIONS)
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, log=None):
+    """
+    Brings the database up to LATEST. Returns the list of steps applied by
+    this call; log(message), if given, is called before each one.
+    """
+    conn.commit()
+    applied = []
+    while version(conn) < LATEST:
+        target = version(conn) + 1
+        description, apply, batched = MIGRATIONS[target - 1]
+        if log:
+            log(f"schema {target}/{LATEST}: {description}")
+        if batched:
+            apply(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have got here first
+            if version(conn) < target:
+                if not batched:
+                    apply(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                applied.append(description)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return applied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate events.db to the current schema")
+    parser.add_argument("--db", type=str, default="events.db")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    before = version(conn)
+    applied = migrate(conn, log=lambda message: print(f"[*] {message}"))
+    print(f"[*] {args.db}: schema version {before} -> {version(conn)} ({len(applied)} steps applied)")
+    conn.close()
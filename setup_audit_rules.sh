@@ -11,21 +11,32 @@ sudo auditctl -b 8192
 # Monitor file operations
 sudo auditctl -a always,exit -F arch=b64 -S open,openat,creat -k file_open
 sudo auditctl -a always,exit -F arch=b64 -S unlink,unlinkat,rmdir -k file_delete
-sudo auditctl -a always,exit -F arch=b64 -S stat,lstat,fstat,fstatat -k file_stat
+sudo auditctl -a always,exit -F arch=b64 -S stat,lstat,fstat,newfstatat -k file_stat
 
 # Monitor process operations
 sudo auditctl -a always,exit -F arch=b64 -S clone,fork,vfork -k process_create
 sudo auditctl -a always,exit -F arch=b64 -S execve,execveat -k process_exec
+# Lets the detector forget exited processes right away (process_tree.py)
+sudo auditctl -a always,exit -F arch=b64 -S exit_group -k process_exit
 
 # Monitor network operations
 sudo auditctl -a always,exit -F arch=b64 -S socket,connect,bind -k network
 
+# Monitor permission and identity changes
+sudo auditctl -a always,exit -F arch=b64 -S chmod,fchmod,fchmodat -k perm_change
+sudo auditctl -a always,exit -F arch=b64 -S setuid,setgid,setreuid,setregid,setresuid,setresgid -k privilege
+
 # 32-bit compatibility (Optional but good for coverage)
 sudo auditctl -a always,exit -F arch=b32 -S open,openat,creat -k file_open
 sudo auditctl -a always,exit -F arch=b32 -S unlink,unlinkat,rmdir -k file_delete
-sudo auditctl -a always,exit -F arch=b32 -S stat,lstat,fstat,fstatat -k file_stat
+sudo auditctl -a always,exit -F arch=b32 -S stat,lstat,fstat,stat64,lstat64,fstat64,fstatat64 -k file_stat
 sudo auditctl -a always,exit -F arch=b32 -S clone,fork,vfork -k process_create
 sudo auditctl -a always,exit -F arch=b32 -S execve,execveat -k process_exec
+sudo auditctl -a always,exit -F arch=b32 -S exit_group -k process_exit
+sudo auditctl -a always,exit -F arch=b32 -S socket,connect,bind -k network
+sudo auditctl -a always,exit -F arch=b32 -S chmod,fchmod,fchmodat -k perm_change
+sudo auditctl -a always,exit -F arch=b32 -S setuid,setgid,setreuid,setregid,setresuid,setresgid -k privilege
+sudo auditctl -a always,exit -F arch=b32 -S setuid32,setgid32,setreuid32,setregid32,setresuid32,setresgid32 -k privilege
 
 # Make configuration immutable (Restart required to change) - DISABLED for testing
 # sudo auditctl -e 2
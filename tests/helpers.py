@@ -0,0 +1,275 @@
+"""
+Synthetic audit logs and event tables, and the legacy implementations the
+fast paths are checked against. benchmark.py times the same baselines.
+"""
+import csv
+import io
+import os
+import random
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+import schema
+from audit_parser import SYSCALL_TABLE, ARCH_X86_64, ARCH_I386
+
+
+def synthesize_audit_log(n_events=50000, start=1700000000.0, rate=5000, seed=42):
+    """
+    Generates a realistic-looking audit.log (list of lines) for benchmarking
+    when no recorded log is available.
+    """
+    rng = random.Random(seed)
+    syscalls = ['2', '257', '257', '257', '85', '87', '263', '84', '56', '57', '59', '4', '5', '42']
+    lines = []
+    for serial in range(1, n_events + 1):
+        ts = start + serial / rate
+        stamp = f"{ts:.3f}:{serial}"
+        nr = rng.choice(syscalls)
+        success = 'no' if rng.random() < 0.1 else 'yes'
+        pid = rng.randint(1000, 5000)
+        lines.append(
+            f'type=SYSCALL msg=audit({stamp}): arch=c000003e syscall={nr} success={success} '
+            f'exit=3 a0=ffffff9c a1=7ffd2f3a a2=80000 a3=0 items=1 ppid={pid - 1} pid={pid} '
+            f'auid=1000 uid=1000 gid=1000 euid=1000 suid=1000 fsuid=1000 egid=1000 sgid=1000 '
+            f'fsgid=1000 tty=pts0 ses=2 comm="python3" exe="/usr/bin/python3.11" '
+            f'subj=unconfined key="file_open"\n'
+        )
+        if nr == '59':
+            lines.append(f'type=EXECVE msg=audit({stamp}): argc=2 a0="ls" a1="-la"\n')
+        lines.append(f'type=CWD msg=audit({stamp}): cwd="/home/user"\n')
+        lines.append(
+            f'type=PATH msg=audit({stamp}): item=0 name="/home/user/dummy_files/file_{rng.randint(0, 2000)}.txt" '
+            f'inode={rng.randint(1, 10 ** 6)} dev=08:01 mode=0100644 ouid=1000 ogid=1000 rdev=00:00 '
+            f'nametype=NORMAL cap_fp=0 cap_fi=0 cap_fe=0 cap_fver=0 cap_frootid=0\n'
+        )
+        lines.append(f'type=PROCTITLE msg=audit({stamp}): proctitle=707974686F6E33\n')
+        lines.append(f'type=EOE msg=audit({stamp}): \n')
+    return lines
+
+
+def split_windows(lines, size):
+    return [lines[i:i + size] for i in range(0, len(lines), size)]
+
+
+class LegacyRegexExtractor:
+    """The original three-regex-per-line extractor, kept as the baseline"""
+
+    def __init__(self):
+        self.syscall_pat = re.compile(r'type=SYSCALL.*syscall=(\d+).*success=(\w+)')
+        self.exec_pat = re.compile(r'type=EXECVE')
+        self.path_pat = re.compile(r'type=PATH.*name="(.*?)"')
+
+    def process_window(self, log_lines):
+        stats = defaultdict(int)
+        unique_files = set()
+        syscall_map = {
+            '2': 'open', '257': 'open', '85': 'open',
+            '87': 'unlink', '263': 'unlink', '84': 'unlink',
+            '56': 'clone', '57': 'clone', '58': 'clone', '59': 'exec'
+        }
+        for line in log_lines:
+            m_sys = self.syscall_pat.search(line)
+            if m_sys:
+                stats['syscall_count'] += 1
+                if m_sys.group(2) == 'no':
+                    stats['failed_syscalls'] += 1
+                s_type = syscall_map.get(m_sys.group(1))
+                if s_type:
+                    stats[s_type] += 1
+            m_path = self.path_pat.search(line)
+            if m_path:
+                unique_files.add(m_path.group(1))
+        return {
+            'syscall_rate': stats['syscall_count'],
+            'open_unlink_ratio': stats['open'] / max(stats['unlink'], 1),
+            'unique_files_accessed': len(unique_files),
+            'failed_syscall_ratio': stats['failed_syscalls'] / max(stats['syscall_count'], 1),
+            'process_spawn_rate': stats['clone'] + stats['exec'],
+            'file_churn_rate': stats['unlink']
+        }
+
+
+BEHAVIOURS = ('benign', 'reverse_shell', 'privilege_escalation', 'exfiltration')
+
+
+def synthesize_behaviour_log(seconds=80, start=1700000000, background=2000, i386=0.05, seed=11):
+    """
+    (behaviour, lines) per second: the same background load every second
+    (opens, stats, a few unlinks, clones and execs; i386 records mixed in),
+    plus, cycling through BEHAVIOURS, what enhanced_attack_simulator.py does:
+    connect() sweeps over ports of one host and /bin/sh execs, chmod 777 +
+    setuid(0) attempts, or connects to many hosts.
+    """
+    numbers = {name: (b64, b32) for _, _, calls in SYSCALL_TABLE for name, b64, b32 in calls}
+    rng = random.Random(seed)
+    serial = 0
+
+    def record(lines, t, name, path=None, exe='/usr/bin/python3.11', saddr=None, success='yes'):
+        nonlocal serial
+        serial += 1
+        b32 = rng.random() < i386 and numbers[name][1] is not None
+        arch, nr = (ARCH_I386, numbers[name][1]) if b32 else (ARCH_X86_64, numbers[name][0])
+        if nr is None:
+            arch, nr = ARCH_I386, numbers[name][1]
+        stamp = f"{t + serial % 1000 / 1000:.3f}:{serial}"
+        lines.append(f'type=SYSCALL msg=audit({stamp}): arch={arch} syscall={nr} success={success} exit=0 '
+                     f'a0=3 a1=0 a2=0 a3=0 items={1 if path else 0} ppid=2000 pid=4242 auid=1000 uid=1000 '
+                     f'gid=1000 euid=1000 suid=1000 fsuid=1000 egid=1000 sgid=1000 fsgid=1000 tty=pts0 '
+                     f'ses=2 comm="{os.path.basename(exe)}" exe="{exe}" subj=unconfined key=(null)\n')
+        if saddr:
+            lines.append(f'type=SOCKADDR msg=audit({stamp}): saddr={saddr}\n')
+        if path:
+            lines.append(f'type=PATH msg=audit({stamp}): item=0 name="{path}" inode=1 dev=08:01 mode=0100644\n')
+        lines.append(f'type=PROCTITLE msg=audit({stamp}): proctitle=707974686F6E33\n')
+        lines.append(f'type=EOE msg=audit({stamp}): \n')
+
+    def inet(host, port):
+        return f"0200{port:04X}{''.join(f'{int(b):02X}' for b in host.split('.'))}0000000000000000"
+
+    out = []
+    for second in range(seconds):
+        t, lines = start + second, []
+        behaviour = BEHAVIOURS[second // 5 % len(BEHAVIOURS)] if second % 5 else 'benign'
+        for _ in range(background):
+            r = rng.random()
+            name = ('openat' if r < 0.5 else 'newfstatat' if r < 0.8 else 'fstat' if r < 0.9 else
+                    'unlink' if r < 0.95 else 'clone' if r < 0.98 else 'execve')
+            if name == 'newfstatat' and rng.random() < i386:
+                name = 'fstatat64'
+            exe = rng.choice(('/usr/bin/ls', '/usr/bin/grep', '/usr/bin/python3.11')) if name == 'execve' else None
+            record(lines, t, name, f"/home/user/project/file_{rng.randint(0, 500)}.py",
+                   exe=exe or '/usr/bin/python3.11', success='no' if rng.random() < 0.08 else 'yes')
+        if behaviour == 'reverse_shell':
+            for _ in range(150):
+                record(lines, t, 'socket')
+                record(lines, t, 'connect', saddr=inet('127.0.0.1', rng.randint(1024, 65535)), success='no')
+            for _ in range(20):
+                record(lines, t, 'execve', '/bin/sh', exe=rng.choice(('/bin/sh', '/bin/bash', '/usr/bin/nc',
+                                                                      '/usr/bin/id', '/usr/bin/whoami')))
+        elif behaviour == 'privilege_escalation':
+            for i in range(60):
+                record(lines, t, 'chmod', f"/tmp/escalate_{i}")
+            for _ in range(30):
+                record(lines, t, rng.choice(('setuid', 'setgid', 'setresuid')), success='no')
+        elif behaviour == 'exfiltration':
+            for _ in range(100):
+                host = f"198.51.100.{rng.randint(1, 254)}"
+                record(lines, t, 'socket')
+                record(lines, t, 'connect', saddr=inet(host, 443))
+        out.append((behaviour, lines))
+    return out
+
+
+def legacy_ensemble_predict(detector, features_dict):
+    """The original one-row-DataFrame EnsembleDetector.predict"""
+    import pandas as pd
+    df = pd.DataFrame([features_dict])[detector.feature_names]
+    results = {
+        'xgb_prob': float(detector.xgb_model.predict_proba(df)[0][1]),
+        'xgb_pred': int(detector.xgb_model.predict(df)[0]),
+        'rf_prob': float(detector.rf_model.predict_proba(df)[0][1]),
+        'rf_pred': int(detector.rf_model.predict(df)[0]),
+        'iso_score': float(detector.iso_model.score_samples(df)[0]),
+        'iso_pred': int(detector.iso_model.predict(df)[0] == -1),
+        'ensemble_prob': float(detector.ensemble.predict_proba(df)[0][1]),
+        'ensemble_pred': int(detector.ensemble.predict(df)[0]),
+    }
+    results['combined_prob'] = (
+        results['xgb_prob'] * 0.4 +
+        results['rf_prob'] * 0.3 +
+        results['ensemble_prob'] * 0.3
+    )
+    votes = results['xgb_pred'] + results['rf_pred'] + results['iso_pred']
+    results['final_pred'] = 1 if votes >= 2 else 0
+    return results
+
+
+LEGACY_ANALYTICS = {
+    'daily_stats': '''
+        SELECT date(timestamp) as date, COUNT(*) as total_events,
+               SUM(CASE WHEN status = 'CRITICAL' THEN 1 ELSE 0 END) as threats,
+               AVG(probability) as avg_probability, AVG(syscall_rate) as avg_syscall_rate,
+               AVG(churn_rate) as avg_churn_rate
+        FROM events WHERE timestamp >= ?
+        GROUP BY date(timestamp) ORDER BY date(timestamp)''',
+    'hourly_distribution': '''
+        SELECT strftime('%H', timestamp) as hour, COUNT(*) as count
+        FROM events WHERE status = 'CRITICAL' AND timestamp >= ?
+        GROUP BY strftime('%H', timestamp)''',
+    'summary': '''
+        SELECT COUNT(*) as total_threats, AVG(probability) as avg_threat_prob,
+               MAX(probability) as max_threat_prob
+        FROM events WHERE status = 'CRITICAL' AND timestamp >= ?''',
+}
+
+
+def seed_events(conn, rows, end):
+    """rows one-second events ending at `end`, generated inside SQLite"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, status TEXT,
+            probability REAL, syscall_rate INTEGER, churn_rate INTEGER, ai_analysis TEXT)
+    ''')
+    conn.execute('''
+        WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n + 1 < ?)
+        INSERT INTO events (timestamp, status, probability, syscall_rate, churn_rate)
+        SELECT datetime(? - ? + n, 'unixepoch'),
+               CASE WHEN abs(random()) % 20 = 0 THEN 'CRITICAL' ELSE 'SAFE' END,
+               (abs(random()) % 1000) / 1000.0, abs(random()) % 500, abs(random()) % 50
+        FROM seq
+    ''', (rows, int(end.timestamp()), rows))
+    conn.commit()
+
+
+def schema_queries(end):
+    """
+    (name, before, after) range queries, each a (sql, params) pair: before
+    on the legacy TEXT timestamps, after on the epoch ts column. Both return
+    the same rows for events up to `end`.
+    """
+    today = end.replace(hour=0, minute=0, second=0)
+    hour_ago, day_ago = end - timedelta(hours=1), end - timedelta(days=1)
+    text = lambda d: d.strftime('%Y-%m-%d %H:%M:%S')
+    epoch = lambda d: int(d.timestamp())
+    return [
+        ("today's anomalies",
+         ("SELECT COUNT(*) FROM events WHERE status = 'CRITICAL' AND timestamp LIKE ?", (f"{today:%Y-%m-%d}%",)),
+         ("SELECT COUNT(*) FROM events WHERE status = 'CRITICAL' AND ts >= ? AND ts < ?",
+          (epoch(today), epoch(today + timedelta(days=1))))),
+        ("threats, last hour",
+         ("SELECT id, probability FROM events WHERE status = 'CRITICAL' AND timestamp >= ? ORDER BY id",
+          (text(hour_ago),)),
+         ("SELECT id, probability FROM events WHERE status = 'CRITICAL' AND ts >= ? ORDER BY id",
+          (epoch(hour_ago),))),
+        ("export id range, 1 day",
+         ("SELECT min(id), max(id) FROM events WHERE timestamp >= ? AND timestamp <= ?",
+          (text(day_ago), text(end))),
+         (f"SELECT min(id), max(id) FROM events WHERE ts >= {schema.EPOCH.format('?')} "
+          f"AND ts <= {schema.EPOCH.format('?')}", (text(day_ago), text(end)))),
+        ("latest 10 threats",
+         ("SELECT id FROM events WHERE status = 'CRITICAL' ORDER BY id DESC LIMIT 10", ()),
+         ("SELECT id FROM events WHERE status = 'CRITICAL' ORDER BY ts DESC, id DESC LIMIT 10", ())),
+        ("events in 10 min, a week ago",
+         ("SELECT COUNT(*) FROM events WHERE timestamp >= ? AND timestamp < ?",
+          (text(end - timedelta(days=7)), text(end - timedelta(days=7, minutes=-10)))),
+         ("SELECT COUNT(*) FROM events WHERE ts >= ? AND ts < ?",
+          (epoch(end - timedelta(days=7)), epoch(end - timedelta(days=7, minutes=-10))))),
+    ]
+
+
+def legacy_export_csv(conn, start, end):
+    """The old /api/export/csv body: fetchall -> StringIO -> BytesIO"""
+    query, params = "SELECT * FROM events", []
+    if start and end:
+        query += " WHERE timestamp BETWEEN ? AND ?"
+        params = [start, end]
+    events = conn.execute(query + " ORDER BY id DESC", params).fetchall()
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['ID', 'Timestamp', 'Status', 'Probability', 'Syscall Rate', 'Churn Rate', 'AI Analysis'])
+    for event in events:
+        writer.writerow([event['id'], event['timestamp'], event['status'], event['probability'],
+                         event['syscall_rate'], event['churn_rate'], event['ai_analysis'] or ''])
+    output.seek(0)
+    return io.BytesIO(output.getvalue().encode()).getvalue()
@@ -0,0 +1,152 @@
+import json
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import alert_dispatcher
+
+EVENT = {'id': 1, 'status': 'CRITICAL', 'probability': 0.97, 'syscall_rate': 900, 'churn_rate': 40,
+         'timestamp': '2026-10-17 12:00:00'}
+CONFIG = {'email_enabled': True, 'email_recipients': ['analyst@example.com'], 'alert_cooldown_minutes': 5}
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """
+    Local stand-in for the email API. `replies` is the list of HTTP statuses
+    to answer with, in order (the last one repeats); `calls` has the time of
+    every request.
+    """
+    state = {'replies': [200], 'calls': []}
+    lock = threading.Lock()
+
+    class Stub(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            with lock:
+                n = len(state['calls'])
+                state['calls'].append(time.monotonic())
+                status = state['replies'][min(n, len(state['replies']) - 1)]
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'{"id": "stub"}')
+
+        def log_message(self, *a):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('RESEND_API_URL', f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setenv('RESEND_API_KEY', 'stub')
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'alerts.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE alert_history (id INTEGER PRIMARY KEY AUTOINCREMENT, event_id INTEGER, "
+                 "alert_type TEXT, recipient TEXT, sent_at TEXT, status TEXT)")
+    alert_dispatcher.install(conn)
+    conn.commit()
+    yield path, conn
+    conn.close()
+
+
+def history(conn):
+    return [json.loads(status)['email'] for (status,) in
+            conn.execute("SELECT status FROM alert_history ORDER BY id")]
+
+
+def deliver(path, config=CONFIG, expected=1, **options):
+    """Runs a dispatcher on one alert until `expected` jobs are sent or failed"""
+    dispatcher = alert_dispatcher.AlertDispatcher(path, lambda: config, poll_interval=0.02, **options)
+    dispatcher.start()
+    try:
+        results = dispatcher.submit(EVENT, ['email'])
+        deadline = time.monotonic() + 10
+        while dispatcher.sent + dispatcher.failed < expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        dispatcher.close()
+    return dispatcher, results
+
+
+def test_backoff_schedule():
+    assert [alert_dispatcher.backoff(n) for n in range(1, 6)] == [2.0, 4.0, 8.0, 16.0, 32.0]
+    assert alert_dispatcher.backoff(10) == alert_dispatcher.MAX_DELAY
+    assert alert_dispatcher.backoff(1, retry_after=30) == 30
+
+
+def test_server_error_is_retried_then_sent(provider, db):
+    path, conn = db
+    provider['replies'] = [500, 200]
+    dispatcher, results = deliver(path, base_delay=0.2)
+
+    assert results == {'email': 'queued (1)'}
+    assert dispatcher.stats() == {'in_flight': 0, 'sent': 1, 'retried': 1, 'failed': 0}
+    assert len(provider['calls']) == 2
+    assert provider['calls'][1] - provider['calls'][0] >= 0.2
+    assert conn.execute("SELECT status, attempts, last_error FROM alert_queue").fetchall() == \
+        [('sent', 2, 'HTTP 500')]
+    assert history(conn) == ['error: HTTP 500 (retry 1/4 in 0s)', 'sent']
+
+
+def test_retries_back_off_exponentially_then_give_up(provider, db):
+    path, conn = db
+    provider['replies'] = [503]
+    dispatcher, _ = deliver(path, max_attempts=4, base_delay=0.1)
+
+    calls = provider['calls']
+    assert len(calls) == 4
+    gaps = [b - a for a, b in zip(calls, calls[1:])]
+    for n, gap in enumerate(gaps):
+        assert gap >= 0.1 * 2 ** n
+    assert dispatcher.stats() == {'in_flight': 0, 'sent': 0, 'retried': 3, 'failed': 1}
+    assert conn.execute("SELECT status, attempts FROM alert_queue").fetchall() == [('failed', 4)]
+    assert history(conn)[-1] == 'error: HTTP 503 (gave up after 4 attempts)'
+    assert len(history(conn)) == 4
+
+
+def test_client_error_fails_without_retry(provider, db):
+    path, conn = db
+    provider['replies'] = [400, 200]
+    dispatcher, _ = deliver(path, base_delay=0.05)
+
+    assert len(provider['calls']) == 1
+    assert dispatcher.stats()['failed'] == 1
+    assert conn.execute("SELECT status, attempts FROM alert_queue").fetchall() == [('failed', 1)]
+    assert history(conn) == ['error: HTTP 400']
+
+
+def test_dedup_and_cooldown(db):
+    _, conn = db
+    now = 1_800_000_000.0
+    second = {**EVENT, 'id': 2}
+
+    assert alert_dispatcher.enqueue(conn, EVENT, ['email'], CONFIG, now=now) == {'email': 'queued (1)'}
+    # The same event is never queued twice, not even when forced
+    assert alert_dispatcher.enqueue(conn, EVENT, ['email'], CONFIG, force=True, now=now + 1) == \
+        {'email': 'duplicate'}
+    # Another event inside the 5 minute cooldown is suppressed and recorded
+    assert alert_dispatcher.enqueue(conn, second, ['email'], CONFIG, now=now + 60) == \
+        {'email': 'suppressed: cooldown (4.0 min left)'}
+    assert alert_dispatcher.enqueue(conn, second, ['email'], CONFIG, now=now + 120,
+                                    record_suppressed=False)['email'].startswith('suppressed')
+    assert history(conn) == ['suppressed: cooldown (4.0 min left)']
+    # force skips the cooldown; after it, alerts flow again
+    assert alert_dispatcher.enqueue(conn, second, ['email'], CONFIG, force=True, now=now + 180) == \
+        {'email': 'queued (1)'}
+    third = {**EVENT, 'id': 3}
+    assert alert_dispatcher.enqueue(conn, third, ['email'], CONFIG, now=now + 181 + 300) == \
+        {'email': 'queued (1)'}
+    assert alert_dispatcher.enqueue(conn, EVENT, ['slack'], CONFIG, now=now) == {'slack': 'disabled'}
+
+    assert conn.execute("SELECT event_id, status FROM alert_queue ORDER BY id").fetchall() == \
+        [(1, 'pending'), (2, 'pending'), (3, 'pending')]
@@ -0,0 +1,56 @@
+import io
+import sqlite3
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq
+
+import archive
+import event_export
+import schema
+
+ROWS = [('2026-09-01 10:00:00', 'SAFE', 0.1, 100, 2),
+        ('2026-09-01 10:00:05', 'CRITICAL', 0.9, 900, 40),
+        ('2026-09-02 08:30:00', 'SAFE', 0.2, 120, 3)]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'events.db'))
+    schema.migrate(conn)
+    conn.executemany("INSERT INTO events (timestamp, status, probability, syscall_rate, churn_rate, ts) "
+                     f"VALUES (?, ?, ?, ?, ?, {schema.EPOCH.format('?')})",
+                     [(*row, row[0]) for row in ROWS])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def epochs(conn):
+    return [ts for (ts,) in conn.execute("SELECT ts FROM events ORDER BY id")]
+
+
+def test_archived_rows_keep_ts(conn, tmp_path):
+    store = archive.EventArchive(str(tmp_path / 'archive'))
+    assert store(conn, 1, 2) == 2
+
+    assert [row['ts'] for row in store.read(10)] == epochs(conn)[:2][::-1]
+    sink = io.BytesIO()
+    assert event_export.write_parquet(conn, sink, event_archive=store) == 3
+    table = pq.read_table(io.BytesIO(sink.getvalue()))
+    assert table.schema == archive.schema()
+    assert table['ts'].to_pylist() == epochs(conn)
+
+
+def test_parts_written_without_ts_read_as_null(conn, tmp_path):
+    store = archive.EventArchive(str(tmp_path / 'archive'))
+    store(conn, 1, 2)
+    # Rewrite the part the way archives made before ts existed look
+    path, = store.parts()
+    pq.write_table(pq.read_table(path).drop_columns(['ts']), path)
+
+    assert [row['ts'] for row in store.read(10)] == [None, None]
+    sink = io.BytesIO()
+    assert event_export.write_parquet(conn, sink, event_archive=store) == 3
+    assert pq.read_table(io.BytesIO(sink.getvalue()))['ts'].to_pylist() == [None, None, epochs(conn)[2]]
@@ -0,0 +1,23 @@
+import os
+import re
+
+from audit_parser import SYSCALL_TABLE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_audit_rules_and_syscall_table_agree():
+    """Every syscall setup_audit_rules.sh audits is classified under its -k key, and vice versa"""
+    table = {(column, name): key for _, key, calls in SYSCALL_TABLE for name, *nrs in calls
+             for column, nr in zip(('b64', 'b32'), nrs) if nr is not None}
+    audited = {}
+    with open(os.path.join(ROOT, 'setup_audit_rules.sh')) as f:
+        for line in f:
+            m = re.search(r'auditctl -a \S+ -F arch=(b64|b32) -S ([\w,]+) -k (\w+)', line)
+            if m:
+                for name in m.group(2).split(','):
+                    audited[(m.group(1), name)] = m.group(3)
+
+    assert sorted(f"{arch}:{name} (-k {key})" for (arch, name), key in audited.items()
+                  if table.get((arch, name)) != key) == []
+    assert sorted(f"{arch}:{name}" for arch, name in table if (arch, name) not in audited) == []
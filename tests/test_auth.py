@@ -0,0 +1,171 @@
+import hashlib
+import importlib
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import auth
+
+
+def test_scrypt_round_trip():
+    if not auth.SCRYPT:
+        pytest.skip('OpenSSL without scrypt')
+    stored = auth.hash_password('s3cret')
+    assert stored.startswith(f'scrypt${auth.SCRYPT_N}${auth.SCRYPT_R}${auth.SCRYPT_P}$')
+    assert auth.verify_password('s3cret', stored)
+    assert not auth.verify_password('S3cret', stored)
+    assert not auth.needs_upgrade(stored)
+    # Salted: the same password hashes differently every time
+    assert auth.hash_password('s3cret') != stored
+
+
+def test_pbkdf2_round_trip(monkeypatch):
+    monkeypatch.setattr(auth, 'SCRYPT', False)
+    monkeypatch.setattr(auth, 'PBKDF2_ITERATIONS', 1000)
+    stored = auth.hash_password('s3cret')
+    assert stored.startswith('pbkdf2_sha256$1000$')
+    assert auth.verify_password('s3cret', stored)
+    assert not auth.verify_password('wrong', stored)
+    assert not auth.needs_upgrade(stored)
+    monkeypatch.setattr(auth, 'PBKDF2_ITERATIONS', 2000)
+    assert auth.needs_upgrade(stored)
+
+
+def test_legacy_sha256_verifies_and_needs_upgrade():
+    stored = hashlib.sha256(b'sentinel123').hexdigest()
+    assert auth.verify_password('sentinel123', stored)
+    assert not auth.verify_password('sentinel124', stored)
+    assert auth.needs_upgrade(stored)
+
+
+@pytest.mark.parametrize('stored', ['', 'scrypt$x$8$1$AAAA$AAAA', 'pbkdf2_sha256$1000$!!$!!', 'plain'])
+def test_malformed_hashes_do_not_verify(stored):
+    assert auth.verify_password('anything', stored) is False
+
+
+@pytest.fixture
+def blocked(monkeypatch):
+    """verify_password that holds its worker until the event is set"""
+    release = threading.Event()
+    monkeypatch.setattr(auth, 'verify_password', lambda password, stored: release.wait(5))
+    yield release
+    release.set()
+
+
+def test_saturated_pool_raises_busy(blocked):
+    hasher = auth.PasswordHasher(workers=1, max_pending=0, timeout=5)
+    threading.Thread(target=hasher.verify, args=('pw', 'hash'), daemon=True).start()
+    time.sleep(0.05)
+    with pytest.raises(auth.Busy, match='Too many'):
+        hasher.verify('pw', 'hash')
+    blocked.set()
+    assert hasher.stats()['rejected'] == 1
+
+
+def test_queued_check_times_out_as_busy(blocked):
+    hasher = auth.PasswordHasher(workers=1, max_pending=1, timeout=0.1)
+    threading.Thread(target=hasher.verify, args=('pw', 'hash'), daemon=True).start()
+    time.sleep(0.05)
+    with pytest.raises(auth.Busy, match='timed out'):
+        hasher.verify('pw', 'hash')
+    blocked.set()
+    assert hasher.stats()['timed_out'] >= 1
+
+
+def test_unknown_user_costs_a_hash_and_fails():
+    hasher = auth.PasswordHasher(workers=1)
+    assert hasher.verify('anything', None) is False
+    assert hasher.stats()['hashed'] == 1
+
+
+def test_rate_limiter_rejects_then_refills():
+    limiter = auth.RateLimiter(2, 10.0)
+    assert limiter.allow('ip', now=0.0) == (True, 0.0)
+    assert limiter.allow('ip', now=0.0) == (True, 0.0)
+    allowed, retry_after = limiter.allow('ip', now=0.0)
+    assert not allowed and retry_after == pytest.approx(5.0)
+    assert limiter.allow('other', now=0.0)[0]
+    assert not limiter.allow('ip', now=4.0)[0]
+    assert limiter.allow('ip', now=9.5)[0]
+    assert limiter.limited == 2
+
+
+def test_rate_limiter_refund_and_key_eviction():
+    limiter = auth.RateLimiter(1, 60.0, max_keys=2)
+    assert limiter.allow('a', now=0.0)[0]
+    limiter.refund('a')
+    assert limiter.allow('a', now=0.0)[0]
+    assert not limiter.allow('a', now=0.0)[0]
+    limiter.allow('b', now=0.0)
+    limiter.allow('c', now=0.0)
+    # 'a' was least recently used: forgotten, so it starts with a full bucket
+    assert list(limiter.buckets) == ['b', 'c']
+    assert limiter.allow('a', now=0.0)[0]
+
+
+def test_token_cache_evicts_lru_and_expires():
+    cache = auth.TokenCache(maxsize=2)
+    later = time.time() + 60
+    cache.put('a', {'exp': later, 'user': 'a'})
+    cache.put('b', {'exp': later, 'user': 'b'})
+    assert cache.get('a')['user'] == 'a'
+    cache.put('c', {'exp': later, 'user': 'c'})
+    assert cache.get('b') is None
+    assert cache.get('a')['user'] == 'a'
+
+    cache.put('old', {'exp': time.time() - 1})
+    assert cache.get('old') is None
+    assert 'old' not in cache.data
+    assert cache.stats() == {'size': 1, 'hits': 2, 'misses': 2}
+
+
+@pytest.fixture(scope='module')
+def backend(tmp_path_factory):
+    """dashboard_backend with its events.db and config in a scratch directory"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(tmp_path_factory.mktemp('backend'))
+        mp.setenv('SECRET_KEY', 'test')
+        module = importlib.import_module('dashboard_backend')
+        yield module
+        module.dispatcher.close()
+
+
+@pytest.fixture
+def client(backend, monkeypatch):
+    monkeypatch.setattr(backend, 'login_ip_limiter', auth.RateLimiter(*auth.LOGIN_IP_LIMIT))
+    monkeypatch.setattr(backend, 'login_user_limiter', auth.RateLimiter(*auth.LOGIN_USER_LIMIT))
+    return backend.app.test_client()
+
+
+def login(client, username, password):
+    return client.post('/api/auth/login', json={'username': username, 'password': password})
+
+
+def test_login_rehashes_a_legacy_password(backend, client):
+    conn = sqlite3.connect(backend.DB_FILE)
+    conn.execute("INSERT INTO users (username, password_hash, email, role) VALUES (?, ?, ?, ?)",
+                 ('legacy', hashlib.sha256(b'old-pass').hexdigest(), 'legacy@example.com', 'analyst'))
+    conn.commit()
+
+    assert login(client, 'legacy', 'old-pass').status_code == 200
+    stored = conn.execute("SELECT password_hash FROM users WHERE username = 'legacy'").fetchone()[0]
+    assert not auth.needs_upgrade(stored)
+    assert auth.verify_password('old-pass', stored)
+    assert login(client, 'legacy', 'old-pass').status_code == 200
+    assert login(client, 'legacy', 'wrong').status_code == 401
+    conn.close()
+
+
+def test_user_limit_does_not_use_up_the_ip_bucket(backend, client):
+    burst = auth.LOGIN_USER_LIMIT[0]
+    for _ in range(burst):
+        assert login(client, 'admin', 'wrong').status_code == 401
+    for _ in range(3):
+        response = login(client, 'admin', 'wrong')
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+    # Only the attempts that were checked count against the client's IP
+    tokens, _ = backend.login_ip_limiter.buckets['127.0.0.1']
+    assert tokens == pytest.approx(auth.LOGIN_IP_LIMIT[0] - burst, abs=0.5)
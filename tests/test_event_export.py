@@ -0,0 +1,33 @@
+import sqlite3
+import zlib
+from datetime import datetime, timedelta
+
+import pytest
+
+import event_export
+import schema
+from tests import helpers
+
+END = datetime.utcnow().replace(microsecond=0)
+FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+@pytest.fixture(scope='module')
+def conn(tmp_path_factory):
+    conn = sqlite3.connect(str(tmp_path_factory.mktemp('export') / 'events.db'))
+    helpers.seed_events(conn, 2 * 86400, END)
+    conn.execute("UPDATE events SET ai_analysis = 'Suspicious, \"quoted\"\nsecond line' WHERE id % 97 = 0")
+    conn.commit()
+    schema.migrate(conn)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('span', [timedelta(hours=1), timedelta(days=1), None])
+def test_streamed_csv_matches_the_buffered_export(conn, span):
+    start = (END - span).strftime(FORMAT) if span else None
+    end = END.strftime(FORMAT) if span else None
+    # Small pages so the range spans many of them
+    streamed = b''.join(event_export.iter_csv_gzip(conn, start, end, page_size=1000))
+    assert zlib.decompress(streamed, 16 + zlib.MAX_WBITS) == helpers.legacy_export_csv(conn, start, end)
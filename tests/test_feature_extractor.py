@@ -0,0 +1,118 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_extractor import (AuditFeatureExtractor, RollingFeatures, FEATURE_NAMES, ALL_FEATURE_NAMES,
+                               ROLLING_SPANS)
+from tests import helpers
+
+START = 1700000000
+LS_HEX = '/usr/bin/ls'.encode().hex().upper()
+
+
+def record(serial, nr, exe='"/usr/bin/python3.11"', saddr=None):
+    stamp = f"{START}.{serial:03d}:{serial}"
+    lines = [f'type=SYSCALL msg=audit({stamp}): arch=c000003e syscall={nr} success=yes exit=0 a0=3 a1=0 '
+             f'a2=0 a3=0 items=0 ppid=2000 pid=4242 auid=1000 uid=1000 gid=1000 euid=1000 suid=1000 '
+             f'fsuid=1000 egid=1000 sgid=1000 fsgid=1000 tty=pts0 ses=2 comm="x" exe={exe} key=(null)\n']
+    if saddr:
+        lines.append(f'type=SOCKADDR msg=audit({stamp}): saddr={saddr}\n')
+    lines.append(f'type=EOE msg=audit({stamp}): \n')
+    return lines
+
+
+def test_live_and_offline_decode_exe_and_saddr_alike(tmp_path):
+    address = '01BB0000000020010DB8000000000000000000000001'
+    lines = (record(1, 59, '"/usr/bin/ls"') + record(2, 59, LS_HEX) +  # the same binary, quoted and hex
+             record(3, 59, '"/bin/sh"') + record(4, 59, '(null)') +
+             record(5, 42, saddr='0A00' + address) + record(6, 42, saddr='0a00' + address) +
+             record(7, 42, saddr='0200' + '0050C6336401' + '0' * 16))
+    log = tmp_path / 'audit.log'
+    log.write_text(''.join(lines))
+
+    extractor = AuditFeatureExtractor()
+    live = extractor.process_window(lines)
+    offline = extractor.parse_file(str(log), rolling=False).loc[START]
+
+    # ls twice, sh once
+    assert live['exec_entropy'] == pytest.approx(0.9182958340544896)
+    assert live['unique_remote_addrs'] == 2
+    for name in ALL_FEATURE_NAMES:
+        assert offline[name] == pytest.approx(live[name]), name
+
+
+def test_rate_of_change_starts_at_zero():
+    rolling = RollingFeatures(names=['a', 'b'], spans=(5,))
+    assert rolling.update(START, [10.0, 4.0])[-2:].tolist() == [0.0, 0.0]
+    assert rolling.update(START + 1, [13.0, 2.0])[-2:].tolist() == [3.0, -2.0]
+    # A gap counts as all-zero windows
+    assert rolling.update(START + 5, [7.0, 1.0])[-2:].tolist() == [7.0, 1.0]
+
+
+@pytest.fixture(scope='module')
+def behaviour_log():
+    """Per-second windows cycling through benign load and the simulated attacks"""
+    return [lines for _, lines in helpers.synthesize_behaviour_log(20, start=START)]
+
+
+def write_log(path, windows):
+    path.write_text(''.join(line for lines in windows for line in lines))
+    return str(path)
+
+
+def assert_rows_match(live, offline, columns, tol):
+    assert sorted(live) == offline.index.tolist()
+    for start, row in offline.iterrows():
+        for name in columns:
+            assert math.isclose(live[start][name], row[name], rel_tol=tol, abs_tol=tol), (start, name)
+
+
+def test_single_pass_matches_the_regex_extractor():
+    legacy, extractor = helpers.LegacyRegexExtractor(), AuditFeatureExtractor()
+    for lines in helpers.split_windows(helpers.synthesize_audit_log(5000), 1000):
+        features = extractor.process_window(lines)
+        assert {name: features[name] for name in FEATURE_NAMES} == legacy.process_window(lines)
+
+
+def test_process_window_matches_parse_file(behaviour_log, tmp_path):
+    extractor = AuditFeatureExtractor()
+    offline = extractor.parse_file(write_log(tmp_path / 'audit.log', behaviour_log), rolling=False)
+    live = {START + i: extractor.process_window(lines) for i, lines in enumerate(behaviour_log)}
+    assert_rows_match(live, offline, ALL_FEATURE_NAMES, 1e-12)
+
+
+def test_add_rolling_matches_parse_file(behaviour_log, tmp_path):
+    windows = list(behaviour_log)
+    windows[5:12] = [[]] * 7  # seconds without records
+    offline = AuditFeatureExtractor().parse_file(write_log(tmp_path / 'audit.log', windows))
+    extractor = AuditFeatureExtractor()
+    live = {START + i: extractor.add_rolling(extractor.process_window(lines), START + i)
+            for i, lines in enumerate(windows) if lines}
+    assert_rows_match(live, offline, offline.columns, 1e-9)
+
+
+def test_rolling_matches_pandas():
+    """Ring buffers vs pandas rolling/ewm/diff over the zero-filled per-second series"""
+    n = 3000
+    rng = np.random.default_rng(5)
+    starts = np.cumsum(rng.choice([1, 1, 1, 1, 1, 1, 1, 1, 1, 2], size=n))
+    starts[n // 3:] += 400
+    starts[n // 2:] += 37
+    values = rng.gamma(2.0, 50.0, size=(n, len(ALL_FEATURE_NAMES)))
+    frame = pd.DataFrame(values, index=pd.Index(START + starts, name='window'), columns=ALL_FEATURE_NAMES)
+
+    rolled = RollingFeatures().frame(frame)
+    full = frame.reindex(range(frame.index[0], frame.index[-1] + 1), fill_value=0.0)
+    for span in ROLLING_SPANS:
+        window = full.rolling(span, min_periods=1)
+        reference = {'mean': window.mean(), 'std': window.std(ddof=0),
+                     'ewma': full.ewm(alpha=1 - math.exp(-1 / span), adjust=False).mean()}
+        for stat, expected in reference.items():
+            ours = rolled[[f'{name}_{stat}_{span}s' for name in ALL_FEATURE_NAMES]].to_numpy()
+            np.testing.assert_allclose(ours, expected.loc[frame.index].to_numpy(), rtol=1e-9, atol=1e-6,
+                                       err_msg=f'{stat} {span}s')
+    roc = full.diff().fillna(0.0).loc[frame.index].to_numpy()
+    np.testing.assert_allclose(rolled[[f'{name}_roc' for name in ALL_FEATURE_NAMES]].to_numpy(), roc,
+                               atol=1e-9)
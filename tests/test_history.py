@@ -0,0 +1,55 @@
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+
+import event_counters
+import history
+import rollups
+import schema
+from tests import helpers
+
+END = datetime.now().replace(microsecond=0)
+
+
+@pytest.fixture(scope='module')
+def conn(tmp_path_factory):
+    conn = sqlite3.connect(str(tmp_path_factory.mktemp('history') / 'events.db'))
+    helpers.seed_events(conn, 2 * 86400, END)
+    # seed_events writes UTC text; the detector writes local time
+    conn.execute("UPDATE events SET timestamp = datetime(timestamp, 'localtime')")
+    conn.commit()
+    schema.migrate(conn)
+    event_counters.install(conn)
+    rollups.install(conn)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('span', [timedelta(minutes=10), timedelta(hours=1), timedelta(days=1)])
+def test_series_points_summarize_their_raw_rows(conn, span):
+    start = END - span
+    rows = [dict(row) for row in conn.execute("SELECT * FROM events WHERE ts >= ? AND ts < ? ORDER BY id",
+                                              (int(start.timestamp()), int(END.timestamp())))]
+    data = history.series(conn, start, END, 300)
+    assert 0 < len(data['points']) <= 300
+
+    bucket, lo = data['bucket_seconds'], data['points'][0]['ts']
+    expected = defaultdict(list)
+    for row in rows:
+        expected[lo + (row['ts'] - lo) // bucket * bucket].append(row)
+    # Edge buckets are partial in the raw selection
+    for point in data['points'][1:-1]:
+        covered = expected[point['ts']]
+        assert point['count'] == len(covered)
+        assert point['probability_max'] == max(row['probability'] for row in covered)
+        assert point['syscall_rate_min'] == min(row['syscall_rate'] for row in covered)
+        assert point['churn_rate'] == pytest.approx(sum(row['churn_rate'] for row in covered) / len(covered))
+
+
+def test_recent_since_id_returns_only_new_rows(conn):
+    last_id = conn.execute("SELECT max(id) FROM events").fetchone()[0]
+    assert [row['id'] for row in history.recent(conn, 100)] == list(range(last_id - 99, last_id + 1))
+    assert [row['id'] for row in history.recent(conn, 100, since_id=last_id - 1)] == [last_id]
@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import model_store
+from train_ensemble import EnsembleDetector
+from tests import helpers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def data():
+    df = pd.read_csv(os.path.join(ROOT, 'labeled_data.csv'))
+    return df.drop(columns=['label']), df['label']
+
+
+@pytest.fixture(scope='module')
+def detector(data):
+    """A small ensemble fitted the way train_ensemble.py does"""
+    import xgboost as xgb
+    from sklearn.ensemble import RandomForestClassifier, IsolationForest, VotingClassifier
+
+    X, y = data
+    detector = EnsembleDetector()
+    detector.feature_names = X.columns.tolist()
+    detector.xgb_model = xgb.XGBClassifier(eval_metric='logloss', n_estimators=20, max_depth=4,
+                                           learning_rate=0.1, random_state=42).fit(X, y)
+    detector.rf_model = RandomForestClassifier(n_estimators=20, max_depth=8, min_samples_split=5,
+                                               random_state=42).fit(X, y)
+    detector.iso_model = IsolationForest(n_estimators=20, contamination=0.1, random_state=42).fit(X)
+    detector.ensemble = VotingClassifier(estimators=[('xgb', detector.xgb_model), ('rf', detector.rf_model)],
+                                         voting='soft', weights=[1.5, 1.0]).fit(X, y)
+    return detector
+
+
+def inputs(data, detector):
+    """The dataset plus rows sitting exactly on split thresholds, where <= vs < matters"""
+    X = data[0].to_numpy(dtype=np.float32)
+    edges = []
+    trees = model_store.XGBoostArrays.from_model(detector.xgb_model).trees
+    for feature, threshold in zip(trees.feature, trees.threshold):
+        if feature >= 0:
+            for t in (threshold, np.nextafter(np.float32(threshold), np.float32(-np.inf))):
+                row = X[len(edges) % len(X)].copy()
+                row[feature] = t
+                edges.append(row)
+    return np.vstack([X, np.array(edges, dtype=np.float32)])
+
+
+def test_compiled_scores_match_the_estimators(data, detector):
+    X = inputs(data, detector)
+    compiled = model_store.CompiledEnsemble.from_models(detector.xgb_model, detector.rf_model,
+                                                        detector.iso_model)
+    xgb_proba, rf_proba, iso_score = compiled.scores(X)
+
+    np.testing.assert_array_equal(xgb_proba, detector.xgb_model.predict_proba(X))
+    np.testing.assert_array_equal(rf_proba, detector.rf_model.predict_proba(X))
+    np.testing.assert_array_equal(iso_score, detector.iso_model.score_samples(X))
+
+
+def test_predict_batch_matches_reference(data, detector):
+    X = inputs(data, detector)
+    detector._compiled = None
+    expected = detector.predict_batch_reference(X)
+    compiled = detector.predict_batch(X)
+    assert expected.keys() == compiled.keys()
+    for key in expected:
+        np.testing.assert_array_equal(compiled[key], expected[key], err_msg=key)
+
+
+def test_native_export_round_trip(data, detector, tmp_path):
+    X = inputs(data, detector)
+    model_store.export_xgboost(detector.xgb_model, str(tmp_path / model_store.XGB_FILE))
+    model_store.export_forest(detector.rf_model, str(tmp_path / model_store.RF_DIR), detector.feature_names)
+    model_store.export_forest(detector.iso_model, str(tmp_path / model_store.ISO_DIR), detector.feature_names)
+    model_store.export_ensemble(detector.ensemble, detector.feature_names,
+                                str(tmp_path / model_store.ENSEMBLE_FILE))
+
+    native = EnsembleDetector()
+    assert native.load(str(tmp_path))
+    expected = detector.predict_batch_reference(X)
+    loaded = native.predict_batch(X)
+    for key in expected:
+        np.testing.assert_array_equal(loaded[key], expected[key], err_msg=key)
+
+
+def test_predict_batch_matches_the_dataframe_path(data, detector):
+    """The float32 batch path gives what one-row DataFrames through each estimator gave"""
+    rows = data[0].head(100)
+    batch = detector.predict_batch(rows[detector.feature_names].to_numpy(dtype=np.float32))
+    for i, row in enumerate(rows.to_dict('records')):
+        expected = helpers.legacy_ensemble_predict(detector, row)
+        assert batch['combined_prob'][i] == expected['combined_prob'], i
+        assert batch['final_pred'][i] == expected['final_pred'], i
+
+
+def test_shipped_detector_model_matches_its_pickle(data):
+    """The detector's native JSON model scores like the pickled XGBClassifier it was exported from"""
+    import pickle
+    with open(os.path.join(ROOT, 'xgboost_model.pkl'), 'rb') as f:
+        model = pickle.load(f)
+    native = model_store.XGBoostArrays.from_json(os.path.join(ROOT, 'xgboost_model.json'))
+    X = data[0][list(native.feature_names_in_)].to_numpy(dtype=np.float32)
+    np.testing.assert_array_equal(native.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(native.predict(X), model.predict(X))
@@ -0,0 +1,85 @@
+import math
+
+import numpy as np
+
+import process_tree
+from feature_extractor import AuditFeatureExtractor, FEATURE_NAMES
+
+START = 1700000000
+
+# pid -> (ppid, comm, exe): systemd -> sshd -> bash -> python 5678 -> 5679, 5680
+TREE = {
+    '1': ('0', 'systemd', '/usr/lib/systemd/systemd'),
+    '400': ('1', 'sshd', '/usr/sbin/sshd'),
+    '2000': ('400', 'bash', '/usr/bin/bash'),
+    '5678': ('2000', 'python3', '/usr/bin/python3.11'),
+    '5679': ('5678', 'python3', '/usr/bin/python3.11'),
+    '5680': ('5678', 'python3', '/usr/bin/python3.11'),
+}
+
+
+def synthesize(attack=True, t=START):
+    """One second: bash reads 300 files itself; with attack, python 5678 and two children delete files"""
+    lines = []
+
+    def record(pid, nr, path):
+        ppid, comm, exe = TREE[pid]
+        stamp = f"{t}.{len(lines) % 1000:03d}:{len(lines) + 1}"
+        lines.append(f'type=SYSCALL msg=audit({stamp}): arch=c000003e syscall={nr} success=yes exit=0 '
+                     f'a0=3 a1=0 a2=0 a3=0 items=1 ppid={ppid} pid={pid} auid=1000 uid=1000 gid=1000 '
+                     f'euid=1000 suid=1000 fsuid=1000 egid=1000 sgid=1000 fsgid=1000 tty=pts0 ses=2 '
+                     f'comm="{comm}" exe="{exe}" subj=unconfined key=(null)\n')
+        lines.append(f'type=PATH msg=audit({stamp}): item=0 name="{path}" inode=1 dev=08:01 mode=0100644\n')
+        lines.append(f'type=EOE msg=audit({stamp}): \n')
+
+    for i in range(300):
+        record('2000', '257', f'/home/user/notes_{i}.txt')
+    if attack:
+        for pid, n in (('5678', 20), ('5679', 30), ('5680', 30)):
+            for i in range(n):
+                victim = f'/home/user/docs/{pid}_{i}.txt'
+                record(pid, '257', victim)
+                record(pid, '87', victim)
+    return lines
+
+
+class ChurnModel:
+    """Logistic in file churn and syscall rate: an ancestor's aggregate scores above its child's"""
+
+    def __init__(self, bias):
+        self.bias = bias
+        self.churn = FEATURE_NAMES.index('file_churn_rate')
+        self.rate = FEATURE_NAMES.index('syscall_rate')
+
+    def predict_proba(self, x):
+        z = x[:, self.churn] / 10 + x[:, self.rate] / 100 - self.bias
+        p = 1 / (1 + np.exp(-z))
+        return np.column_stack([1 - p, p])
+
+
+def culprit(model, lines):
+    tracker = process_tree.ProcessTracker(model, FEATURE_NAMES, snapshot_file=None)
+    events = AuditFeatureExtractor().parser.parse(lines)
+    tracker.observe(events, START)
+    return tracker.close_window(START)
+
+
+def test_child_absorbed_by_flagged_ancestor_is_blamed():
+    # bash's subtree scores ~0.93, python 5678's ~0.40, bash without 5678 ~0.001
+    model = ChurnModel(bias=10)
+    found = culprit(model, synthesize())
+    assert found is not None
+    assert found['pid'] == '5678'
+    assert found['processes'] == 3
+    assert math.isclose(found['probability'], 1 / (1 + math.exp(0.4)), rel_tol=1e-5)
+
+
+def test_deepest_flagged_subtree_is_blamed():
+    # bash and 5678 both score above 0.5; 5678 without either child still does
+    found = culprit(ChurnModel(bias=5), synthesize())
+    assert found['pid'] == '5678'
+    assert found['probability'] > 0.5
+
+
+def test_benign_window_has_no_culprit():
+    assert culprit(ChurnModel(bias=10), synthesize(attack=False)) is None
@@ -0,0 +1,37 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import event_counters
+import rollups
+import schema
+from tests import helpers
+
+# Seeded timestamps are UTC ('unixepoch'); query in the same clock
+END = datetime.utcnow().replace(microsecond=0)
+
+
+@pytest.fixture(scope='module')
+def conn(tmp_path_factory):
+    conn = sqlite3.connect(str(tmp_path_factory.mktemp('rollups') / 'events.db'))
+    helpers.seed_events(conn, 2 * 86400, END)
+    event_counters.install(conn)
+    rollups.install(conn)
+    schema.migrate(conn)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('days', [1, 7])
+def test_analytics_match_raw_scans(conn, days):
+    since = (END - timedelta(days=days)).replace(hour=0, minute=0, second=0)
+    legacy = {key: [dict(row) for row in conn.execute(sql, (since.strftime('%Y-%m-%d'),))]
+              for key, sql in helpers.LEGACY_ANALYTICS.items()}
+    data = rollups.analytics(conn, since)
+
+    assert [(d['date'], d['total_events'], d['threats']) for d in data['daily_stats']] == \
+        [(d['date'], d['total_events'], d['threats']) for d in legacy['daily_stats']]
+    assert data['hourly_distribution'] == legacy['hourly_distribution']
+    assert data['summary']['total_threats'] == legacy['summary'][0]['total_threats']
@@ -0,0 +1,42 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import schema
+from tests import helpers
+
+END = datetime.now().replace(microsecond=0)
+
+
+@pytest.fixture(scope='module')
+def legacy(tmp_path_factory):
+    """A version 0 events.db (TEXT local-time timestamps only) and its query results"""
+    conn = sqlite3.connect(str(tmp_path_factory.mktemp('schema') / 'events.db'))
+    # Eight days, so every query (the oldest reaches back a week) has rows
+    helpers.seed_events(conn, 8 * 86400, END)
+    # seed_events writes UTC text; rewrite it as local time like the detector
+    conn.execute("UPDATE events SET timestamp = datetime(timestamp, 'localtime')")
+    conn.commit()
+    assert schema.version(conn) == 0
+    queries = helpers.schema_queries(END)
+    before = [conn.execute(*old).fetchall() for _, old, _ in queries]
+    schema.migrate(conn)
+    yield conn, queries, before
+    conn.close()
+
+
+def test_migration_backfills_ts(legacy):
+    conn, _, _ = legacy
+    assert schema.version(conn) == len(schema.MIGRATIONS)
+    assert conn.execute("SELECT COUNT(*) FROM events WHERE ts IS NULL").fetchone()[0] == 0
+    assert conn.execute(f"SELECT COUNT(*) FROM events WHERE ts != {schema.EPOCH.format('timestamp')}") \
+        .fetchone()[0] == 0
+
+
+@pytest.mark.parametrize('i', range(5))
+def test_epoch_queries_match_the_text_ones(legacy, i):
+    conn, queries, before = legacy
+    name, _, new = queries[i]
+    rows = conn.execute(*new).fetchall()
+    assert rows == before[i], name
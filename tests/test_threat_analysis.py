@@ -0,0 +1,147 @@
+import json
+import sqlite3
+import threading
+
+import pytest
+
+import threat_analysis
+
+EVENT = {'id': 1, 'status': 'CRITICAL', 'probability': 0.97, 'syscall_rate': 900, 'churn_rate': 40,
+         'timestamp': '2026-10-17 12:00:00'}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'events.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, ai_analysis TEXT)")
+    conn.executemany("INSERT INTO events (id) VALUES (?)", [(i,) for i in range(1, 10)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def stored(db, event_id):
+    conn = sqlite3.connect(db)
+    try:
+        value = conn.execute("SELECT ai_analysis FROM events WHERE id = ?", (event_id,)).fetchone()[0]
+    finally:
+        conn.close()
+    return json.loads(value) if value else None
+
+
+def test_concurrent_requests_share_one_call(db):
+    client = threat_analysis.FakeLlmClient(delay=0.3)
+    service = threat_analysis.AnalysisService(db, client=client)
+    n = 8
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def request(i):
+        barrier.wait()
+        results[i] = service.analyze(EVENT)
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert client.calls == 1
+    assert sorted(source for _, source in results) == ['model'] + ['shared'] * (n - 1)
+    assert all(analysis == results[0][0] for analysis, _ in results)
+    assert results[0][0]['classification'] == 'ransomware'
+    assert service.stats()['shared_hits'] == n - 1
+    assert service.stats()['in_flight'] == 0
+
+
+def test_verdict_is_persisted_to_the_event(db):
+    client = threat_analysis.FakeLlmClient(delay=0)
+    analysis, source = threat_analysis.AnalysisService(db, client=client).analyze(EVENT)
+    assert source == 'model'
+    assert stored(db, 1) == analysis
+
+    # A new process (empty cache) reads it back without calling the model
+    again = threat_analysis.AnalysisService(db, client=client)
+    assert again.analyze(EVENT) == (analysis, 'stored')
+    assert client.calls == 1
+
+
+def test_cache_hit_until_ttl_expires(db):
+    client = threat_analysis.FakeLlmClient(delay=0)
+    clock = Clock()
+    service = threat_analysis.AnalysisService(db, client=client, ttl=60, clock=clock)
+
+    assert service.analyze(EVENT)[1] == 'model'
+    # A different event with the same signature is served from the cache
+    assert service.analyze({**EVENT, 'id': 2, 'syscall_rate': 1000})[1] == 'cache'
+    assert stored(db, 2) is not None
+    clock.now += 59
+    assert service.analyze({**EVENT, 'id': 3})[1] == 'cache'
+    assert client.calls == 1
+
+    clock.now += 2
+    assert service.analyze({**EVENT, 'id': 4})[1] == 'model'
+    assert client.calls == 2
+
+
+def test_least_recently_used_signature_is_evicted(db):
+    client = threat_analysis.FakeLlmClient(delay=0)
+    service = threat_analysis.AnalysisService(db, client=client, maxsize=2)
+    a = {**EVENT, 'id': None}
+    b = {**a, 'churn_rate': 4000}
+    c = {**a, 'status': 'SAFE', 'probability': 0.1}
+
+    for event in (a, b):
+        assert service.analyze(event)[1] == 'model'
+    assert service.analyze(a)[1] == 'cache'      # a is now the most recent
+    assert service.analyze(c)[1] == 'model'      # evicts b
+    assert len(service.cache) == 2
+    assert service.analyze(a)[1] == 'cache'
+    assert service.analyze(b)[1] == 'model'
+    assert client.calls == 4
+
+
+class FixedClient:
+    """Answers every prompt with the same (possibly malformed) response"""
+
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    async def complete(self, prompt):
+        self.calls += 1
+        return self.response
+
+
+@pytest.mark.parametrize('response, explanation', [
+    (None, 'None'),
+    ({'classification': 'x'}, "{'classification': 'x'}"),
+    ('[1, 2]', '[1, 2]'),
+    ('not json', 'not json'),
+])
+def test_malformed_responses_get_the_fallback_verdict(response, explanation):
+    analysis = threat_analysis.parse_response(response)
+    assert analysis['classification'] == 'Unknown'
+    assert analysis['explanation'] == explanation
+
+
+def test_fenced_json_is_parsed():
+    assert threat_analysis.parse_response('```json\n{"severity": "High"}\n```') == {'severity': 'High'}
+
+
+def test_non_text_response_does_not_fail_coalesced_requests(db):
+    client = FixedClient(None)
+    service = threat_analysis.AnalysisService(db, client=client)
+    analysis, source = service.analyze(EVENT)
+    assert source == 'model'
+    assert analysis['classification'] == 'Unknown'
+    assert service.stats()['in_flight'] == 0
@@ -0,0 +1,281 @@
+"""
+Cached LLM threat analysis.
+
+Verdicts are cached by a quantized signature of the event (status,
+probability bucket, log2 buckets of syscall and churn rate), so repeated
+views of an event and events that look alike cost no model call. The cache
+is LRU with a TTL. Concurrent requests for the same signature share one
+in-flight call. Every verdict is written back to events.ai_analysis, where
+the dashboard (and the next request for that event) picks it up.
+
+Model calls run on one long-lived asyncio loop in a background thread,
+instead of a new loop per request. SENTINEL_LLM=fake swaps in FakeLlmClient,
+which needs no key or network, for local runs.
+"""
+import os
+import json
+import math
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+
+PROBABILITY_BUCKET = 0.05
+CACHE_SIZE = 1024
+CACHE_TTL = 6 * 3600.0
+
+SYSTEM_MESSAGE = """You are a cybersecurity threat analyst AI. Analyze system events and provide:
+1. Threat Classification (ransomware, fork bomb, crypto miner, privilege escalation, reverse shell, or other)
+2. Severity Assessment (Critical, High, Medium, Low)
+3. Brief explanation of why this pattern is suspicious
+4. Recommended actions
+Keep responses concise and actionable. Format as JSON."""
+
+
+class NotConfigured(Exception):
+    pass
+
+
+def _log_bucket(value):
+    value = max(float(value or 0), 0.0)
+    return 0 if value < 1 else 1 + int(math.log2(value))
+
+
+def signature(event):
+    """Events with the same signature get the same verdict"""
+    probability = float(event.get('probability') or 0)
+    return (
+        event.get('status') or 'Unknown',
+        min(int(probability / PROBABILITY_BUCKET), int(1 / PROBABILITY_BUCKET) - 1),
+        _log_bucket(event.get('syscall_rate')),
+        _log_bucket(event.get('churn_rate')),
+    )
+
+
+def build_prompt(event):
+    return f"""Analyze this system event for potential security threats:
+- Status: {event.get('status', 'Unknown')}
+- Threat Probability: {event.get('probability', 0):.2%}
+- Syscall Rate: {event.get('syscall_rate', 0)}/sec
+- File Churn Rate: {event.get('churn_rate', 0)}/sec
+- Timestamp: {event.get('timestamp', 'Unknown')}
+
+Provide a threat analysis in JSON format with keys: classification, severity, explanation, recommendations"""
+
+
+def parse_response(response):
+    """
+    Model text -> analysis dict (tolerates ```json fences and plain text).
+    Anything else a client returns (None, a dict, ...) gets the fallback
+    verdict too, so a misbehaving client never fails the waiting requests.
+    """
+    if not isinstance(response, str):
+        response = str(response)
+    try:
+        clean_response = response.strip()
+        if clean_response.startswith('```'):
+            clean_response = clean_response.split('```')[1]
+            if clean_response.startswith('json'):
+                clean_response = clean_response[4:]
+        analysis = json.loads(clean_response)
+        if isinstance(analysis, dict):
+            return analysis
+    except (ValueError, IndexError):
+        pass
+    return {
+        "classification": "Unknown",
+        "severity": "Medium",
+        "explanation": response,
+        "recommendations": ["Review system logs", "Monitor for recurring patterns"]
+    }
+
+
+# ---------- clients ----------
+class EmergentLlmClient:
+    """Gemini through emergentintegrations; a fresh chat per call (no shared history)"""
+
+    def __init__(self, api_key, provider="gemini", model="gemini-3-flash-preview"):
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        self.LlmChat = LlmChat
+        self.UserMessage = UserMessage
+        self.api_key = api_key
+        self.provider = provider
+        self.model = model
+
+    async def complete(self, prompt):
+        chat = self.LlmChat(
+            api_key=self.api_key,
+            session_id=f"threat-analysis-{time.time_ns()}",
+            system_message=SYSTEM_MESSAGE,
+        ).with_model(self.provider, self.model)
+        return await chat.send_message(self.UserMessage(text=prompt))
+
+
+class FakeLlmClient:
+    """Deterministic stand-in: answers from the prompt, counts calls"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def complete(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        critical = "Status: CRITICAL" in prompt
+        return "```json\n" + json.dumps({
+            "classification": "ransomware" if critical else "other",
+            "severity": "High" if critical else "Low",
+            "explanation": "Fake analysis for local testing.",
+            "recommendations": ["Review system logs"],
+        }) + "\n```"
+
+
+def default_client():
+    if os.environ.get('SENTINEL_LLM') == 'fake':
+        return FakeLlmClient()
+    api_key = os.environ.get('EMERGENT_LLM_KEY')
+    if not api_key:
+        raise NotConfigured('AI service not configured')
+    return EmergentLlmClient(api_key)
+
+
+# ---------- cache ----------
+class TTLCache:
+    """LRU mapping whose entries also expire ttl seconds (of clock()) after insertion"""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < self.clock():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = (self.clock() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def __len__(self):
+        return len(self.data)
+
+
+# ---------- service ----------
+class AnalysisService:
+    """
+    analyze(event) -> (analysis, source), source one of 'stored' (events
+    row), 'cache', 'shared' (joined an in-flight call) or 'model'.
+
+    client - object with `async complete(prompt) -> str`; created lazily
+             with default_client() when None
+    clock  - time source of the cache TTL
+    """
+
+    def __init__(self, db_file, client=None, maxsize=CACHE_SIZE, ttl=CACHE_TTL, timeout=60.0,
+                 clock=time.monotonic):
+        self.db_file = db_file
+        self.client = client
+        self.cache = TTLCache(maxsize, ttl, clock)
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.loop = None
+
+        # Counters
+        self.model_calls = 0
+        self.hits = {'stored': 0, 'cache': 0, 'shared': 0}
+
+    def _ensure_loop(self):
+        with self.lock:
+            if self.loop is None:
+                if self.client is None:
+                    self.client = default_client()
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name="llm-loop", daemon=True).start()
+            return self.loop
+
+    def _stored(self, event_id):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            row = conn.execute("SELECT ai_analysis FROM events WHERE id = ?", (event_id,)).fetchone()
+        except sqlite3.Error:
+            return None
+        finally:
+            conn.close()
+        if row and row[0]:
+            try:
+                return json.loads(row[0])
+            except ValueError:
+                return None
+        return None
+
+    def _store(self, event_id, analysis):
+        conn = sqlite3.connect(self.db_file, timeout=10)
+        try:
+            conn.execute("UPDATE events SET ai_analysis = ? WHERE id = ?", (json.dumps(analysis), event_id))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"DB Error (ai_analysis): {e}")
+        finally:
+            conn.close()
+
+    def analyze(self, event):
+        event_id = event.get('id')
+        if event_id is not None:
+            analysis = self._stored(event_id)
+            if analysis is not None:
+                with self.lock:
+                    self.hits['stored'] += 1
+                return analysis, 'stored'
+
+        key = signature(event)
+        analysis = self.cache.get(key)
+        source = 'cache'
+        if analysis is None:
+            loop = self._ensure_loop()
+            with self.lock:
+                future = self.in_flight.get(key)
+                source = 'shared' if future is not None else 'model'
+                if future is None:
+                    future = asyncio.run_coroutine_threadsafe(self._call(key, event), loop)
+                    self.in_flight[key] = future
+            analysis = future.result(timeout=self.timeout)
+        if source != 'model':
+            with self.lock:
+                self.hits[source] += 1
+
+        if event_id is not None:
+            self._store(event_id, analysis)
+        return analysis, source
+
+    async def _call(self, key, event):
+        try:
+            self.model_calls += 1
+            analysis = parse_response(await self.client.complete(build_prompt(event)))
+            self.cache.put(key, analysis)
+            return analysis
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def stats(self):
+        return {
+            'model_calls': self.model_calls,
+            'cache_size': len(self.cache),
+            'in_flight': len(self.in_flight),
+            **{f'{k}_hits': v for k, v in self.hits.items()},
+        }
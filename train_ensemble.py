@@ -5,15 +5,12 @@ Combines multiple ML models for improved threat detection accuracy:
 - Random Forest
 - Isolation Forest (Anomaly Detection)
 """
-import pandas as pd
 import numpy as np
 import pickle
 import os
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-from sklearn.ensemble import RandomForestClassifier, IsolationForest, VotingClassifier
-import xgboost as xgb
 import warnings
+from feature_extractor import FEATURE_NAMES, features_to_vector
+import model_store
 warnings.filterwarnings('ignore')
 
 class EnsembleDetector:
@@ -27,10 +24,19 @@ class EnsembleDetector:
         self.iso_model = None
         self.ensemble = None
         self.feature_names = None
+        self._row = None  # preallocated 1 x n_features float32 input
+        self._compiled = None  # fused tree evaluator, built on first prediction
         
     def train(self, data_file="labeled_data.csv", save_dir="."):
         """Train all models in the ensemble"""
+        # Training-only imports; loading a trained ensemble needs none of these
+        import pandas as pd
+        import xgboost as xgb
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import accuracy_score, classification_report
+        from sklearn.ensemble import RandomForestClassifier, IsolationForest, VotingClassifier
         
+        self._compiled = None
         if not os.path.exists(data_file):
             print(f"Error: {data_file} not found. Run data collection first.")
             return False
@@ -175,14 +181,39 @@ class EnsembleDetector:
         print(f"   Saved: isolation_forest_model.pkl")
         print(f"   Saved: ensemble_model.pkl")
         
+        # Native / tree-array exports (what load() prefers)
+        model_store.export_xgboost(self.xgb_model, os.path.join(save_dir, model_store.XGB_FILE))
+        model_store.export_forest(self.rf_model, os.path.join(save_dir, model_store.RF_DIR),
+                                  self.feature_names)
+        model_store.export_forest(self.iso_model, os.path.join(save_dir, model_store.ISO_DIR),
+                                  self.feature_names)
+        model_store.export_ensemble(self.ensemble, self.feature_names,
+                                    os.path.join(save_dir, model_store.ENSEMBLE_FILE))
+        for name in (model_store.XGB_FILE, model_store.RF_DIR + "/",
+                     model_store.ISO_DIR + "/", model_store.ENSEMBLE_FILE):
+            print(f"   Saved: {name}")
+        
         print("\n" + "=" * 60)
         print("TRAINING COMPLETE")
         print("=" * 60)
         
         return True
     
-    def load(self, model_dir="."):
-        """Load trained models"""
+    def load(self, model_dir=".", native=True):
+        """
+        Load trained models. Prefers the native exports (memory-mapped tree
+        arrays, numpy only); falls back to the pickles, or uses them directly
+        with native=False.
+        """
+        self._compiled = None
+        if native and os.path.exists(os.path.join(model_dir, model_store.ENSEMBLE_FILE)):
+            try:
+                (self.xgb_model, self.rf_model, self.iso_model,
+                 self.ensemble, self.feature_names) = model_store.load_ensemble(model_dir)
+                return True
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error loading native models ({e}), trying pickles")
+        
         try:
             with open(os.path.join(model_dir, "ensemble_model.pkl"), "rb") as f:
                 data = pickle.load(f)
@@ -195,48 +226,92 @@ class EnsembleDetector:
             
             with open(os.path.join(model_dir, "random_forest_model.pkl"), "rb") as f:
                 self.rf_model = pickle.load(f)
+            
+            # Per-window scoring is one row at a time; a joblib pool per call costs far more than the trees
+            self.rf_model.n_jobs = 1
+            self.iso_model.n_jobs = 1
                 
             return True
         except FileNotFoundError as e:
             print(f"Error loading models: {e}")
             return False
     
-    def predict(self, features_dict):
+    def vectorize(self, features_dict):
+        """Fills the preallocated float32 input row in feature_names order"""
+        names = self.feature_names or FEATURE_NAMES
+        if self._row is None or self._row.shape[1] != len(names):
+            self._row = np.zeros((1, len(names)), dtype=np.float32)
+        features_to_vector(features_dict, names, out=self._row[0])
+        return self._row
+
+    def predict_batch(self, X):
         """
-        Make prediction using ensemble.
-        Returns probability and predictions from all models.
+        Scores a float32 matrix whose columns are in feature_names order.
+
+        All trees of the three models are evaluated in one vectorized pass by
+        model_store.CompiledEnsemble; the result is bit-identical to
+        predict_batch_reference (see tests/test_model_store.py).
+        Returns a dict of arrays, one entry per row.
         """
-        # Convert to DataFrame
-        df = pd.DataFrame([features_dict])
-        
-        # Ensure column order matches training
-        if self.feature_names:
-            df = df[self.feature_names]
-        
+        if self._compiled is None:
+            self._compiled = model_store.CompiledEnsemble.from_models(
+                self.xgb_model, self.rf_model, self.iso_model)
+        return self._results(*self._compiled.scores(X))
+
+    def predict_batch_reference(self, X):
+        """predict_batch through each model's own predict_proba / score_samples"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return self._results(self.xgb_model.predict_proba(X),
+                             self.rf_model.predict_proba(X),
+                             self.iso_model.score_samples(X))
+
+    def _results(self, xgb_proba, rf_proba, iso_score):
+        """
+        Derives every output from the three model scores. Labels are computed
+        the same way each model's predict() does, and the soft-voting
+        probability is recomputed from the XGBoost and Random Forest scores
+        (the VotingClassifier members are seeded refits of those same models).
+        """
+        ensemble_proba = np.average([xgb_proba, rf_proba], axis=0, weights=self.ensemble.weights)
+
         results = {
-            'xgb_prob': float(self.xgb_model.predict_proba(df)[0][1]),
-            'xgb_pred': int(self.xgb_model.predict(df)[0]),
-            'rf_prob': float(self.rf_model.predict_proba(df)[0][1]),
-            'rf_pred': int(self.rf_model.predict(df)[0]),
-            'iso_score': float(self.iso_model.score_samples(df)[0]),
-            'iso_pred': int(self.iso_model.predict(df)[0] == -1),
-            'ensemble_prob': float(self.ensemble.predict_proba(df)[0][1]),
-            'ensemble_pred': int(self.ensemble.predict(df)[0]),
+            'xgb_prob': xgb_proba[:, 1],
+            'xgb_pred': (xgb_proba[:, 1] > 0.5).astype(int),
+            'rf_prob': rf_proba[:, 1],
+            'rf_pred': self.rf_model.classes_.take(np.argmax(rf_proba, axis=1)).astype(int),
+            'iso_score': iso_score,
+            'iso_pred': ((iso_score - self.iso_model.offset_) < 0).astype(int),
+            'ensemble_prob': ensemble_proba[:, 1],
+            'ensemble_pred': self.ensemble.classes_.take(np.argmax(ensemble_proba, axis=1)).astype(int),
         }
-        
+
         # Calculate combined score (weighted average)
         results['combined_prob'] = (
-            results['xgb_prob'] * 0.4 +
+            results['xgb_prob'].astype(np.float64) * 0.4 +
             results['rf_prob'] * 0.3 +
             results['ensemble_prob'] * 0.3
         )
-        
+
         # Final prediction based on majority voting + anomaly detection
         votes = results['xgb_pred'] + results['rf_pred'] + results['iso_pred']
-        results['final_pred'] = 1 if votes >= 2 else 0
-        
+        results['final_pred'] = (votes >= 2).astype(int)
+
         return results
 
+    def predict_vector(self, x):
+        """Scores one float32 feature vector; returns plain floats/ints"""
+        results = self.predict_batch(x)
+        return {k: (int(v[0]) if k.endswith('_pred') else float(v[0])) for k, v in results.items()}
+
+    def predict(self, features_dict):
+        """
+        Make prediction using ensemble.
+        Returns probability and predictions from all models.
+        """
+        return self.predict_vector(self.vectorize(features_dict))
+
 def run_cross_validation(data_file="labeled_data.csv"):
     """Run cross-validation to evaluate model stability"""
     
@@ -246,6 +321,11 @@ def run_cross_validation(data_file="labeled_data.csv"):
     
     print("Running 5-Fold Cross-Validation...")
     
+    import pandas as pd
+    import xgboost as xgb
+    from sklearn.model_selection import cross_val_score
+    from sklearn.ensemble import RandomForestClassifier
+    
     df = pd.read_csv(data_file)
     X = df.drop(columns=['label'])
     y = df['label']
@@ -4,8 +4,10 @@ import pickle
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 import os
+from model_store import export_xgboost
 
-def train_model(data_file="labeled_data.csv", model_file="xgboost_model.pkl"):
+def train_model(data_file="labeled_data.csv", model_file="xgboost_model.pkl",
+                native_file="xgboost_model.json"):
     if not os.path.exists(data_file):
         print(f"Error: {data_file} not found. Run data collection first.")
         return
@@ -46,5 +48,9 @@ def train_model(data_file="labeled_data.csv", model_file="xgboost_model.pkl"):
         pickle.dump(model, f)
     print(f"\nModel saved to {model_file}")
 
+    # Native booster: what the detector loads (no pickle, no xgboost import)
+    export_xgboost(model, native_file)
+    print(f"Model saved to {native_file}")
+
 if __name__ == "__main__":
     train_model()
@@ -0,0 +1,142 @@
+"""
+Event-time windowing for audit lines.
+
+Windows are keyed on the audit(epoch:serial) timestamp of each record rather
+than on when the line was read, so the features for a given second are the
+same whether the reader is live, lagging behind a backlog, or replaying an
+archived log (they match AuditFeatureExtractor.parse_file).
+"""
+import time
+import math
+
+
+class EventTimeWindower:
+    """
+    Groups audit lines into tumbling or sliding windows by event time.
+
+    size             - window length in seconds
+    slide            - hop between window starts (None = size, i.e. tumbling)
+    allowed_lateness - how far behind the newest event time a record may
+                       arrive and still land in its window
+
+    A window [start, start + size) is emitted once the watermark (newest event
+    time seen minus allowed_lateness) reaches its end. Records older than the
+    watermark of an already emitted window are dropped and counted in
+    late_lines. Only windows that received lines are emitted.
+
+    When the log goes quiet, tick() advances the event clock by the wall-clock
+    time since the last line so the final windows still close.
+    """
+
+    def __init__(self, size=1.0, slide=None, allowed_lateness=2.0):
+        self.size = float(size)
+        self.slide = float(slide or size)
+        if self.slide > self.size:
+            raise ValueError("slide must not be larger than the window size")
+        self.allowed_lateness = float(allowed_lateness)
+
+        self.windows = {}           # window start -> list of lines
+        self.max_time = None        # newest event time seen
+        self.emitted_until = None   # end of the newest emitted window
+        self.last_arrival = None    # wall clock of the last line
+        self.late_lines = 0
+
+        self._last_stamp = None
+        self._last_starts = ()
+        self._next_close = float('inf')   # earliest end among open windows
+
+    def _starts(self, t):
+        """Start times of every window containing event time t"""
+        slide = self.slide
+        last = math.floor(t / slide) * slide
+        if slide == self.size:
+            return (last,)
+        first = (math.floor((t - self.size) / slide) + 1) * slide
+        n = int(round((last - first) / slide)) + 1
+        return tuple(first + k * slide for k in range(n))
+
+    def add(self, line):
+        """Adds one line and returns the list of windows it closed"""
+        self.last_arrival = time.monotonic()
+
+        # Records of one event share a timestamp; avoid recomputing it
+        i = line.find('msg=audit(')
+        stamp = line[i + 10:line.find(':', i + 10)] if i >= 0 else None
+
+        if stamp is None:
+            # No timestamp (continuation lines etc.): attach to the newest event
+            starts = self._last_starts
+            if not starts:
+                return []
+        elif stamp == self._last_stamp:
+            starts = self._last_starts
+        else:
+            try:
+                t = float(stamp)
+            except ValueError:
+                return []
+            starts = self._starts(t)
+            self._last_stamp = stamp
+            self._last_starts = starts
+            if self.max_time is None or t > self.max_time:
+                self.max_time = t
+
+        windows = self.windows
+        emitted_until = self.emitted_until
+        placed = False
+        for s in starts:
+            if emitted_until is not None and s + self.size <= emitted_until:
+                continue
+            bucket = windows.get(s)
+            if bucket is None:
+                windows[s] = [line]
+                if s + self.size < self._next_close:
+                    self._next_close = s + self.size
+            else:
+                bucket.append(line)
+            placed = True
+
+        if not placed:
+            self.late_lines += 1
+            return []
+        watermark = self.max_time - self.allowed_lateness
+        if watermark < self._next_close:
+            return []
+        return self._emit(watermark)
+
+    def add_lines(self, lines):
+        closed = []
+        for line in lines:
+            closed.extend(self.add(line))
+        return closed
+
+    def tick(self, now=None):
+        """
+        Called when no line arrived for a while. Advances the event clock by the
+        wall-clock time since the last line and returns any windows that closed.
+        """
+        if self.max_time is None or self.last_arrival is None:
+            return []
+        now = time.monotonic() if now is None else now
+        clock = self.max_time + (now - self.last_arrival)
+        return self._emit(clock - self.allowed_lateness)
+
+    def flush(self):
+        """Emits every open window (end of input)"""
+        return self._emit(float('inf'))
+
+    def _emit(self, watermark):
+        if not self.windows:
+            return []
+        ready = [s for s in self.windows if s + self.size <= watermark]
+        if not ready:
+            return []
+        ready.sort()
+        closed = []
+        for s in ready:
+            closed.append((s, s + self.size, self.windows.pop(s)))
+        end = ready[-1] + self.size
+        if self.emitted_until is None or end > self.emitted_until:
+            self.emitted_until = end
+        self._next_close = min(self.windows, default=float('inf')) + self.size
+        return closed
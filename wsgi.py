@@ -0,0 +1,16 @@
+"""
+Production entry point for the dashboard backend:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+SECRET_KEY (environment or .env) is required: every worker must sign and
+verify JWTs with the same key, and the development fallback is random per
+process.
+"""
+import os
+
+from dashboard_backend import app
+
+if not os.environ.get('SECRET_KEY'):
+    raise RuntimeError("SECRET_KEY is not set; set it in the environment or .env "
+                       "so all gunicorn workers share one JWT signing key")